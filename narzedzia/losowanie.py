@@ -0,0 +1,171 @@
+# Powtarzalne, niezależne strumienie liczb losowych dla symulacji
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class ZiarnoSynchroniczne:
+    # Ziarno, z którym StrumienieLosowe wyznaczają każdą wartość z jednej
+    # liczby jednostajnej (GeneratorOdwrotny). Scenariusze z tym samym ziarnem
+    # zużywają wtedy strumienie w tym samym tempie (wspólne liczby losowe),
+    # a antytetyczne=True daje drugi przebieg pary zmiennych antytetycznych.
+    # Modele przyjmują je wszędzie tam, gdzie zwykłe ziarno.
+    seed: np.random.SeedSequence
+    antytetyczne: bool = False
+
+
+class StrumienieLosowe:
+    # Osobny numpy.random.Generator dla każdego źródła losowości modelu.
+    # Generatory są wyprowadzane z jednego ziarna tak jak w SeedSequence.spawn,
+    # więc są od siebie niezależne, a to samo ziarno zawsze daje te same
+    # strumienie (również w innych procesach i dla innych scenariuszy).
+    # antytetyczne: None to zwykłe generatory numpy, False i True to
+    # GeneratorOdwrotny z U albo 1 - U (ustawiane przez ZiarnoSynchroniczne).
+    def __init__(self, seed=None, antytetyczne: Optional[bool] = None):
+        if isinstance(seed, ZiarnoSynchroniczne):
+            seed, antytetyczne = seed.seed, seed.antytetyczne
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed = seed
+        self.antytetyczne = antytetyczne
+        przyjscia, klasy, przepustowosci, trasowanie, obsluga = (
+            self._generator(ziarno) for ziarno in _potomne_ziarna(seed, 5)
+        )
+        self.przyjscia = przyjscia  # Czasy i liczby przyjść
+        self.klasy = klasy  # Klasy klientów i typy zgłoszeń
+        self.przepustowosci = przepustowosci  # Etapy sieci
+        self.trasowanie = trasowanie  # Wybór kolejnego etapu
+        self.obsluga = obsluga  # Wybór kasy, czasy obsługi
+
+    def __repr__(self):
+        if self.antytetyczne is None:
+            return f"StrumienieLosowe(entropy={self.seed.entropy})"
+        return (
+            f"StrumienieLosowe(entropy={self.seed.entropy}, "
+            f"antytetyczne={self.antytetyczne})"
+        )
+
+    def _generator(self, ziarno: np.random.SeedSequence):
+        rng = np.random.default_rng(ziarno)
+        if self.antytetyczne is None:
+            return rng
+        return GeneratorOdwrotny(rng, self.antytetyczne)
+
+
+class GeneratorOdwrotny:
+    # Część interfejsu numpy.random.Generator używana przez modele, w której
+    # każda wartość to odwrotność dystrybuanty w jednej liczbie jednostajnej U
+    # (numpy dla niektórych rozkładów zużywa zmienną liczbę bitów).
+    # antytetyczny=True zastępuje U przez 1 - U, co daje wartości ujemnie
+    # skorelowane z przebiegiem z tym samym ziarnem.
+    def __init__(self, rng: np.random.Generator, antytetyczny: bool = False):
+        self.rng = rng
+        self.antytetyczny = antytetyczny
+
+    def random(self, size=None):
+        u = self.rng.random(size)
+        return 1 - u if self.antytetyczny else u
+
+    def integers(self, low, high=None, size=None):
+        if high is None:
+            low, high = 0, low
+        n = high - low
+        # min: 1 - U może być równe 1
+        return low + np.minimum(np.floor(self.random(size) * n), n - 1).astype(np.int64)
+
+    def exponential(self, scale: float = 1.0, size=None):
+        return -scale * np.log1p(-np.minimum(self.random(size), 1 - 2**-53))
+
+    def choice(self, a, size=None, p=None):
+        wartosci = np.arange(a) if isinstance(a, (int, np.integer)) else np.asarray(a)
+        if p is None:
+            return wartosci[self.integers(len(wartosci), size=size)]
+        # Jak w numpy: kubełek dystrybuanty, w który wpada U
+        dystrybuanta = np.cumsum(p)
+        dystrybuanta /= dystrybuanta[-1]
+        indeksy = np.searchsorted(dystrybuanta, self.random(size), side="right")
+        return wartosci[np.minimum(indeksy, len(wartosci) - 1)]
+
+
+def _potomne_ziarna(
+    seed: np.random.SeedSequence, liczba: int
+) -> List[np.random.SeedSequence]:
+    # Jak seed.spawn(liczba), ale niezależnie od tego, ile razy już wywołano
+    # spawn na tym samym obiekcie
+    return [
+        np.random.SeedSequence(
+            seed.entropy, spawn_key=seed.spawn_key + (i,), pool_size=seed.pool_size
+        )
+        for i in range(liczba)
+    ]
+
+
+class PulaLosowan:
+    # Wartości losowane blokami po `rozmiar_bloku` i wydawane po kolei.
+    # Pojedyncze wywołania generatora numpy są drogie, więc zamiast losować
+    # każdą wartość osobno losujemy cały blok naraz i uzupełniamy go, gdy się
+    # wyczerpie. Kolejne wartości mają ten sam rozkład co przy losowaniu
+    # pojedynczo.
+    def __init__(self, losuj: Callable[[int], np.ndarray], rozmiar_bloku: int = 4096):
+        self.losuj = losuj  # losuj(n) zwraca tablicę n wartości
+        self.rozmiar_bloku = rozmiar_bloku
+        self._blok: List = []
+        self._pozycja = 0
+
+    def nastepna(self):
+        if self._pozycja == len(self._blok):
+            self._uzupelnij()
+        wartosc = self._blok[self._pozycja]
+        self._pozycja += 1
+        return wartosc
+
+    def pobierz(self, liczba: int) -> List:
+        # `liczba` kolejnych wartości z puli
+        wartosci = self._blok[self._pozycja : self._pozycja + liczba]
+        self._pozycja += len(wartosci)
+        while len(wartosci) < liczba:
+            self._uzupelnij(liczba - len(wartosci))
+            brakujace = self._blok[: liczba - len(wartosci)]
+            self._pozycja = len(brakujace)
+            wartosci += brakujace
+        return wartosci
+
+    def _uzupelnij(self, minimum: int = 1):
+        self._blok = self.losuj(max(self.rozmiar_bloku, minimum)).tolist()
+        self._pozycja = 0
+
+
+def pula_kategorii(
+    rng: np.random.Generator,
+    wartosci: Sequence,
+    prawdopodobienstwa: Sequence[float],
+    rozmiar_bloku: int = 4096,
+) -> PulaLosowan:
+    # Wartości z `wartosci` losowane z podanymi prawdopodobieństwami
+    etykiety = np.empty(len(wartosci), dtype=object)
+    etykiety[:] = list(wartosci)
+    return PulaLosowan(
+        lambda n: etykiety[rng.choice(len(etykiety), size=n, p=prawdopodobienstwa)],
+        rozmiar_bloku,
+    )
+
+
+def pula_calkowitych(
+    rng: np.random.Generator,
+    najmniejsza: int,
+    najwieksza: int,
+    rozmiar_bloku: int = 4096,
+) -> PulaLosowan:
+    # Liczby całkowite z przedziału [najmniejsza, najwieksza] (jak random.randint)
+    return PulaLosowan(
+        lambda n: rng.integers(najmniejsza, najwieksza + 1, size=n), rozmiar_bloku
+    )
+
+
+def pula_jednostajna(
+    rng: np.random.Generator, rozmiar_bloku: int = 4096
+) -> PulaLosowan:
+    # Liczby z rozkładu jednostajnego na [0, 1)
+    return PulaLosowan(rng.random, rozmiar_bloku)
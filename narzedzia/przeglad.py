@@ -0,0 +1,295 @@
+# Przegląd parametrów modelu: siatka konfiguracji, replikacje każdej komórki
+# w puli procesów i trwała pamięć podręczna wyników na dysku.
+#
+# Wynik replikacji zapisywany jest w pliku JSON o nazwie będącej skrótem
+# (wersja modelu, model, konfiguracja, ziarno). Ponowny przegląd po zmianie siatki
+# liczy więc tylko nowe albo zmienione komórki, a po zmianie kodu modelu
+# (domyślnie wersja to skrót kodu pakietów repozytorium, z których model
+# korzysta) wszystkie od nowa. Model to
+# funkcja model(konfiguracja, seed) -> słownik metryk, jak w
+# narzedzia.replikacje, np. koeljkav5.replikacja albo siecv2.replikacja.
+import csv
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, is_dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from narzedzia.losowanie import ZiarnoSynchroniczne
+from narzedzia.statystyki import przedzial_ufnosci
+
+DOMYSLNY_KATALOG = ".przeglad"
+
+
+@dataclass
+class TabelaWynikow:
+    # Wiersz na replikację komórki: parametry komórki, numer replikacji
+    # i metryki; zagnieżdżone metryki mają nazwy jak w raport() replikacji,
+    # np. "stages/Wysyłka/avg_utilization"
+    wiersze: List[Dict[str, object]]
+    parametry: List[str]  # Nazwy kolumn z parametrami komórek
+    # Liczba replikacji policzonych w tym przeglądzie (reszta z pamięci
+    # podręcznej)
+    obliczone: int = 0
+
+    def __len__(self):
+        return len(self.wiersze)
+
+    def kolumny(self) -> List[str]:
+        kolumny = {}
+        for wiersz in self.wiersze:
+            kolumny.update(dict.fromkeys(wiersz))
+        return list(kolumny)
+
+    def kolumna(self, nazwa: str) -> List[object]:
+        return [wiersz.get(nazwa) for wiersz in self.wiersze]
+
+    def filtruj(self, **warunki) -> "TabelaWynikow":
+        # Wiersze, w których kolumny mają podane wartości; warunek może być
+        # też funkcją wartości, np. liczba_kas=lambda c: c >= 3
+        def spelnia(wiersz):
+            return all(
+                (
+                    warunek(wiersz.get(nazwa))
+                    if callable(warunek)
+                    else wiersz.get(nazwa) == warunek
+                )
+                for nazwa, warunek in warunki.items()
+            )
+
+        return replace(self, wiersze=[w for w in self.wiersze if spelnia(w)])
+
+    def podsumuj(
+        self, metryka: str, poziom_ufnosci: float = 0.95
+    ) -> List[Dict[str, object]]:
+        # Wiersz na komórkę: jej parametry i przedział ufności metryki
+        # z replikacji
+        komorki: Dict[str, Dict[str, object]] = {}
+        wartosci: Dict[str, List[object]] = {}
+        for wiersz in self.wiersze:
+            parametry = {nazwa: wiersz[nazwa] for nazwa in self.parametry}
+            klucz = json.dumps(parametry, sort_keys=True, default=str)
+            komorki.setdefault(klucz, parametry)
+            wartosci.setdefault(klucz, []).append(wiersz[metryka])
+        return [
+            {**parametry, metryka: przedzial_ufnosci(wartosci[klucz], poziom_ufnosci)}
+            for klucz, parametry in komorki.items()
+        ]
+
+    def zapisz_csv(self, plik: str):
+        with open(plik, "w", newline="", encoding="utf-8") as f:
+            zapis = csv.DictWriter(f, fieldnames=self.kolumny())
+            zapis.writeheader()
+            zapis.writerows(self.wiersze)
+
+
+def siatka(**parametry: Sequence) -> List[Dict[str, object]]:
+    # Wszystkie kombinacje wartości parametrów, np.
+    # siatka(liczba_kas=[2, 3], srednia_intensywnosc_przyjsc=[0.5, 1.0])
+    nazwy = list(parametry)
+    return [
+        dict(zip(nazwy, wartosci))
+        for wartosci in itertools.product(*parametry.values())
+    ]
+
+
+def przeglad(
+    model: Callable,
+    konfiguracja,
+    komorki: Sequence[Dict[str, object]],
+    liczba_replikacji: int = 1,
+    seed: int = 0,
+    katalog: str = DOMYSLNY_KATALOG,
+    wersja: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> TabelaWynikow:
+    # konfiguracja: konfiguracja bazowa (dataclass albo słownik), którą
+    # parametry komórki nadpisują. Replikacje dostają ziarna
+    # SeedSequence(seed).spawn(liczba_replikacji), te same w każdej komórce
+    # (wspólne liczby losowe), więc zwiększenie liczba_replikacji liczy tylko
+    # nowe replikacje. wersja: identyfikator modelu w kluczach pamięci
+    # podręcznej (domyślnie wersja_modelu).
+    if wersja is None:
+        wersja = wersja_modelu(model)
+    # Modele z jednego pakietu mają tę samą wersję, więc klucz zawiera też
+    # sam model
+    opis = opis_modelu(model)
+    ziarna = np.random.SeedSequence(seed).spawn(liczba_replikacji)
+    wiersze: List[Dict[str, object]] = []
+    zadania = []
+    for komorka in komorki:
+        konfiguracja_komorki = _z_parametrami(konfiguracja, komorka)
+        for numer, ziarno in enumerate(ziarna):
+            wiersz = dict(komorka, replikacja=numer)
+            wiersze.append(wiersz)
+            klucz = klucz_wyniku(wersja, opis, konfiguracja_komorki, ziarno)
+            metryki = wczytaj(katalog, klucz)
+            if metryki is None:
+                zadania.append((wiersz, konfiguracja_komorki, ziarno, klucz))
+            else:
+                wiersz.update(_splaszcz(metryki))
+
+    def zapisz_wynik(zadanie, metryki):
+        wiersz, konfiguracja_komorki, ziarno, klucz = zadanie
+        # Przez JSON, żeby wiersze policzone i wczytane były takie same
+        metryki = json.loads(json.dumps(metryki, default=_jako_json))
+        zapisz(katalog, klucz, wersja, opis, konfiguracja_komorki, ziarno, metryki)
+        wiersz.update(_splaszcz(metryki))
+
+    if max_workers == 1 or len(zadania) <= 1:
+        for zadanie in zadania:
+            zapisz_wynik(zadanie, model(zadanie[1], zadanie[2]))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pula:
+            przyszle = {
+                pula.submit(model, zadanie[1], zadanie[2]): zadanie
+                for zadanie in zadania
+            }
+            # Każdy wynik trafia na dysk od razu, więc przerwany przegląd
+            # można wznowić
+            for przyszly in as_completed(przyszle):
+                zapisz_wynik(przyszle[przyszly], przyszly.result())
+    return TabelaWynikow(
+        wiersze=wiersze,
+        parametry=list(dict.fromkeys(nazwa for k in komorki for nazwa in k)),
+        obliczone=len(zadania),
+    )
+
+
+def wersja_modelu(model: Callable) -> str:
+    # Skrót kodu źródłowego wszystkich plików .py pakietów repozytorium,
+    # z których korzysta moduł modelu (bezpośrednio albo pośrednio, np.
+    # narzedzia.losowanie), więc zmiana dowolnego z nich unieważnia wyniki.
+    # Brane są całe pakiety, żeby objąć też importy wewnątrz funkcji.
+    model = getattr(model, "func", model)  # functools.partial
+    skrot = hashlib.sha256()
+    for plik in _pliki_zrodlowe(sys.modules[model.__module__]):
+        # Ścieżka względem katalogu repozytorium: pakiet/plik.py
+        skrot.update(
+            os.path.relpath(plik, os.path.dirname(os.path.dirname(plik))).encode()
+        )
+        with open(plik, "rb") as f:
+            skrot.update(hashlib.sha256(f.read()).digest())
+    return skrot.hexdigest()[:16]
+
+
+def opis_modelu(model: Callable) -> List[object]:
+    # Pełna nazwa funkcji modelu i argumenty związane przez functools.partial
+    funkcja = getattr(model, "func", model)
+    return [
+        f"{funkcja.__module__}.{funkcja.__qualname__}",
+        list(getattr(model, "args", ())),
+        dict(getattr(model, "keywords", {})),
+    ]
+
+
+def _pliki_zrodlowe(modul) -> List[str]:
+    # Pliki .py katalogów modułów osiągalnych z `modul` przez importy (moduły
+    # i obiekty z nich zaimportowane), ograniczonych do repozytorium, czyli
+    # katalogu zawierającego pakiet najwyższego poziomu modułu
+    najwyzszy = sys.modules[modul.__name__.split(".")[0]]
+    korzen = os.path.dirname(os.path.abspath(najwyzszy.__file__))
+    if hasattr(najwyzszy, "__path__"):
+        korzen = os.path.dirname(korzen)
+    katalogi = set()
+    odwiedzone = {modul.__name__}
+    do_odwiedzenia = [modul]
+    while do_odwiedzenia:
+        biezacy = do_odwiedzenia.pop()
+        katalogi.add(os.path.dirname(os.path.abspath(biezacy.__file__)))
+        for wartosc in vars(biezacy).values():
+            if inspect.ismodule(wartosc):
+                nazwa = wartosc.__name__
+            else:
+                nazwa = getattr(wartosc, "__module__", None)
+            if not isinstance(nazwa, str) or nazwa in odwiedzone:
+                continue
+            odwiedzone.add(nazwa)
+            zaleznosc = sys.modules.get(nazwa)
+            plik = getattr(zaleznosc, "__file__", None)
+            if plik and os.path.abspath(plik).startswith(korzen + os.sep):
+                do_odwiedzenia.append(zaleznosc)
+    return sorted(
+        os.path.join(katalog, nazwa)
+        for katalog in katalogi
+        for nazwa in os.listdir(katalog)
+        if nazwa.endswith(".py")
+    )
+
+
+def klucz_wyniku(wersja: str, model: List[object], konfiguracja, ziarno) -> str:
+    # model: opis_modelu(model)
+    opis = json.dumps(
+        [wersja, model, konfiguracja, _opis_ziarna(ziarno)],
+        sort_keys=True,
+        default=_jako_json,
+    )
+    return hashlib.sha256(opis.encode()).hexdigest()
+
+
+def wczytaj(katalog: str, klucz: str) -> Optional[Dict[str, object]]:
+    # Metryki zapisane pod kluczem albo None
+    try:
+        with open(_plik(katalog, klucz), encoding="utf-8") as f:
+            return json.load(f)["metryki"]
+    except FileNotFoundError:
+        return None
+
+
+def zapisz(katalog: str, klucz: str, wersja: str, model, konfiguracja, ziarno, metryki):
+    plik = _plik(katalog, klucz)
+    os.makedirs(os.path.dirname(plik), exist_ok=True)
+    wpis = {
+        "wersja": wersja,
+        "model": model,
+        "konfiguracja": konfiguracja,
+        "ziarno": _opis_ziarna(ziarno),
+        "metryki": metryki,
+    }
+    # Zapis do pliku tymczasowego i zamiana, żeby przerwany zapis nie
+    # zostawił uszkodzonego wpisu
+    tymczasowy = f"{plik}.{os.getpid()}.tmp"
+    with open(tymczasowy, "w", encoding="utf-8") as f:
+        json.dump(wpis, f, ensure_ascii=False, default=_jako_json)
+    os.replace(tymczasowy, plik)
+
+
+def _plik(katalog: str, klucz: str) -> str:
+    return os.path.join(katalog, klucz[:2], f"{klucz}.json")
+
+
+def _z_parametrami(konfiguracja, parametry: Dict[str, object]):
+    if is_dataclass(konfiguracja):
+        return replace(konfiguracja, **parametry)
+    return {**konfiguracja, **parametry}
+
+
+def _opis_ziarna(ziarno) -> List[object]:
+    if isinstance(ziarno, ZiarnoSynchroniczne):
+        return _opis_ziarna(ziarno.seed) + [ziarno.antytetyczne]
+    return [ziarno.entropy, list(ziarno.spawn_key)]
+
+
+def _jako_json(wartosc):
+    # Obiekty spoza JSON: konfiguracje (dataclass), wartości NumPy
+    if is_dataclass(wartosc):
+        return asdict(wartosc)
+    if isinstance(wartosc, (np.generic, np.ndarray)):
+        return wartosc.tolist()
+    if isinstance(wartosc, np.random.SeedSequence):
+        return _opis_ziarna(wartosc)
+    return str(wartosc)
+
+
+def _splaszcz(metryki: Dict[str, object], prefiks: str = ""):
+    for nazwa, wartosc in metryki.items():
+        if isinstance(wartosc, dict):
+            yield from _splaszcz(wartosc, f"{prefiks}{nazwa}/")
+        else:
+            yield prefiks + nazwa, wartosc
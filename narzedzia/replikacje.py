@@ -0,0 +1,302 @@
+# Uruchamianie niezależnych replikacji modeli symulacyjnych w puli procesów.
+#
+# Model to funkcja model(konfiguracja, seed) -> słownik metryk, gdzie seed
+# to numpy.random.SeedSequence danej replikacji, a metryki są liczbami,
+# listami liczb (np. wykorzystanie każdej kasy) lub zagnieżdżonymi słownikami
+# (np. statystyki każdego etapu sieci).
+#
+# uruchom_do_precyzji dobiera liczbę replikacji sama: uruchamia je paczkami,
+# aż przedziały ufności wskazanych metryk będą dość wąskie.
+#
+# porownaj zestawia dwa scenariusze (konfiguracje) tego samego modelu
+# różnicami z par replikacji; wspólne liczby losowe i zmienne antytetyczne
+# zmniejszają wariancję różnic, a więc potrzebną liczbę replikacji.
+import fnmatch
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from narzedzia.losowanie import ZiarnoSynchroniczne
+from narzedzia.statystyki import PrzedzialUfnosci, przedzial_ufnosci
+
+Model = Callable[[Dict[str, object], np.random.SeedSequence], Dict[str, object]]
+
+
+@dataclass
+class WynikReplikacji:
+    liczba_replikacji: int
+    metryki: Dict[str, object]  # Przedziały ufności, zagnieżdżone jak wyniki
+    wyniki: List[Dict[str, object]]  # Wyniki poszczególnych replikacji
+    # uruchom_do_precyzji: czy wszystkie cele zostały osiągnięte przed
+    # wyczerpaniem limitu replikacji
+    cele_osiagniete: Optional[bool] = None
+
+    def raport(self) -> str:
+        linie = [
+            f"{nazwa}: {przedzial}" for nazwa, przedzial in _splaszcz(self.metryki)
+        ]
+        if self.cele_osiagniete is not None:
+            linie.append(
+                f"Liczba replikacji: {self.liczba_replikacji} (cele "
+                f"{'osiągnięte' if self.cele_osiagniete else 'nieosiągnięte'})"
+            )
+        return "\n".join(linie)
+
+
+@dataclass
+class Precyzja:
+    # Docelowa połowa szerokości przedziału ufności: bezwzględna (w jednostkach
+    # metryki) i/lub względna (ułamek modułu średniej); muszą być spełnione
+    # wszystkie podane
+    bezwzgledna: Optional[float] = None
+    wzgledna: Optional[float] = None
+
+    def spelniona(self, przedzial: PrzedzialUfnosci) -> bool:
+        polowa_szerokosci = np.asarray(przedzial.polowa_szerokosci)
+        spelniona = np.ones_like(polowa_szerokosci, dtype=bool)
+        if self.bezwzgledna is not None:
+            spelniona &= polowa_szerokosci <= self.bezwzgledna
+        if self.wzgledna is not None:
+            spelniona &= polowa_szerokosci <= self.wzgledna * np.abs(przedzial.srednia)
+        return bool(spelniona.all())
+
+
+# Cel dla metryki: Precyzja albo liczba, czyli bezwzględna połowa szerokości
+Cel = Union[Precyzja, float]
+
+
+def uruchom_replikacje(
+    model: Model,
+    konfiguracja: Dict[str, object],
+    liczba_replikacji: int,
+    seed=None,
+    max_workers: Optional[int] = None,
+    poziom_ufnosci: float = 0.95,
+) -> WynikReplikacji:
+    # Każda replikacja dostaje własne, niezależne ziarno z SeedSequence.spawn
+    ziarna = np.random.SeedSequence(seed).spawn(liczba_replikacji)
+    wyniki = wykonaj_replikacje(model, konfiguracja, ziarna, max_workers)
+    return WynikReplikacji(
+        liczba_replikacji=liczba_replikacji,
+        metryki=podsumuj_metryki(wyniki, poziom_ufnosci),
+        wyniki=wyniki,
+    )
+
+
+def uruchom_do_precyzji(
+    model: Model,
+    konfiguracja: Dict[str, object],
+    cele: Dict[str, Cel],
+    seed=None,
+    wielkosc_paczki: int = 10,
+    max_replikacji: int = 1000,
+    max_workers: Optional[int] = None,
+    poziom_ufnosci: float = 0.95,
+) -> WynikReplikacji:
+    # Replikacje uruchamiane paczkami po wielkosc_paczki; po każdej paczce
+    # przedziały ufności są liczone od nowa, a obliczenia kończą się, gdy
+    # wszystkie cele są spełnione (albo po max_replikacji). Klucze celów to
+    # nazwy metryk jak w raport(), np. "sredni_czas_oczekiwania" albo
+    # "stages/Wysyłka/avg_utilization"; mogą zawierać wzorce fnmatch, np.
+    # "stages/*/avg_utilization". Ziarna są kolejnymi dziećmi tego samego
+    # SeedSequence, więc wynik jest taki jak uruchom_replikacje z tą samą
+    # liczbą replikacji.
+    if wielkosc_paczki < 1:
+        raise ValueError("Wielkość paczki musi wynosić co najmniej 1")
+    if max_replikacji < 1:
+        raise ValueError("Maksymalna liczba replikacji musi wynosić co najmniej 1")
+    korzen = np.random.SeedSequence(seed)
+    cele = {
+        wzorzec: cel if isinstance(cel, Precyzja) else Precyzja(bezwzgledna=cel)
+        for wzorzec, cel in cele.items()
+    }
+    wyniki = []
+    pula = None
+    if max_workers != 1:
+        pula = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            liczba = min(wielkosc_paczki, max_replikacji - len(wyniki))
+            wyniki += wykonaj_replikacje(
+                model, konfiguracja, korzen.spawn(liczba), max_workers, pula
+            )
+            metryki = podsumuj_metryki(wyniki, poziom_ufnosci)
+            osiagniete = cele_spelnione(metryki, cele)
+            if osiagniete or len(wyniki) >= max_replikacji:
+                break
+    finally:
+        if pula is not None:
+            pula.shutdown()
+    return WynikReplikacji(
+        liczba_replikacji=len(wyniki),
+        metryki=metryki,
+        wyniki=wyniki,
+        cele_osiagniete=osiagniete,
+    )
+
+
+@dataclass
+class WynikPorownania:
+    metoda: str
+    liczba_replikacji: int
+    a: Dict[str, object]  # Przedziały ufności metryk scenariusza A
+    b: Dict[str, object]
+    # Przedziały ufności różnic A - B z par replikacji (bez metryk, których
+    # kształt zależy od scenariusza, np. wykorzystania każdej z kas)
+    roznice: Dict[str, object]
+    wyniki_a: List[Dict[str, object]]
+    wyniki_b: List[Dict[str, object]]
+
+    def raport(self) -> str:
+        a, b = dict(_splaszcz(self.a)), dict(_splaszcz(self.b))
+        return "\n".join(
+            f"{nazwa}: A {a[nazwa]}, B {b[nazwa]}, A - B {roznica}"
+            for nazwa, roznica in _splaszcz(self.roznice)
+        )
+
+
+# Metody porównania: niezależne replikacje, wspólne liczby losowe (oba
+# scenariusze z tymi samymi ziarnami) i dodatkowo pary zmiennych
+# antytetycznych
+METODY_POROWNANIA = ("niezalezne", "wspolne", "antytetyczne")
+
+
+def porownaj(
+    model: Model,
+    konfiguracja_a: Dict[str, object],
+    konfiguracja_b: Dict[str, object],
+    liczba_replikacji: int,
+    seed=None,
+    metoda: str = "wspolne",
+    max_workers: Optional[int] = None,
+    poziom_ufnosci: float = 0.95,
+) -> WynikPorownania:
+    # Przy wspólnych liczbach losowych replikacje obu scenariuszy dostają
+    # ZiarnoSynchroniczne, więc każda wartość losowa zużywa jedną liczbę ze
+    # strumienia i strumienie nie rozjeżdżają się, gdy scenariusze różnią się
+    # np. zakresem przepustowości. Przy metodzie "antytetyczne" replikacja to
+    # średnia z pary przebiegów z U i 1 - U (dwa przebiegi na replikację).
+    if metoda not in METODY_POROWNANIA:
+        raise ValueError(f"Nieznana metoda porównania: {metoda!r}")
+    korzen = np.random.SeedSequence(seed)
+    if metoda == "niezalezne":
+        ziarna_a = korzen.spawn(liczba_replikacji)
+        ziarna_b = korzen.spawn(liczba_replikacji)
+    else:
+        ziarna_a = ziarna_b = [
+            ZiarnoSynchroniczne(ziarno, antytetyczne)
+            for ziarno in korzen.spawn(liczba_replikacji)
+            for antytetyczne in (
+                (False, True) if metoda == "antytetyczne" else (False,)
+            )
+        ]
+    pula = None
+    if max_workers != 1:
+        pula = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        wyniki_a = wykonaj_replikacje(
+            model, konfiguracja_a, ziarna_a, max_workers, pula
+        )
+        wyniki_b = wykonaj_replikacje(
+            model, konfiguracja_b, ziarna_b, max_workers, pula
+        )
+    finally:
+        if pula is not None:
+            pula.shutdown()
+    if metoda == "antytetyczne":
+        wyniki_a, wyniki_b = _srednie_par(wyniki_a), _srednie_par(wyniki_b)
+    roznice = [_roznica(a, b) for a, b in zip(wyniki_a, wyniki_b)]
+    return WynikPorownania(
+        metoda=metoda,
+        liczba_replikacji=liczba_replikacji,
+        a=podsumuj_metryki(wyniki_a, poziom_ufnosci),
+        b=podsumuj_metryki(wyniki_b, poziom_ufnosci),
+        roznice=podsumuj_metryki(roznice, poziom_ufnosci),
+        wyniki_a=wyniki_a,
+        wyniki_b=wyniki_b,
+    )
+
+
+def _srednie_par(wyniki: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    return [
+        _polacz(wyniki[i], wyniki[i + 1], lambda x, y: (x + y) / 2)
+        for i in range(0, len(wyniki), 2)
+    ]
+
+
+def _roznica(a: Dict[str, object], b: Dict[str, object]) -> Dict[str, object]:
+    return _polacz(a, b, lambda x, y: x - y)
+
+
+def _polacz(a: Dict[str, object], b: Dict[str, object], dzialanie):
+    # dzialanie na metrykach obecnych w obu wynikach, o tym samym kształcie
+    wynik = {}
+    for nazwa, x in a.items():
+        if nazwa not in b:
+            continue
+        y = b[nazwa]
+        if isinstance(x, dict):
+            if isinstance(y, dict):
+                wynik[nazwa] = _polacz(x, y, dzialanie)
+            continue
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if x.shape == y.shape:
+            wartosc = dzialanie(x, y)
+            wynik[nazwa] = wartosc.item() if wartosc.ndim == 0 else wartosc.tolist()
+    return wynik
+
+
+def cele_spelnione(metryki: Dict[str, object], cele: Dict[str, Precyzja]) -> bool:
+    przedzialy = dict(_splaszcz(metryki))
+    for wzorzec, cel in cele.items():
+        nazwy = fnmatch.filter(przedzialy, wzorzec)
+        if not nazwy:
+            raise ValueError(f"Brak metryki pasującej do {wzorzec!r}")
+        if not all(cel.spelniona(przedzialy[nazwa]) for nazwa in nazwy):
+            return False
+    return True
+
+
+def wykonaj_replikacje(
+    model: Model,
+    konfiguracja: Dict[str, object],
+    ziarna: List[np.random.SeedSequence],
+    max_workers: Optional[int] = None,
+    pula: Optional[Executor] = None,
+) -> List[Dict[str, object]]:
+    # pula: już uruchomiona pula procesów (np. dla kolejnych paczek)
+    zadanie = partial(model, konfiguracja)
+    if max_workers == 1 or len(ziarna) <= 1:
+        return [zadanie(ziarno) for ziarno in ziarna]
+    liczba_procesow = max_workers or os.cpu_count() or 1
+    # Kilka paczek na proces wyrównuje obciążenie przy niewielkim narzucie
+    chunksize = max(1, len(ziarna) // (4 * liczba_procesow))
+    if pula is not None:
+        return list(pula.map(zadanie, ziarna, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=liczba_procesow) as pula:
+        return list(pula.map(zadanie, ziarna, chunksize=chunksize))
+
+
+def podsumuj_metryki(
+    wyniki: List[Dict[str, object]], poziom_ufnosci: float = 0.95
+) -> Dict[str, object]:
+    metryki = {}
+    for nazwa, wartosc in wyniki[0].items():
+        wartosci = [wynik[nazwa] for wynik in wyniki]
+        if isinstance(wartosc, dict):
+            metryki[nazwa] = podsumuj_metryki(wartosci, poziom_ufnosci)
+        else:
+            metryki[nazwa] = przedzial_ufnosci(wartosci, poziom_ufnosci)
+    return metryki
+
+
+def _splaszcz(metryki: Dict[str, object], prefiks: str = ""):
+    for nazwa, wartosc in metryki.items():
+        if isinstance(wartosc, PrzedzialUfnosci):
+            yield prefiks + nazwa, wartosc
+        else:
+            yield from _splaszcz(wartosc, f"{prefiks}{nazwa}/")
@@ -0,0 +1,238 @@
+# Statystyki pomocnicze do analizy wyników symulacji
+import math
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from narzedzia.strumieniowe import SzeregZdziesiatkowany
+
+Liczby = Union[float, np.ndarray]
+
+
+def kwantyl_t(liczba_stopni_swobody: int, prawdopodobienstwo: float) -> float:
+    # Kwantyl rozkładu t-Studenta: dla 1 i 2 stopni swobody dokładny wzór,
+    # dalej rozwinięcie Cornisha-Fishera wokół rozkładu normalnego (dla
+    # przedziałów 95% błąd poniżej 0.01 od 3 stopni swobody; przy 1 stopniu
+    # zaniżałoby kwantyl o 11%)
+    p = prawdopodobienstwo
+    v = liczba_stopni_swobody
+    if v == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if v == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    return z + g1 / v + g2 / v**2 + g3 / v**3 + g4 / v**4
+
+
+@dataclass
+class PrzedzialUfnosci:
+    srednia: Liczby
+    wariancja: Liczby
+    polowa_szerokosci: Liczby
+    liczba_obserwacji: int
+    poziom_ufnosci: float
+
+    @property
+    def dolna_granica(self) -> Liczby:
+        return self.srednia - self.polowa_szerokosci
+
+    @property
+    def gorna_granica(self) -> Liczby:
+        return self.srednia + self.polowa_szerokosci
+
+    def __str__(self):
+        return (
+            f"{_format(self.srednia)} ± {_format(self.polowa_szerokosci)} "
+            f"(wariancja {_format(self.wariancja)}, n = {self.liczba_obserwacji})"
+        )
+
+
+def przedzial_ufnosci(
+    proba: Sequence, poziom_ufnosci: float = 0.95
+) -> PrzedzialUfnosci:
+    # Przedział ufności dla średniej z niezależnych obserwacji; obserwacje
+    # mogą być wektorami (np. wykorzystanie każdej kasy), wtedy liczone są
+    # przedziały dla każdej współrzędnej
+    x = np.asarray(proba, dtype=float)
+    n = x.shape[0]
+    srednia = x.mean(axis=0)
+    if n > 1:
+        wariancja = x.var(axis=0, ddof=1)
+        polowa_szerokosci = kwantyl_t(n - 1, (1 + poziom_ufnosci) / 2) * np.sqrt(
+            wariancja / n
+        )
+    else:
+        wariancja = np.zeros_like(srednia)
+        polowa_szerokosci = np.full_like(srednia, np.inf)
+    return PrzedzialUfnosci(
+        srednia=_jako_liczba(srednia),
+        wariancja=_jako_liczba(wariancja),
+        polowa_szerokosci=_jako_liczba(polowa_szerokosci),
+        liczba_obserwacji=n,
+        poziom_ufnosci=poziom_ufnosci,
+    )
+
+
+def mser(
+    wartosci: Sequence[float],
+    rozmiar_paczki: int = 5,
+    wagi: Optional[Sequence[float]] = None,
+) -> Optional[int]:
+    # Długość okresu rozgrzewki metodą MSER-b (domyślnie MSER-5): wartości są
+    # łączone w paczki po rozmiar_paczki, a dla każdej liczby d odrzucanych
+    # początkowych paczek (najwyżej połowy) liczony jest kwadrat błędu
+    # standardowego średniej pozostałych paczek; wybierane jest d z
+    # najmniejszym. Zwraca liczbę odrzucanych wartości albo None, gdy
+    # minimum wypada na końcu rozważanego zakresu, czyli seria jest za krótka,
+    # żeby wykryć stan ustalony.
+    #
+    # Z wagami wartości są sumami (np. czasów oczekiwania klientów obsłużonych
+    # w danej jednostce czasu), a wagi liczebnościami; średnia paczki to
+    # iloraz sum, a paczki ważone są liczebnościami.
+    x = np.asarray(wartosci, dtype=float)
+    w = np.ones_like(x) if wagi is None else np.asarray(wagi, dtype=float)
+    liczba_paczek = len(x) // rozmiar_paczki
+    if liczba_paczek < 4:
+        return None
+    n = liczba_paczek * rozmiar_paczki
+    sumy = x[:n].reshape(liczba_paczek, rozmiar_paczki).sum(axis=1)
+    wagi_paczek = w[:n].reshape(liczba_paczek, rozmiar_paczki).sum(axis=1)
+    kwadraty = np.divide(
+        sumy**2, wagi_paczek, out=np.zeros(liczba_paczek), where=wagi_paczek > 0
+    )
+    # Sumy od paczki d do końca, dla d od 0 do połowy paczek
+    d = np.arange(liczba_paczek // 2 + 1)
+    S = np.cumsum(sumy[::-1])[::-1][d]
+    W = np.cumsum(wagi_paczek[::-1])[::-1][d]
+    Q = np.cumsum(kwadraty[::-1])[::-1][d]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kryterium = np.where(W > 0, (Q - S**2 / W) / W**2, np.inf)
+    najlepsze = int(np.argmin(kryterium))
+    if najlepsze == len(d) - 1:
+        return None
+    return najlepsze * rozmiar_paczki
+
+
+def punkt_obciecia(seria, wagi=None, rozmiar_paczki: int = 5) -> Optional[int]:
+    # mser dla szeregu czasowego modelu: listy wartości na jednostkę czasu
+    # albo SzeregZdziesiatkowany (trybu strumieniowego), którego punkty są
+    # już średnimi z `krok` jednostek; wynik w jednostkach czasu
+    if not isinstance(seria, SzeregZdziesiatkowany):
+        return mser(seria, rozmiar_paczki, wagi)
+    krok = seria.krok
+    liczba_punktow = len(seria.sumy)  # Bez niepełnego ostatniego punktu
+    obciecie = mser(
+        seria.wartosci()[:liczba_punktow],
+        max(1, -(-rozmiar_paczki // krok)),
+        None if wagi is None else wagi.wartosci()[:liczba_punktow],
+    )
+    return None if obciecie is None else obciecie * krok
+
+
+@dataclass
+class PrzedzialSredniePaczek(PrzedzialUfnosci):
+    # liczba_obserwacji to liczba paczek
+    rozmiar_paczki: int  # W jednostkach czasu
+
+    def __str__(self):
+        return (
+            f"{_format(self.srednia)} ± {_format(self.polowa_szerokosci)} "
+            f"(wariancja {_format(self.wariancja)}, {self.liczba_obserwacji} "
+            f"paczek po {self.rozmiar_paczki})"
+        )
+
+
+def srednie_paczek(
+    wartosci: Sequence[float],
+    wagi: Optional[Sequence[float]] = None,
+    rozmiar_paczki: int = 1,
+    min_liczba_paczek: int = 10,
+    max_liczba_paczek: int = 40,
+    poziom_ufnosci: float = 0.95,
+) -> PrzedzialSredniePaczek:
+    # Przedział ufności dla średniej w stanie ustalonym z jednego długiego
+    # przebiegu, metodą średnich z rozłącznych paczek. Wartości to kolejne
+    # obserwacje albo średnie z paczek po rozmiar_paczki jednostek czasu (np.
+    # punkty SzeregZdziesiatkowany). Rozmiar paczek dobierany jest
+    # automatycznie: sąsiednie paczki łączone są parami, dopóki jest ich
+    # więcej niż max_liczba_paczek albo autokorelacja rzędu 1 średnich paczek
+    # jest istotna (test jednostronny na poziomie 5%) i zostaje co najmniej
+    # 2 * min_liczba_paczek paczek. Przy wielu małych paczkach test nie
+    # wykrywa słabej korelacji, która zaniża wariancję. Wagi jak w mser.
+    sumy = np.asarray(wartosci, dtype=float)
+    wagi_paczek = np.ones_like(sumy) if wagi is None else np.asarray(wagi, float)
+    prog = NormalDist().inv_cdf(0.95)
+    while True:
+        niepuste = wagi_paczek > 0
+        srednie = sumy[niepuste] / wagi_paczek[niepuste]
+        k = len(srednie)
+        if k < 2 * min_liczba_paczek:
+            break
+        if k <= max_liczba_paczek and _autokorelacja(srednie) <= prog / np.sqrt(k):
+            break
+        parzyste = len(sumy) // 2 * 2
+        sumy = sumy[:parzyste].reshape(-1, 2).sum(axis=1)
+        wagi_paczek = wagi_paczek[:parzyste].reshape(-1, 2).sum(axis=1)
+        rozmiar_paczki *= 2
+    calkowita_waga = wagi_paczek.sum()
+    srednia = sumy.sum() / calkowita_waga if calkowita_waga else 0.0
+    if k > 1:
+        wariancja = float(srednie.var(ddof=1))
+        polowa_szerokosci = kwantyl_t(k - 1, (1 + poziom_ufnosci) / 2) * np.sqrt(
+            wariancja / k
+        )
+    else:
+        wariancja, polowa_szerokosci = 0.0, np.inf
+    return PrzedzialSredniePaczek(
+        srednia=float(srednia),
+        wariancja=wariancja,
+        polowa_szerokosci=float(polowa_szerokosci),
+        liczba_obserwacji=k,
+        poziom_ufnosci=poziom_ufnosci,
+        rozmiar_paczki=rozmiar_paczki,
+    )
+
+
+def srednie_paczek_szeregu(
+    seria, wagi=None, pomin: int = 0, **opcje
+) -> PrzedzialSredniePaczek:
+    # srednie_paczek dla szeregu czasowego modelu (listy albo
+    # SzeregZdziesiatkowany, bez jego niepełnego ostatniego punktu), bez
+    # pierwszych `pomin` jednostek czasu (np. rozgrzewki)
+    if not isinstance(seria, SzeregZdziesiatkowany):
+        return srednie_paczek(
+            seria[pomin:], None if wagi is None else wagi[pomin:], 1, **opcje
+        )
+    krok = seria.krok
+    poczatek, koniec = -(-pomin // krok), len(seria.sumy)
+    return srednie_paczek(
+        seria.wartosci()[poczatek:koniec],
+        None if wagi is None else wagi.wartosci()[poczatek:koniec],
+        krok,
+        **opcje,
+    )
+
+
+def _autokorelacja(x: np.ndarray) -> float:
+    # Autokorelacja rzędu 1
+    odchylenia = x - x.mean()
+    mianownik = odchylenia @ odchylenia
+    if not mianownik:
+        return 0.0
+    return float(odchylenia[:-1] @ odchylenia[1:] / mianownik)
+
+
+def _jako_liczba(wartosc: np.ndarray) -> Liczby:
+    return float(wartosc) if np.ndim(wartosc) == 0 else wartosc
+
+
+def _format(wartosc: Liczby) -> str:
+    if np.ndim(wartosc) == 0:
+        return f"{wartosc:.4g}"
+    return "[" + ", ".join(f"{w:.4g}" for w in np.ravel(wartosc)) + "]"
@@ -0,0 +1,322 @@
+# Statystyki zbierane strumieniowo, w pamięci niezależnej od długości
+# symulacji: średnia i wariancja liczone online (Welford), histogram o stałej
+# liczbie kubełków, który przy wartościach spoza zakresu podwaja szerokość
+# kubełków, oraz szereg czasowy o stałej liczbie punktów, w którym sąsiednie
+# punkty są uśredniane, gdy brakuje miejsca.
+#
+# Rozklad i SzeregZdziesiatkowany mają metodę append jak lista, więc modele
+# mogą używać ich zamiast list; funkcje suma, srednia, dopisz i punkty
+# obsługują oba rodzaje serii.
+import math
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class Momenty:
+    # Liczba, średnia, wariancja, minimum i maksimum wartości (Welford)
+    def __init__(self):
+        self.liczba = 0
+        self.srednia = 0.0
+        self.m2 = 0.0  # Suma kwadratów odchyleń od średniej
+        self.minimum = math.inf
+        self.maksimum = -math.inf
+
+    @property
+    def wariancja(self) -> float:
+        return self.m2 / (self.liczba - 1) if self.liczba > 1 else 0.0
+
+    def dodaj(self, x: float):
+        self.liczba += 1
+        delta = x - self.srednia
+        self.srednia += delta / self.liczba
+        self.m2 += delta * (x - self.srednia)
+        if x < self.minimum:
+            self.minimum = x
+        if x > self.maksimum:
+            self.maksimum = x
+
+    def dodaj_wiele(self, wartosci: np.ndarray):
+        # Połączenie z momentami całej paczki (wzór Chana)
+        n = len(wartosci)
+        if not n:
+            return
+        srednia = float(wartosci.mean())
+        m2 = float(((wartosci - srednia) ** 2).sum())
+        liczba = self.liczba + n
+        delta = srednia - self.srednia
+        self.srednia += delta * n / liczba
+        self.m2 += m2 + delta**2 * self.liczba * n / liczba
+        self.liczba = liczba
+        self.minimum = min(self.minimum, float(wartosci.min()))
+        self.maksimum = max(self.maksimum, float(wartosci.max()))
+
+
+class Histogram:
+    # Histogram wartości nieujemnych: liczba_kubelkow kubełków o szerokości
+    # `szerokosc` od zera. Wartość spoza zakresu łączy sąsiednie kubełki
+    # parami (szerokość rośnie dwukrotnie), więc zakres zawsze obejmuje
+    # wszystkie wartości, a dla czasów całkowitych i szerokości 1 histogram
+    # jest dokładny, dopóki wartości nie przekroczą liczba_kubelkow.
+    def __init__(self, liczba_kubelkow: int = 1024, szerokosc: float = 1.0):
+        if liczba_kubelkow % 2:
+            raise ValueError("Liczba kubełków musi być parzysta")
+        self.szerokosc = szerokosc
+        self.liczebnosci = np.zeros(liczba_kubelkow, dtype=np.int64)
+
+    def __len__(self):
+        return int(self.liczebnosci.sum())
+
+    def dodaj(self, x: float):
+        kubelek = int(max(x, 0) // self.szerokosc)
+        while kubelek >= len(self.liczebnosci):
+            self._scal()
+            kubelek //= 2
+        self.liczebnosci[kubelek] += 1
+
+    def dodaj_wiele(self, wartosci: np.ndarray):
+        if not len(wartosci):
+            return
+        kubelki = (np.maximum(wartosci, 0) // self.szerokosc).astype(np.int64)
+        while kubelki.max() >= len(self.liczebnosci):
+            self._scal()
+            kubelki //= 2
+        self.liczebnosci += np.bincount(kubelki, minlength=len(self.liczebnosci))
+
+    def krawedzie(self) -> np.ndarray:
+        return np.arange(len(self.liczebnosci) + 1) * self.szerokosc
+
+    def kwantyl(self, p: float) -> float:
+        # Dolna krawędź kubełka, w którym wypada kwantyl rzędu p (dokładność
+        # do szerokości kubełka)
+        skumulowane = self.liczebnosci.cumsum()
+        if not skumulowane[-1]:
+            return math.nan
+        kubelek = int(np.searchsorted(skumulowane, p * skumulowane[-1]))
+        return kubelek * self.szerokosc
+
+    def _scal(self):
+        self.liczebnosci = np.concatenate(
+            (
+                self.liczebnosci.reshape(-1, 2).sum(axis=1),
+                np.zeros(len(self.liczebnosci) // 2, dtype=np.int64),
+            )
+        )
+        self.szerokosc *= 2
+
+
+class Rozklad:
+    # Zamiast listy obserwacji (np. czasów oczekiwania): momenty i histogram.
+    # Obserwacje trafiają najpierw do bufora o stałym rozmiarze i są
+    # dołączane paczkami, bo dopisywanie kilku wartości na jednostkę czasu
+    # prosto do tablic NumPy kosztuje więcej niż sama symulacja.
+    def __init__(
+        self,
+        liczba_kubelkow: int = 1024,
+        szerokosc: float = 1.0,
+        rozmiar_bufora: int = 4096,
+    ):
+        self._momenty = Momenty()
+        self._histogram = Histogram(liczba_kubelkow, szerokosc)
+        self._suma = 0
+        self._bufor: List[float] = []
+        self.rozmiar_bufora = rozmiar_bufora
+
+    def __len__(self):
+        return self._momenty.liczba + len(self._bufor)
+
+    @property
+    def momenty(self) -> Momenty:
+        self._oproznij()
+        return self._momenty
+
+    @property
+    def histogram(self) -> Histogram:
+        self._oproznij()
+        return self._histogram
+
+    @property
+    def suma(self) -> float:
+        self._oproznij()
+        return self._suma
+
+    @property
+    def srednia(self) -> float:
+        return self.momenty.srednia
+
+    def kwantyl(self, p: float) -> float:
+        return self.histogram.kwantyl(p)
+
+    def append(self, x: float):
+        self._bufor.append(x)
+        if len(self._bufor) >= self.rozmiar_bufora:
+            self._oproznij()
+
+    def extend(self, wartosci: Sequence[float]):
+        if isinstance(wartosci, np.ndarray):
+            wartosci = wartosci.tolist()
+        self._bufor.extend(wartosci)
+        if len(self._bufor) >= self.rozmiar_bufora:
+            self._oproznij()
+
+    def _oproznij(self):
+        if not self._bufor:
+            return
+        wartosci = np.array(self._bufor)
+        self._bufor = []
+        self._momenty.dodaj_wiele(wartosci)
+        self._histogram.dodaj_wiele(wartosci)
+        self._suma += wartosci.sum().item()
+
+
+class SzeregZdziesiatkowany:
+    # Szereg czasowy o co najwyżej `pojemnosc` punktach: każdy punkt to
+    # średnia `krok` kolejnych wartości. Gdy punkty się skończą, sąsiednie
+    # pary są łączone, a krok podwaja się.
+    def __init__(self, pojemnosc: int = 2048):
+        if pojemnosc % 2:
+            raise ValueError("Pojemność musi być parzysta")
+        self.pojemnosc = pojemnosc
+        self.krok = 1
+        self.sumy: List[float] = []  # Sumy pełnych punktów (po krok wartości)
+        self.biezaca_suma = 0
+        self.biezaca_liczba = 0
+        self.liczba = 0
+        self.suma = 0
+
+    def __len__(self):
+        return self.liczba
+
+    def append(self, wartosc: float, powtorzenia: int = 1):
+        self.liczba += powtorzenia
+        self.suma += wartosc * powtorzenia
+        if self.biezaca_liczba + powtorzenia < self.krok:
+            # Najczęstszy przypadek: bieżący punkt się nie zapełnia
+            self.biezaca_suma += wartosc * powtorzenia
+            self.biezaca_liczba += powtorzenia
+            return
+        while powtorzenia:
+            ile = min(powtorzenia, self.krok - self.biezaca_liczba)
+            self.biezaca_suma += wartosc * ile
+            self.biezaca_liczba += ile
+            powtorzenia -= ile
+            if self.biezaca_liczba == self.krok:
+                if len(self.sumy) == self.pojemnosc:
+                    self._scal()
+                    if self.biezaca_liczba < self.krok:
+                        continue
+                self.sumy.append(self.biezaca_suma)
+                self.biezaca_suma = 0
+                self.biezaca_liczba = 0
+
+    def extend(self, wartosci):
+        for wartosc in wartosci:
+            self.append(wartosc)
+
+    def append_ciagu(self, suma: Callable[[int, int], float], liczba: int):
+        # Dopisuje `liczba` kolejnych wartości ciągu podanego sumami jego
+        # fragmentów: suma(od, do) to suma wartości o numerach od, ..., do - 1
+        # (licząc od 0 w obrębie ciągu). Koszt zależy od liczby punktów, na
+        # które ciąg się rozkłada, a nie od jego długości.
+        if self.biezaca_liczba + liczba < self.krok:
+            # Bieżący punkt się nie zapełnia
+            czesc = suma(0, liczba)
+            self.liczba += liczba
+            self.suma += czesc
+            self.biezaca_suma += czesc
+            self.biezaca_liczba += liczba
+            return
+        poczatek = 0
+        while poczatek < liczba:
+            ile = min(liczba - poczatek, self.krok - self.biezaca_liczba)
+            czesc = suma(poczatek, poczatek + ile)
+            poczatek += ile
+            self.liczba += ile
+            self.suma += czesc
+            self.biezaca_suma += czesc
+            self.biezaca_liczba += ile
+            if self.biezaca_liczba == self.krok:
+                if len(self.sumy) == self.pojemnosc:
+                    self._scal()
+                    if self.biezaca_liczba < self.krok:
+                        continue
+                self.sumy.append(self.biezaca_suma)
+                self.biezaca_suma = 0
+                self.biezaca_liczba = 0
+
+    def wartosci(self) -> np.ndarray:
+        wartosci = np.array(self.sumy, dtype=float) / self.krok
+        if self.biezaca_liczba:
+            wartosci = np.append(wartosci, self.biezaca_suma / self.biezaca_liczba)
+        return wartosci
+
+    def indeksy(self) -> np.ndarray:
+        # Środek przedziału indeksów (numerów wartości) każdego punktu
+        srodki = np.arange(len(self.sumy)) * self.krok + (self.krok - 1) / 2
+        if self.biezaca_liczba:
+            srodki = np.append(
+                srodki, len(self.sumy) * self.krok + (self.biezaca_liczba - 1) / 2
+            )
+        return srodki
+
+    def _scal(self):
+        sumy = self.sumy
+        self.sumy = [sumy[i] + sumy[i + 1] for i in range(0, len(sumy), 2)]
+        self.krok *= 2
+
+
+def suma(wartosci) -> float:
+    # Suma wartości listy, tablicy, Rozklad lub SzeregZdziesiatkowany
+    if isinstance(wartosci, (Rozklad, SzeregZdziesiatkowany)):
+        return wartosci.suma
+    if isinstance(wartosci, np.ndarray):
+        return wartosci.sum().item()
+    return sum(wartosci)
+
+
+def srednia(wartosci) -> float:
+    return suma(wartosci) / len(wartosci) if len(wartosci) else 0
+
+
+def suma_od(seria, poczatek: int) -> float:
+    # Suma wartości szeregu od numeru `poczatek` (w SzeregZdziesiatkowany
+    # zaokrąglonego w dół do początku punktu)
+    if isinstance(seria, SzeregZdziesiatkowany):
+        return sum(seria.sumy[poczatek // seria.krok :]) + seria.biezaca_suma
+    return suma(seria[poczatek:])
+
+
+def liczba_od(seria, poczatek: int) -> int:
+    if isinstance(seria, SzeregZdziesiatkowany):
+        poczatek = poczatek // seria.krok * seria.krok
+    return max(len(seria) - poczatek, 0)
+
+
+def srednia_od(seria, poczatek: int) -> float:
+    liczba = liczba_od(seria, poczatek)
+    return suma_od(seria, poczatek) / liczba if liczba else 0
+
+
+def dopisz(seria, wartosc: float, powtorzenia: int = 1):
+    # Dopisuje wartość `powtorzenia` razy na koniec listy lub szeregu
+    if isinstance(seria, SzeregZdziesiatkowany):
+        seria.append(wartosc, powtorzenia)
+    else:
+        seria.extend([wartosc] * powtorzenia)
+
+
+def punkty(seria) -> Tuple[np.ndarray, np.ndarray]:
+    # (numery jednostek czasu, wartości) do narysowania szeregu
+    if isinstance(seria, SzeregZdziesiatkowany):
+        return seria.indeksy(), seria.wartosci()
+    return np.arange(len(seria)), np.asarray(seria)
+
+
+def dane_histogramu(wartosci) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # (wartości, wagi) dla plt.hist: obserwacje bez wag albo niepuste
+    # kubełki histogramu Rozklad z liczebnościami jako wagami
+    if isinstance(wartosci, Rozklad):
+        histogram = wartosci.histogram
+        niepuste = np.flatnonzero(histogram.liczebnosci)
+        return niepuste * histogram.szerokosc, histogram.liczebnosci[niepuste]
+    return np.asarray(wartosci), None
@@ -0,0 +1,153 @@
+# Pomocnicze funkcje do wykresów.
+#
+# Leniwe ładowanie matplotlib: import pyplot trwa kilkaset milisekund, a
+# modele potrzebują go tylko wtedy, gdy rysują wykresy. Domyślnie wybierany
+# jest nieinteraktywny backend Agg (wykresy zapisywane do plików), więc
+# rysowanie działa też na maszynach bez ekranu.
+#
+# Długie serie (np. 10^6 jednostek czasu) można przed rysowaniem zmniejszyć
+# do kilku tysięcy punktów metodą min/max albo LTTB, zachowując kształt
+# wykresu, a niezależne wykresy rysować równolegle w puli procesów.
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Backend używany, gdy nie wybrano innego (zmienna MPLBACKEND)
+DOMYSLNY_BACKEND = "Agg"
+# Łączna liczba punktów serii wszystkich wykresów, od której rysuj() używa
+# domyślnie puli procesów
+MIN_PUNKTOW_PULI = 100_000
+
+
+def pyplot(interaktywny: bool = False):
+    # Zwraca moduł matplotlib.pyplot. interaktywny=True zostawia matplotlib
+    # wybór backendu (okna dla plt.show(), o ile jest ekran).
+    if (
+        not interaktywny
+        and "matplotlib.pyplot" not in sys.modules
+        and "MPLBACKEND" not in os.environ
+    ):
+        import matplotlib
+
+        matplotlib.use(DOMYSLNY_BACKEND)
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def min_max(
+    x: Sequence[float], y: Sequence[float], liczba_punktow: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Seria dzielona jest na liczba_punktow / 2 kubełków; z każdego zostają
+    # punkty z najmniejszą i największą wartością (w kolejności w serii),
+    # więc szczyty i spadki pozostają widoczne
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    liczba_kubelkow = max(1, liczba_punktow // 2)
+    if n <= liczba_punktow:
+        return x, y
+    rozmiar = -(-n // liczba_kubelkow)
+    # Dopełnienie ostatnią wartością, żeby seria dała się podzielić na wiersze
+    kubelki = np.concatenate((y, np.full(rozmiar * liczba_kubelkow - n, y[-1])))
+    kubelki = kubelki.reshape(liczba_kubelkow, rozmiar)
+    poczatki = np.arange(liczba_kubelkow) * rozmiar
+    indeksy = np.concatenate(
+        (
+            [0, n - 1],
+            poczatki + kubelki.argmin(axis=1),
+            poczatki + kubelki.argmax(axis=1),
+        )
+    )
+    indeksy = np.unique(np.minimum(indeksy, n - 1))
+    return x[indeksy], y[indeksy]
+
+
+def lttb(
+    x: Sequence[float], y: Sequence[float], liczba_punktow: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Largest-Triangle-Three-Buckets: z każdego kubełka zostaje punkt, który
+    # z punktem wybranym z poprzedniego kubełka i średnią następnego tworzy
+    # trójkąt o największym polu. Pierwszy i ostatni punkt zostają zawsze.
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= liczba_punktow or liczba_punktow < 3:
+        return x, y
+    granice = np.linspace(1, n - 1, liczba_punktow - 1).astype(int)
+    indeksy = np.empty(liczba_punktow, dtype=int)
+    indeksy[0], indeksy[-1] = 0, n - 1
+    a = 0
+    for k in range(liczba_punktow - 2):
+        poczatek, koniec = granice[k], granice[k + 1]
+        # Średnia następnego kubełka (dla ostatniego: ostatni punkt)
+        if k + 2 < len(granice):
+            nastepny = slice(koniec, granice[k + 2])
+        else:
+            nastepny = slice(n - 1, n)
+        sx, sy = x[nastepny].mean(), y[nastepny].mean()
+        pola = np.abs(
+            (x[a] - sx) * (y[poczatek:koniec] - y[a])
+            - (x[a] - x[poczatek:koniec]) * (sy - y[a])
+        )
+        a = poczatek + int(pola.argmax())
+        indeksy[k + 1] = a
+    return x[indeksy], y[indeksy]
+
+
+METODY_ZMNIEJSZANIA = {"min_max": min_max, "lttb": lttb}
+
+
+def zmniejsz(
+    x: Sequence[float],
+    y: Sequence[float],
+    liczba_punktow: Optional[int] = None,
+    metoda: str = "min_max",
+):
+    # Seria do narysowania; liczba_punktow=None oznacza serię bez zmian
+    if liczba_punktow is None or len(y) <= liczba_punktow:
+        return x, y
+    return METODY_ZMNIEJSZANIA[metoda](x, y, liczba_punktow)
+
+
+def rysuj(zadania: List[Tuple[Callable, tuple]], max_workers: Optional[int] = None):
+    # Zadanie to (funkcja, argumenty) rysujące i zapisujące jeden wykres;
+    # funkcje muszą być zdefiniowane na poziomie modułu, a argumenty dać się
+    # przesłać do innego procesu. max_workers=1 rysuje w bieżącym procesie,
+    # max_workers > 1 w puli procesów, a None wybiera pulę tylko dla kilku
+    # wykresów z długimi seriami: uruchomienie procesów (i import matplotlib
+    # w każdym z nich) kosztuje więcej niż narysowanie krótkich serii.
+    if max_workers is None:
+        punkty = sum(_liczba_punktow(argumenty) for _, argumenty in zadania)
+        liczba_procesow = min(_liczba_procesorow(), len(zadania))
+        if punkty < MIN_PUNKTOW_PULI:
+            liczba_procesow = 1
+    else:
+        liczba_procesow = min(max_workers, len(zadania))
+    if liczba_procesow <= 1:
+        for funkcja, argumenty in zadania:
+            funkcja(*argumenty)
+        return
+    with ProcessPoolExecutor(max_workers=liczba_procesow) as pula:
+        wyniki = [pula.submit(funkcja, *argumenty) for funkcja, argumenty in zadania]
+        for wynik in wyniki:
+            wynik.result()  # Przekazuje wyjątki z procesów
+
+
+def _liczba_procesorow() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _liczba_punktow(obiekt) -> int:
+    # Liczba wartości liczbowych w argumentach wykresu (tablice, listy serii
+    # i zagnieżdżone krotki)
+    if isinstance(obiekt, np.ndarray):
+        return obiekt.size
+    if isinstance(obiekt, (list, tuple)):
+        if obiekt and isinstance(obiekt[0], (int, float, np.generic)):
+            return len(obiekt)
+        return sum(_liczba_punktow(element) for element in obiekt)
+    return 0
@@ -0,0 +1,118 @@
+# Analytic model of the network as an open Jackson network: every stage is an
+# M/M/1 queue with exponential service, requests arrive from outside as
+# Poisson streams and are routed between stages with fixed probabilities
+# (per request class). Solving the traffic equations gives the arrival rate
+# of every stage; the stationary distribution has the product form
+# P(n_1, ..., n_K) = prod_k (1 - rho_k) * rho_k ** n_k.
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class JacksonResult:
+    stages: List[str]
+    arrival_rates: np.ndarray  # Total arrival rate of every stage (lambda)
+    service_rates: np.ndarray  # mu
+    utilization: np.ndarray  # rho = lambda / mu
+    mean_queue_length: np.ndarray  # Mean number of requests at the stage, L
+    mean_waiting_time: np.ndarray  # Mean time in the queue, Wq
+    mean_sojourn_time: np.ndarray  # Mean time at the stage, W = L / lambda
+
+    @property
+    def stable(self) -> bool:
+        return bool(np.all(self.utilization < 1))
+
+    def marginal(self, stage, amount):
+        # Probability of `amount` requests at the stage (name or index);
+        # amount may be an array
+        k = self.stages.index(stage) if isinstance(stage, str) else stage
+        rho = self.utilization[k]
+        if rho >= 1:
+            return np.zeros_like(amount, dtype=float)
+        return (1 - rho) * rho ** np.asarray(amount)
+
+    def state_probability(self, state: Sequence[int]) -> float:
+        # Stationary probability of state = numbers of requests at the stages
+        if len(state) != len(self.stages):
+            raise ValueError(
+                f"State has {len(state)} stages, the network has {len(self.stages)}"
+            )
+        return float(np.prod([self.marginal(k, n) for k, n in enumerate(state)]))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "arrival_rate": float(self.arrival_rates[k]),
+                "utilization": float(self.utilization[k]),
+                "mean_queue_length": float(self.mean_queue_length[k]),
+                "mean_waiting_time": float(self.mean_waiting_time[k]),
+                "mean_sojourn_time": float(self.mean_sojourn_time[k]),
+            }
+            for k, stage in enumerate(self.stages)
+        }
+
+
+def solve_traffic_equations(
+    external_rates: np.ndarray, routing: np.ndarray
+) -> np.ndarray:
+    # lambda = gamma + P^T lambda for every class; external_rates has shape
+    # (K,) or (C, K), routing (K, K) or (C, K, K) with routing[c, i, j] the
+    # probability of going from stage i to stage j. Returns class arrival
+    # rates with the shape of external_rates.
+    external_rates = np.asarray(external_rates, dtype=float)
+    routing = np.asarray(routing, dtype=float)
+    identity = np.eye(routing.shape[-1])
+    return np.linalg.solve(
+        identity - np.swapaxes(routing, -1, -2), external_rates[..., None]
+    )[..., 0]
+
+
+def jackson_network(
+    stages: List[str],
+    service_rates: Sequence[float],
+    external_rates: np.ndarray,
+    routing: np.ndarray,
+) -> JacksonResult:
+    # Arguments as in solve_traffic_equations; service rates are the same for
+    # all classes
+    class_rates = solve_traffic_equations(external_rates, routing)
+    arrival_rates = class_rates.reshape(-1, len(stages)).sum(axis=0)
+    service_rates = np.asarray(service_rates, dtype=float)
+    rho = arrival_rates / service_rates
+    stable = rho < 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_queue_length = np.where(stable, rho / (1 - rho), np.inf)
+        mean_sojourn_time = np.where(
+            stable, 1 / (service_rates - arrival_rates), np.inf
+        )
+        mean_waiting_time = np.where(
+            stable, mean_sojourn_time - 1 / service_rates, np.inf
+        )
+    return JacksonResult(
+        stages=list(stages),
+        arrival_rates=arrival_rates,
+        service_rates=service_rates,
+        utilization=rho,
+        mean_queue_length=mean_queue_length,
+        mean_waiting_time=mean_waiting_time,
+        mean_sojourn_time=mean_sojourn_time,
+    )
+
+
+def routing_matrices(
+    stages: List[str],
+    routing: Dict[str, Dict[str, List[Tuple[Optional[str], float]]]],
+    request_types: Sequence[str],
+) -> np.ndarray:
+    # Routing in the form of siecv2.ROUTING (stage -> type -> [(next stage or
+    # None, probability)]) as matrices [type, stage, next stage]; moves to
+    # stages not in `stages` and to None leave the network
+    matrices = np.zeros((len(request_types), len(stages), len(stages)))
+    for i, stage in enumerate(stages):
+        for c, request_type in enumerate(request_types):
+            for target, probability in routing.get(stage, {}).get(request_type, []):
+                if target in stages:
+                    matrices[c, i, stages.index(target)] += probability
+    return matrices
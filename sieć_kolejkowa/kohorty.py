@@ -0,0 +1,330 @@
+# Cohort mode of the siecv2 network: instead of individual requests, each
+# stage queue holds cohorts, i.e. counts of requests of one type that entered
+# the stage in the same time unit with the same history (arrival time and
+# waiting time so far). Requests of a cohort behave identically, so a stage
+# serves whole cohorts (splitting the last one) and a cohort leaving transit
+# is split among the next stages with one multinomial draw. The cost of a time
+# unit depends on the number of cohorts, not on the number of requests.
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from narzedzia.losowanie import StrumienieLosowe, pula_calkowitych
+from sieć_kolejkowa.siecv2 import (
+    REQUEST_TYPES,
+    REQUEST_TYPE_PROBABILITIES,
+    REQUEST_TYPES_BY_PRIORITY,
+    ROUTING,
+    STAGE_CAPACITIES,
+    SimulationResult,
+    compile_routing,
+    generate_plots,
+    print_statistics,
+    stage_series,
+)
+
+
+class CohortStage:
+    def __init__(
+        self,
+        name: str,
+        capacity: float,
+        capacity_range: Optional[Tuple[int, int]] = None,
+        transit_time: int = 1,
+        rng: Optional[np.random.Generator] = None,
+        routing_rng: Optional[np.random.Generator] = None,
+    ):
+        if transit_time < 0:
+            raise ValueError(f"transit_time must be non-negative, got {transit_time}")
+        self.name = name
+        self.capacity = capacity
+        self.capacity_range = capacity_range
+        if capacity_range is not None:
+            self.capacity_pool = pula_calkowitych(
+                rng if rng is not None else np.random.default_rng(), *capacity_range
+            )
+        self.routing_rng = (
+            routing_rng if routing_rng is not None else np.random.default_rng()
+        )
+        # Cohorts waiting to be processed, one FIFO queue per request type;
+        # a cohort is [entry time, arrival time, waiting time so far, count]
+        self.queues: Dict[str, Deque[List[int]]] = {
+            request_type: deque() for request_type in REQUEST_TYPES_BY_PRIORITY
+        }
+        self.queue_length = 0  # Total number of requests in the queues
+        self.transit_time = transit_time
+        # Cohorts in transit, bucketed by arrival time at the next stage:
+        # (type, arrival time, waiting time, count)
+        self.transit_queue: Dict[int, List[Tuple[str, int, int, int]]] = defaultdict(
+            list
+        )
+        self.transit_count = 0
+        # Next stages with their probabilities, by request type
+        self.next_stages: Dict[
+            str, Tuple[List[Optional["CohortStage"]], np.ndarray]
+        ] = {}
+        self.statistics = {request_type: 0 for request_type in REQUEST_TYPES}
+        # Requests that have left the system from this stage, by type
+        self.exited = {request_type: 0 for request_type in REQUEST_TYPES}
+        self.exited_time_in_system = 0
+        self.queue_lengths = []
+        self.utilization = []
+        self.processed_per_time = []
+        self.time = []
+        self.capacity_history = []
+        self.max_queue_length = 0
+        # Sum and number of the waiting times of processed requests
+        self.total_waiting_time = 0
+        self.waiting_count = 0
+        self.avg_waiting_times = []
+        self.waiting_time_sums = []
+
+    def set_routing(
+        self, routing: Dict[str, List[Tuple[Optional["CohortStage"], float]]]
+    ):
+        # The same routing table as siecv2.Stage.set_routing
+        targets, probabilities = compile_routing(routing)
+        for code, request_type in enumerate(REQUEST_TYPES):
+            possible = np.flatnonzero(probabilities[code])
+            self.next_stages[request_type] = (
+                [targets[k] for k in possible],
+                probabilities[code, possible],
+            )
+
+    def receive(self, cohorts: List[Tuple[str, int, int, int]], current_time: int):
+        for request_type, arrival_time, waiting_time, count in cohorts:
+            queue = self.queues[request_type]
+            if (
+                queue
+                and queue[-1][0] == current_time
+                and queue[-1][1] == arrival_time
+                and queue[-1][2] == waiting_time
+            ):
+                queue[-1][3] += count
+            else:
+                queue.append([current_time, arrival_time, waiting_time, count])
+            self.queue_length += count
+
+    def process(self, current_time: int):
+        if self.capacity_range is not None:
+            self.capacity = self.capacity_pool.nastepna()
+        self.capacity_history.append(self.capacity)
+
+        total_processed = 0
+        waiting_time_this_unit = 0
+        transit = self.transit_queue[current_time + self.transit_time]
+        for request_type in REQUEST_TYPES_BY_PRIORITY:
+            queue = self.queues[request_type]
+            while queue and total_processed < self.capacity:
+                cohort = queue[0]
+                entry_time, arrival_time, waiting_time, count = cohort
+                taken = min(count, self.capacity - total_processed)
+                if taken == count:
+                    queue.popleft()
+                else:
+                    cohort[3] -= taken
+                waiting_time += current_time - entry_time
+                waiting_time_this_unit += waiting_time * taken
+                transit.append((request_type, arrival_time, waiting_time, taken))
+                self.statistics[request_type] += taken
+                total_processed += taken
+            if total_processed >= self.capacity:
+                break  # Reached max capacity
+
+        self.queue_length -= total_processed
+        self.transit_count += total_processed
+        if not transit:
+            del self.transit_queue[current_time + self.transit_time]
+
+        self.queue_lengths.append(self.queue_length)
+        self.max_queue_length = max(self.max_queue_length, self.queue_length)
+        self.utilization.append(
+            (total_processed / self.capacity) * 100 if self.capacity > 0 else 0
+        )
+        self.processed_per_time.append(total_processed)
+        self.time.append(current_time)
+        self.total_waiting_time += waiting_time_this_unit
+        self.waiting_count += total_processed
+        self.avg_waiting_times.append(
+            waiting_time_this_unit / total_processed if total_processed else 0
+        )
+        self.waiting_time_sums.append(waiting_time_this_unit)
+
+    def update_transit(self, current_time: int):
+        arrived = self.transit_queue.pop(current_time, [])
+        if not arrived:
+            return
+        routed: Dict[CohortStage, List[Tuple[str, int, int, int]]] = defaultdict(list)
+        exited_time_in_system = 0
+        for request_type, arrival_time, waiting_time, count in arrived:
+            self.transit_count -= count
+            next_stages, probabilities = self.next_stages.get(
+                request_type, ([None], None)
+            )
+            if len(next_stages) == 1:
+                counts = [count]
+            else:
+                counts = self.routing_rng.multinomial(count, probabilities).tolist()
+            for next_stage, routed_count in zip(next_stages, counts):
+                if not routed_count:
+                    continue
+                if next_stage is None:
+                    self.exited[request_type] += routed_count
+                    exited_time_in_system += routed_count * (
+                        current_time - arrival_time
+                    )
+                else:
+                    routed[next_stage].append(
+                        (request_type, arrival_time, waiting_time, routed_count)
+                    )
+        for next_stage, cohorts in routed.items():
+            next_stage.receive(cohorts, current_time + 1)
+        self.exited_time_in_system += exited_time_in_system
+
+
+def symulacja_kohortowa(
+    czas_trwania: int,
+    transit_time: int = 1,
+    skala_przyjsc: int = 1,
+    skala_przepustowosci: Optional[int] = None,
+    pokaz_wyniki: bool = True,
+    strumienie: Optional[StrumienieLosowe] = None,
+) -> SimulationResult:
+    # skala_przyjsc multiplies the number of new requests per time unit
+    # (20-80 in siecv2), skala_przepustowosci the stage capacities (by default
+    # the same as skala_przyjsc, so the network keeps its load)
+    if strumienie is None:
+        strumienie = StrumienieLosowe()
+    if skala_przepustowosci is None:
+        skala_przepustowosci = skala_przyjsc
+
+    stages: Dict[str, CohortStage] = {}
+    for name, (capacity, capacity_range) in STAGE_CAPACITIES.items():
+        if capacity_range is not None:
+            low, high = capacity_range
+            capacity_range = (low * skala_przepustowosci, high * skala_przepustowosci)
+        stages[name] = CohortStage(
+            name,
+            capacity,
+            capacity_range=capacity_range,
+            transit_time=transit_time,
+            rng=strumienie.przepustowosci,
+            routing_rng=strumienie.trasowanie,
+        )
+    for name, routing in ROUTING.items():
+        stages[name].set_routing(
+            {
+                request_type: [
+                    (stages[target] if target is not None else None, p)
+                    for target, p in targets
+                ]
+                for request_type, targets in routing.items()
+            }
+        )
+    wszystkie_etapy = list(stages.values())
+    magazyn = wszystkie_etapy[0]
+    badania_prototypow = stages["Badania na Prototypach"]
+    wysylka = stages["Wysyłka"]
+
+    arrival_counts = pula_calkowitych(
+        strumienie.przyjscia, 20 * skala_przyjsc, 80 * skala_przyjsc
+    )
+    total_requests = 0
+
+    current_time = 0
+    while current_time < czas_trwania:
+        num_new_requests = arrival_counts.nastepna()
+        total_requests += num_new_requests
+        counts = strumienie.klasy.multinomial(
+            num_new_requests, REQUEST_TYPE_PROBABILITIES
+        )
+        magazyn.receive(
+            [
+                (request_type, current_time, 0, count)
+                for request_type, count in zip(REQUEST_TYPES, counts.tolist())
+                if count
+            ],
+            current_time,
+        )
+
+        for stage in wszystkie_etapy:
+            stage.process(current_time)
+        for stage in wszystkie_etapy:
+            stage.update_transit(current_time)
+
+        current_time += 1
+
+    total_time_in_system = (
+        badania_prototypow.exited_time_in_system + wysylka.exited_time_in_system
+    )
+    total_waiting_times = sum(stage.total_waiting_time for stage in wszystkie_etapy)
+    shipped = dict(wysylka.exited)
+    prototype_research = dict(badania_prototypow.exited)
+    total_exited = sum(shipped.values()) + sum(prototype_research.values())
+
+    result = SimulationResult(
+        simulation_time=current_time,
+        total_requests=total_requests,
+        shipped=shipped,
+        prototype_research=prototype_research,
+        total_exited=total_exited,
+        avg_time_in_system=(
+            total_time_in_system / total_exited if total_exited > 0 else 0
+        ),
+        avg_waiting_time=(
+            total_waiting_times / total_exited if total_exited > 0 else 0
+        ),
+        remaining_requests=sum(
+            stage.queue_length + stage.transit_count for stage in wszystkie_etapy
+        ),
+        stages={
+            stage.name: cohort_stage_statistics(stage) for stage in wszystkie_etapy
+        },
+        stage_series={stage.name: stage_series(stage) for stage in wszystkie_etapy},
+    )
+
+    if pokaz_wyniki:
+        print_statistics(result.statistics())
+        # Without the histograms of individual requests
+        generate_plots(result)
+
+    return result
+
+
+def cohort_stage_statistics(stage: CohortStage) -> Dict[str, object]:
+    # The same keys as siecv2.stage_statistics
+    return {
+        "queue_length": stage.queue_length,
+        "transit_count": stage.transit_count,
+        "processed": sum(stage.statistics.values()),
+        "processed_by_type": dict(stage.statistics),
+        "rejected": 0,  # Cohort stages have no queue limit
+        "avg_queue_length": (
+            sum(stage.queue_lengths) / len(stage.queue_lengths)
+            if stage.queue_lengths
+            else 0
+        ),
+        "max_queue_length": stage.max_queue_length,
+        "avg_utilization": (
+            sum(stage.utilization) / len(stage.utilization) if stage.utilization else 0
+        ),
+        "avg_waiting_time": (
+            stage.total_waiting_time / stage.waiting_count if stage.waiting_count else 0
+        ),
+        "total_waiting_time": stage.total_waiting_time,
+    }
+
+
+def replikacja(configuration: Dict[str, object], seed) -> Dict[str, object]:
+    # A single run without printing, e.g. for narzedzia.replikacje.
+    # configuration: czas_trwania, optionally transit_time, skala_przyjsc,
+    # skala_przepustowosci
+    return symulacja_kohortowa(
+        configuration["czas_trwania"],
+        transit_time=configuration.get("transit_time", 1),
+        skala_przyjsc=configuration.get("skala_przyjsc", 1),
+        skala_przepustowosci=configuration.get("skala_przepustowosci"),
+        pokaz_wyniki=False,
+        strumienie=StrumienieLosowe(seed),
+    ).statistics()
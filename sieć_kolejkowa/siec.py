@@ -1,6 +1,8 @@
 import random
-from typing import List, Optional, Tuple
-import matplotlib.pyplot as plt
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from narzedzia.wykresy import pyplot
 
 
 class Request:
@@ -11,6 +13,7 @@ class Request:
         self.type = self.assign_type()
         self.current_stage = "Magazyn Surowców"
         self.waiting_time = 0
+        self.stage_entry_time = arrival_time  # Od kiedy czeka w kolejce etapu
         self.in_transit = False
         self.next_stage_arrival_time = None
 
@@ -49,21 +52,26 @@ class Stage:
         self.time = []
         self.capacity_history = []
         self.total_waiting_time = 0  # Całkowity czas oczekiwania w kolejce
+        # Suma (waiting_time - stage_entry_time) zgłoszeń w kolejce; czas
+        # oczekiwania całej kolejki w chwili t to ta suma + len(queue) * t
+        self.queued_waiting_offset = 0
         self.max_queue_length = 0  # Maksymalna długość kolejki
 
     def add_next_stage(self, stage, condition):
         self.next_stages.append((stage, condition))
 
-    def receive(self, requests: List[Request]):
+    def receive(self, requests: List[Request], current_time: int):
         if self.queue_limit is not None:
             available_space = self.queue_limit - len(self.queue)
             if available_space <= 0:
                 # Kolejka jest pełna, odrzucamy zgłoszenia
                 return
             else:
-                self.queue.extend(requests[:available_space])
-        else:
-            self.queue.extend(requests)
+                requests = requests[:available_space]
+        for request in requests:
+            request.stage_entry_time = current_time
+            self.queued_waiting_offset += request.waiting_time - current_time
+        self.queue.extend(requests)
 
     def is_empty(self) -> bool:
         return len(self.queue) == 0
@@ -98,6 +106,10 @@ class Stage:
             for request in requests_of_type:
                 if total_processed >= self.capacity:
                     break  # Osiągnięto maksymalną przepustowość
+                self.queued_waiting_offset -= (
+                    request.waiting_time - request.stage_entry_time
+                )
+                request.waiting_time += current_time - request.stage_entry_time
                 self.process_request(request, current_time)
                 processed_this_unit.append(request)
                 total_processed += 1
@@ -121,7 +133,9 @@ class Stage:
         self.time.append(current_time)
 
         # Aktualizuj całkowity czas oczekiwania
-        self.total_waiting_time += sum(r.waiting_time for r in self.queue)
+        self.total_waiting_time += (
+            self.queued_waiting_offset + len(self.queue) * current_time
+        )
 
     def process_request(self, request: Request, current_time: int):
         # Aktualizacja statystyk
@@ -156,16 +170,19 @@ class Stage:
             request.in_transit = False
             for next_stage, condition in self.next_stages:
                 if condition(request):
-                    next_stage.receive([request])
+                    # Kolejny etap obsłuży je najwcześniej w następnej jednostce czasu
+                    next_stage.receive([request], current_time + 1)
                     break  # Zgłoszenie trafia tylko do jednego etapu
             else:
                 # Jeśli nie ma następnego etapu, zgłoszenie opuszcza system
                 self.processed_requests.append(request)
                 request.time_in_system = current_time - request.arrival_time
 
-    def update_waiting_times(self):
+    def flush_waiting_times(self, current_time: int):
+        # Dolicz dotychczasowy czas oczekiwania zgłoszeniom, które wciąż czekają
         for request in self.queue:
-            request.waiting_time += 1
+            request.waiting_time += current_time - request.stage_entry_time
+            request.stage_entry_time = current_time
 
 
 # Definicja konkretnych etapów
@@ -199,7 +216,47 @@ class Wysylka(Stage):
         super().__init__("Wysyłka")
 
 
-def symulacja(czas_trwania: int):
+@dataclass
+class KonfiguracjaSieci:
+    czas_trwania: int
+    seed: Optional[int] = None  # Ziarno globalnego generatora random
+    pokaz_wyniki: bool = False
+
+
+@dataclass
+class WynikSieci:
+    czas_trwania: int
+    liczba_zgloszen: int
+    wyslane: Dict[str, int]  # Według typu zgłoszenia
+    badania_prototypow: Dict[str, int]
+    liczba_opuszczajacych: int
+    sredni_czas_w_systemie: float
+    pozostale_zgloszenia: int  # W kolejkach i w tranzycie
+    # Nazwa etapu -> statystyki etapu
+    etapy: Dict[str, Dict[str, object]]
+    # Etapy i zgłoszenia, z których rysowane są wykresy
+    etapy_symulacji: List[Stage] = field(repr=False)
+    zgloszenia: List[Request] = field(repr=False)
+
+
+def statystyki_etapu(stage: Stage) -> Dict[str, object]:
+    return {
+        "liczba_w_kolejce": len(stage.queue),
+        "liczba_w_tranzycie": len(stage.transit_queue),
+        "przetworzone": sum(stage.statistics.values()),
+        "przetworzone_wedlug_typu": dict(stage.statistics),
+        "srednia_dlugosc_kolejki": sum(stage.queue_lengths) / len(stage.queue_lengths),
+        "maksymalna_dlugosc_kolejki": stage.max_queue_length,
+        "srednie_wykorzystanie": (
+            sum(stage.utilization) / len(stage.utilization)
+            if len(stage.utilization) > 0
+            else 0
+        ),
+        "calkowity_czas_oczekiwania": stage.total_waiting_time,
+    }
+
+
+def symulacja(czas_trwania: int, pokaz_wyniki: bool = True) -> WynikSieci:
     # Inicjalizacja etapów
     magazyn = MagazynSurowcow()
     linia_produkcyjna = LiniaProdukcyjna()
@@ -250,7 +307,7 @@ def symulacja(czas_trwania: int):
         wszystkie_zgloszenia.extend(new_requests)
 
         # Dodaj nowe zgłoszenia do magazynu
-        magazyn.receive(new_requests)
+        magazyn.receive(new_requests, current_time)
 
         # Procesuj każdy etap
         for stage in [
@@ -262,7 +319,6 @@ def symulacja(czas_trwania: int):
             wysylka,
         ]:
             stage.process(current_time)
-            stage.update_waiting_times()
 
         # Aktualizuj tranzyty między etapami
         for stage in [
@@ -276,6 +332,16 @@ def symulacja(czas_trwania: int):
 
         current_time += 1
 
+    for stage in [
+        magazyn,
+        linia_produkcyjna,
+        personalizacja,
+        testy_jakosci,
+        badania_prototypow,
+        wysylka,
+    ]:
+        stage.flush_waiting_times(current_time)
+
     # Zbieranie statystyk
     wszystkie_etapy = [
         magazyn,
@@ -293,102 +359,104 @@ def symulacja(czas_trwania: int):
         for r in badania_prototypow.processed_requests + wysylka.processed_requests
     )
 
-    print("\nWyniki Symulacji:")
-    print(
-        f"Całkowita liczba zgłoszeń wchodzących do systemu: {len(wszystkie_zgloszenia)}"
+    def policz(requests: List[Request]) -> Dict[str, int]:
+        counts = {"zielony": 0, "czerwony": 0, "niebieski": 0}
+        for r in requests:
+            counts[r.type] += 1
+        return counts
+
+    wyslane = policz(wysylka.processed_requests)
+    badania = policz(badania_prototypow.processed_requests)
+    total_exited = sum(wyslane.values()) + sum(badania.values())
+
+    wynik = WynikSieci(
+        czas_trwania=current_time,
+        liczba_zgloszen=len(wszystkie_zgloszenia),
+        wyslane=wyslane,
+        badania_prototypow=badania,
+        liczba_opuszczajacych=total_exited,
+        sredni_czas_w_systemie=(
+            total_time_in_system / total_exited if total_exited > 0 else 0
+        ),
+        # Sprawdzenie, czy jakieś zgłoszenia pozostały w systemie
+        pozostale_zgloszenia=sum(len(stage.queue) for stage in wszystkie_etapy)
+        + sum(len(stage.transit_queue) for stage in wszystkie_etapy),
+        etapy={stage.name: statystyki_etapu(stage) for stage in wszystkie_etapy},
+        etapy_symulacji=wszystkie_etapy,
+        zgloszenia=wszystkie_zgloszenia,
     )
 
-    num_green_shipped = len(
-        [r for r in wysylka.processed_requests if r.type == "zielony"]
-    )
-    num_red_shipped = len(
-        [r for r in wysylka.processed_requests if r.type == "czerwony"]
-    )
-    num_blue_shipped = len(
-        [r for r in wysylka.processed_requests if r.type == "niebieski"]
-    )  # Powinno być zero
+    if pokaz_wyniki:
+        wypisz_wyniki(wynik)
+
+        # Generowanie wykresów
+        generate_plots(wszystkie_etapy, current_time, wszystkie_zgloszenia)
+
+    return wynik
+
+
+def uruchom(konfiguracja: KonfiguracjaSieci) -> WynikSieci:
+    # Wywołanie bez input(), wydruków i wykresów (chyba że pokaz_wyniki)
+    if konfiguracja.seed is not None:
+        random.seed(konfiguracja.seed)
+    return symulacja(konfiguracja.czas_trwania, konfiguracja.pokaz_wyniki)
+
+
+def wypisz_wyniki(wynik: WynikSieci):
+    print("\nWyniki Symulacji:")
+    print(f"Całkowita liczba zgłoszeń wchodzących do systemu: {wynik.liczba_zgloszen}")
 
     print("\nProdukty wysłane:")
-    print(f"  Zielone (standardowe): {num_green_shipped}")
-    print(f"  Czerwone (personalizowane): {num_red_shipped}")
+    print(f"  Zielone (standardowe): {wynik.wyslane['zielony']}")
+    print(f"  Czerwone (personalizowane): {wynik.wyslane['czerwony']}")
     print(
-        f"  Niebieskie (prototypy): {num_blue_shipped} (prototypy nie trafiają na wysyłkę)"
-    )
-
-    num_blue_prototype = len(
-        [r for r in badania_prototypow.processed_requests if r.type == "niebieski"]
-    )
-    num_green_prototype = len(
-        [r for r in badania_prototypow.processed_requests if r.type == "zielony"]
-    )
-    num_red_prototype = len(
-        [r for r in badania_prototypow.processed_requests if r.type == "czerwony"]
-    )
+        f"  Niebieskie (prototypy): {wynik.wyslane['niebieski']} (prototypy nie trafiają na wysyłkę)"
+    )  # Powinno być zero
 
     print("\nProdukty, które przeszły przez badania prototypowe:")
-    print(f"  Niebieskie (Prototypy): {num_blue_prototype}")
-    print(f"  Zielone: {num_green_prototype}")
-    print(f"  Czerwone: {num_red_prototype}")
-
-    total_exited = (
-        num_green_shipped
-        + num_red_shipped
-        + num_blue_prototype
-        + num_green_prototype
-        + num_red_prototype
-    )
+    print(f"  Niebieskie (Prototypy): {wynik.badania_prototypow['niebieski']}")
+    print(f"  Zielone: {wynik.badania_prototypow['zielony']}")
+    print(f"  Czerwone: {wynik.badania_prototypow['czerwony']}")
 
     print(
-        f"\nCałkowita liczba zgłoszeń opuszczających system: {total_exited} (powinno być równe lub mniejsze od liczby zgłoszeń wchodzących do systemu)"
+        f"\nCałkowita liczba zgłoszeń opuszczających system: {wynik.liczba_opuszczajacych} (powinno być równe lub mniejsze od liczby zgłoszeń wchodzących do systemu)"
     )
 
     # Dodatkowe statystyki
-    if total_exited > 0:
-        avg_time_in_system = total_time_in_system / total_exited
+    if wynik.liczba_opuszczajacych > 0:
         print(
-            f"Średni czas zgłoszenia w systemie: {avg_time_in_system:.2f} jednostek czasu"
+            f"Średni czas zgłoszenia w systemie: {wynik.sredni_czas_w_systemie:.2f} jednostek czasu"
         )
     else:
         print("Brak zgłoszeń opuszczających system.")
 
-    # Sprawdzenie, czy jakieś zgłoszenia pozostały w systemie
-    remaining_requests = sum(len(stage.queue) for stage in wszystkie_etapy) + sum(
-        len(stage.transit_queue) for stage in wszystkie_etapy
-    )
     print(
-        f"\nLiczba zgłoszeń pozostałych w systemie po zakończeniu symulacji: {remaining_requests}"
+        f"\nLiczba zgłoszeń pozostałych w systemie po zakończeniu symulacji: {wynik.pozostale_zgloszenia}"
     )
 
     # Wyświetlenie statystyk dla każdego etapu
     print("\nStatystyki etapów:")
-    for stage in wszystkie_etapy:
-        print(f"Etap: {stage.name}")
-        print(f"  Liczba zgłoszeń w kolejce: {len(stage.queue)}")
-        print(f"  Liczba zgłoszeń w tranzycie: {len(stage.transit_queue)}")
-        print(f"  Przetworzone zgłoszenia: {sum(stage.statistics.values())}")
+    for name, stage in wynik.etapy.items():
+        print(f"Etap: {name}")
+        print(f"  Liczba zgłoszeń w kolejce: {stage['liczba_w_kolejce']}")
+        print(f"  Liczba zgłoszeń w tranzycie: {stage['liczba_w_tranzycie']}")
+        print(f"  Przetworzone zgłoszenia: {stage['przetworzone']}")
         print("  Statystyki typów:")
-        for type_, count in stage.statistics.items():
+        for type_, count in stage["przetworzone_wedlug_typu"].items():
             print(f"    {type_.capitalize()}: {count}")
+        print(f"  Średnia długość kolejki: {stage['srednia_dlugosc_kolejki']:.2f}")
+        print(f"  Maksymalna długość kolejki: {stage['maksymalna_dlugosc_kolejki']}")
+        print(f"  Średnie wykorzystanie etapu: {stage['srednie_wykorzystanie']:.2f}%")
         print(
-            f"  Średnia długość kolejki: {sum(stage.queue_lengths)/len(stage.queue_lengths):.2f}"
-        )
-        print(f"  Maksymalna długość kolejki: {stage.max_queue_length}")
-        avg_utilization = (
-            sum(stage.utilization) / len(stage.utilization)
-            if len(stage.utilization) > 0
-            else 0
-        )
-        print(f"  Średnie wykorzystanie etapu: {avg_utilization:.2f}%")
-        print(
-            f"  Całkowity czas oczekiwania w kolejce: {stage.total_waiting_time} jednostek czasu"
+            f"  Całkowity czas oczekiwania w kolejce: {stage['calkowity_czas_oczekiwania']} jednostek czasu"
         )
         print("")
 
-    # Generowanie wykresów
-    generate_plots(wszystkie_etapy, current_time, wszystkie_zgloszenia)
-
 
 def generate_plots(stages: List[Stage], simulation_time: int, requests: List[Request]):
+    # Wykresy wyświetlane w oknach (plt.show())
+    plt = pyplot(interaktywny=True)
+
     # Wykres długości kolejek w czasie dla każdego etapu
     plt.figure(figsize=(12, 6))
     for stage in stages[1:]:  # Pomijamy magazyn, bo ma nieskończoną przepustowość
@@ -1,26 +1,238 @@
-import random
-from typing import List, Optional
-import matplotlib.pyplot as plt
-import matplotlib
-
-matplotlib.use("TkAgg")
+from collections import defaultdict, deque
+from dataclasses import dataclass, field, replace
+import os
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from narzedzia.losowanie import StrumienieLosowe, pula_calkowitych, pula_kategorii
+from narzedzia.statystyki import (
+    PrzedzialSredniePaczek,
+    punkt_obciecia,
+    srednie_paczek,
+)
+from narzedzia.strumieniowe import (
+    Rozklad,
+    SzeregZdziesiatkowany,
+    dane_histogramu,
+    srednia,
+    srednia_od,
+    suma,
+    suma_od,
+)
+from narzedzia.wykresy import pyplot, rysuj, zmniejsz
+from sieć_kolejkowa.jackson import jackson_network
+
+# Request types and their share of the incoming requests
+REQUEST_TYPES = ["standard", "personalized", "prototype"]
+REQUEST_TYPE_WEIGHTS = [85, 10, 5]
+REQUEST_TYPE_PROBABILITIES = np.array(REQUEST_TYPE_WEIGHTS) / sum(REQUEST_TYPE_WEIGHTS)
+REQUEST_TYPE_CODES = {
+    request_type: code for code, request_type in enumerate(REQUEST_TYPES)
+}
+# Request types in the order in which stages process them
+REQUEST_TYPES_BY_PRIORITY = ("prototype", "personalized", "standard")
+
+# Capacities of the stages in the order of the network: stage name ->
+# (capacity, capacity range). A stage with a range draws its capacity from it
+# uniformly in every time unit (inclusive), the capacity is then only the
+# initial value.
+STAGE_CAPACITIES: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {
+    "Magazyn Surowców": (float("inf"), None),
+    "Linia Produkcyjna": (0, (30, 90)),
+    "Personalizacja": (0, (4, 8)),
+    "Standardowe Testy Jakości": (0, (25, 75)),
+    "Badania na Prototypach": (0, (1, 7)),
+    "Wysyłka": (0, (25, 75)),
+}
+
+# Where a request goes after transit from a stage, by request type:
+# (next stage or None for leaving the system, probability). Types missing
+# for a stage leave the system. A request that is not sent on to the next
+# stage (1%) goes to prototype research with probability 1% and otherwise
+# leaves the system.
+ROUTING: Dict[str, Dict[str, List[Tuple[Optional[str], float]]]] = {
+    "Magazyn Surowców": {
+        request_type: [("Linia Produkcyjna", 1.0)] for request_type in REQUEST_TYPES
+    },
+    "Linia Produkcyjna": {
+        "standard": [
+            ("Standardowe Testy Jakości", 0.99),
+            ("Badania na Prototypach", 0.0001),
+            (None, 0.0099),
+        ],
+        "personalized": [
+            ("Personalizacja", 0.99),
+            ("Badania na Prototypach", 0.0001),
+            (None, 0.0099),
+        ],
+        "prototype": [("Badania na Prototypach", 1.0)],
+    },
+    "Personalizacja": {
+        request_type: [
+            ("Standardowe Testy Jakości", 0.99),
+            ("Badania na Prototypach", 0.0001),
+            (None, 0.0099),
+        ]
+        for request_type in REQUEST_TYPES
+    },
+    "Standardowe Testy Jakości": {
+        request_type: [
+            ("Wysyłka", 0.99),
+            ("Badania na Prototypach", 0.0001),
+            (None, 0.0099),
+        ]
+        for request_type in REQUEST_TYPES
+    },
+    "Badania na Prototypach": {},
+    "Wysyłka": {},
+}
+
+
+def compile_routing(routing: Dict[str, List[Tuple[object, float]]]):
+    # Turns {request type: [(target, probability)]} into the list of all
+    # targets and a matrix of probabilities [type code, target]
+    targets = []
+    for destinations in routing.values():
+        for target, _ in destinations:
+            if target not in targets:
+                targets.append(target)
+    if None not in targets and any(t not in routing for t in REQUEST_TYPES):
+        targets.append(None)  # Leaving the system
+    probabilities = np.zeros((len(REQUEST_TYPES), len(targets)))
+    for code, request_type in enumerate(REQUEST_TYPES):
+        destinations = routing.get(request_type, [(None, 1.0)])
+        for target, probability in destinations:
+            probabilities[code, targets.index(target)] += probability
+    return targets, probabilities
+
+
+class RequestStore:
+    # All requests of a simulation kept column-wise in NumPy arrays, one row
+    # per request. Stages and queues refer to requests by row index; Request
+    # objects are only light handles to a row.
+    #
+    # With recycle=True (streaming mode) the rows of requests that have left
+    # the system are reused, so memory depends on the number of requests in
+    # the system, not on all requests; only the distributions of time in the
+    # system and total waiting time of the exited requests are kept.
+    def __init__(self, initial_capacity: int = 1024, recycle: bool = False):
+        self.size = 0  # Number of rows in use
+        self.total_added = 0  # Number of requests added
+        self.recycle = recycle
+        self.free: List[int] = []  # Rows to reuse
+        if recycle:
+            self.exited_times_in_system = Rozklad()
+            self.exited_waiting_times = Rozklad()
+        # Stage code -> stage name; new requests start in the warehouse
+        self.stage_names: List[str] = ["Magazyn Surowców"]
+        self.arrival_time = np.empty(initial_capacity, dtype=np.int64)
+        self.type_code = np.empty(initial_capacity, dtype=np.int8)
+        self.stage_code = np.empty(initial_capacity, dtype=np.int8)
+        self.waiting_time = np.empty(initial_capacity, dtype=np.int64)
+        # First time unit in which the request can be processed at its stage
+        self.stage_entry_time = np.empty(initial_capacity, dtype=np.int64)
+        self.exit_time = np.empty(initial_capacity, dtype=np.int64)  # -1 in system
+
+    def __len__(self):
+        return self.size
+
+    def register_stage(self, name: str) -> int:
+        if name not in self.stage_names:
+            self.stage_names.append(name)
+        return self.stage_names.index(name)
+
+    def add(self, arrival_time: int, types: Sequence[str]) -> Sequence[int]:
+        # Adds new requests in the first stage; returns their row indices
+        self.total_added += len(types)
+        reused = min(len(types), len(self.free))
+        start, end = self.size, self.size + len(types) - reused
+        if end > len(self.arrival_time):
+            self._grow(end)
+        if reused:
+            rows = self.free[len(self.free) - reused :] + list(range(start, end))
+            del self.free[len(self.free) - reused :]
+        else:
+            rows = range(start, end)
+        self.size = end
+        # A slice where possible, it is faster than an index array
+        selected = slice(start, end) if not reused else np.asarray(rows)
+        self.arrival_time[selected] = arrival_time
+        self.type_code[selected] = [REQUEST_TYPE_CODES[t] for t in types]
+        self.stage_code[selected] = 0
+        self.waiting_time[selected] = 0
+        self.stage_entry_time[selected] = arrival_time
+        self.exit_time[selected] = -1
+        return rows
+
+    def release(self, indices: List[int], current_time: int):
+        # Recycle mode: records the requests leaving the system now and frees
+        # their rows
+        self.exited_times_in_system.extend(current_time - self.arrival_time[indices])
+        self.exited_waiting_times.extend(self.waiting_time[indices])
+        self.free.extend(indices)
+
+    def discard(self, indices: List[int]):
+        # Recycle mode: frees the rows of requests rejected by a full queue;
+        # they have not exited, so their times are not recorded
+        self.free.extend(indices)
+
+    def request(self, index: int) -> "Request":
+        return Request(self, index)
+
+    def exited(self) -> np.ndarray:
+        # Row indices of the requests that have left the system
+        return np.flatnonzero(self.exit_time[: self.size] >= 0)
+
+    def times_in_system(self) -> np.ndarray:
+        # Time in the system of every request, 0 for those still in the system
+        exit_time = self.exit_time[: self.size]
+        return np.where(exit_time >= 0, exit_time - self.arrival_time[: self.size], 0)
+
+    def _grow(self, minimum: int):
+        capacity = max(minimum, 2 * len(self.arrival_time))
+        for column in (
+            "arrival_time",
+            "type_code",
+            "stage_code",
+            "waiting_time",
+            "stage_entry_time",
+            "exit_time",
+        ):
+            old = getattr(self, column)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, column, new)
 
 
 class Request:
-    def __init__(self, id: int, arrival_time: int):
-        self.id = id  # Unique identifier
-        self.arrival_time = arrival_time
-        self.time_in_system = 0
-        self.type = self.assign_type()
-        self.current_stage = "Magazyn Surowców"
-        self.waiting_time = 0  # Total waiting time in queues
-        self.in_transit = False
-        self.next_stage_arrival_time = None
-
-    def assign_type(self) -> str:
-        return random.choices(
-            ["standard", "personalized", "prototype"], weights=[85, 10, 5], k=1
-        )[0]
+    # Handle to one row of a RequestStore
+    __slots__ = ("store", "index", "type")
+
+    def __init__(self, store: RequestStore, index: int, type: Optional[str] = None):
+        self.store = store
+        self.index = index
+        self.type = type if type is not None else REQUEST_TYPES[store.type_code[index]]
+
+    @property
+    def id(self) -> int:
+        return self.index + 1  # Unique identifier
+
+    @property
+    def arrival_time(self) -> int:
+        return int(self.store.arrival_time[self.index])
+
+    @property
+    def current_stage(self) -> str:
+        return self.store.stage_names[self.store.stage_code[self.index]]
+
+    @property
+    def waiting_time(self) -> int:
+        return int(self.store.waiting_time[self.index])  # Total waiting time in queues
+
+    @property
+    def time_in_system(self) -> int:
+        exit_time = self.store.exit_time[self.index]
+        return int(exit_time - self.arrival_time) if exit_time >= 0 else 0
 
     def __repr__(self):
         return (
@@ -29,94 +241,165 @@ class Request:
 
 
 class Stage:
-    def __init__(self, name: str, capacity: int, queue_limit: Optional[int] = None):
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        queue_limit: Optional[int] = None,
+        transit_time: int = 1,
+        capacity_range: Optional[Tuple[int, int]] = None,
+        rng: Optional[np.random.Generator] = None,
+        store: Optional[RequestStore] = None,
+        routing_rng: Optional[np.random.Generator] = None,
+        series_points: Optional[int] = None,
+    ):
+        if transit_time < 0:
+            # A negative transit would put requests into an already passed
+            # time unit, where they are never delivered
+            raise ValueError(f"transit_time must be non-negative, got {transit_time}")
         self.name = name  # Stage name
+        # Requests of the whole network; queues hold their row indices
+        self.store = store if store is not None else RequestStore()
+        self.code = self.store.register_stage(name)
         self.capacity = capacity  # Max number of requests processed per time unit
+        # Capacity drawn uniformly from this range in every time unit (inclusive)
+        self.capacity_range = capacity_range
+        if capacity_range is not None:
+            # Capacities for consecutive time units, drawn in blocks
+            self.capacity_pool = pula_calkowitych(
+                rng if rng is not None else np.random.default_rng(), *capacity_range
+            )
         self.queue_limit = queue_limit  # Optional queue limit
-        self.queue: List[Request] = []  # Queue of requests waiting to be processed
-        self.transit_queue: List[Request] = []  # Requests in transit to the next stage
-        self.processed_requests: List[
-            Request
-        ] = []  # Requests that have left the system from this stage
+        self.rejected = 0  # Requests rejected because the queue was full
+        # FIFO queue of requests waiting to be processed, one per request type
+        self.queues: Dict[str, Deque[int]] = {
+            request_type: deque() for request_type in REQUEST_TYPES_BY_PRIORITY
+        }
+        self.queue_length = 0  # Total number of requests in the queues
+        self.transit_time = transit_time  # Time units needed to reach the next stage
+        # Requests in transit to the next stage, bucketed by arrival time
+        self.transit_queue: Dict[int, List[int]] = defaultdict(list)
+        self.transit_count = 0  # Number of requests in transit
+        # Requests that have left the system from this stage, by type
+        self.exited = {request_type: 0 for request_type in REQUEST_TYPES}
+        self.exited_time_in_system = 0  # Their total time in the system
         self.next_stages = []  # List of next stages with conditions
+        # Compiled routing table (see set_routing), used instead of next_stages
+        self.routing_targets: Optional[List[Optional[Stage]]] = None
+        self.routing_cumulative: Optional[np.ndarray] = None
+        self.routing_rng = (
+            routing_rng if routing_rng is not None else np.random.default_rng()
+        )
         self.statistics = {
             "standard": 0,
             "personalized": 0,
             "prototype": 0,
         }  # Stats of processed requests by type
-        # Lists for data collection for plots and stats
-        self.queue_lengths = []
-        self.utilization = []
-        self.processed_per_time = []
-        self.time = []
-        self.capacity_history = []
+
+        # Lists for data collection for plots and stats; with series_points
+        # (streaming mode) series of at most that many points and a
+        # distribution instead of the list of waiting times
+        def series():
+            if series_points is None:
+                return []
+            return SzeregZdziesiatkowany(series_points)
+
+        self.queue_lengths = series()
+        self.utilization = series()
+        self.processed_per_time = series()
+        self.time = series()
+        self.capacity_history = series()
         self.total_waiting_time = 0  # Total waiting time in queue at this stage
+        # Sum of (waiting_time - stage_entry_time) over queued requests, so the
+        # waiting time of the whole queue at time t is this + len(queue) * t
+        self.queued_waiting_offset = 0
         self.max_queue_length = 0  # Maximum queue length at this stage
-        self.waiting_times = []  # Waiting times of processed requests at this stage
-        self.avg_waiting_times = []  # Average waiting time at each time unit
+        # Waiting times of processed requests at this stage
+        self.waiting_times = [] if series_points is None else Rozklad()
+        self.avg_waiting_times = series()  # Average waiting time at each time unit
+        self.waiting_time_sums = series()  # Total waiting time at each time unit
 
     def add_next_stage(self, stage, condition):
         self.next_stages.append((stage, condition))
 
-    def receive(self, requests: List[Request]):
+    def set_routing(self, routing: Dict[str, List[Tuple[Optional["Stage"], float]]]):
+        # routing: request type -> [(next stage or None for leaving the system,
+        # probability)]; replaces the conditions from add_next_stage
+        self.routing_targets, probabilities = compile_routing(routing)
+        cumulative = probabilities.cumsum(axis=1)
+        # Close every row at 1 as soon as only zero probabilities remain, so
+        # rounding errors never select a target with probability 0
+        remaining = probabilities[:, ::-1].cumsum(axis=1)[:, ::-1]
+        cumulative[:, :-1][remaining[:, 1:] == 0] = 1.0
+        cumulative[:, -1] = 1.0
+        self.routing_cumulative = cumulative
+
+    @property
+    def processed_requests(self) -> List[Request]:
+        # Requests that have left the system from this stage (in the streaming
+        # mode only those whose rows have not been reused yet)
+        store = self.store
+        exited = store.exited()
+        return [
+            store.request(index)
+            for index in exited[store.stage_code[exited] == self.code].tolist()
+        ]
+
+    def receive(self, requests: Sequence[int], current_time: int):
+        # requests: row indices in the request store
         if self.queue_limit is not None:
-            available_space = self.queue_limit - len(self.queue)
-            if available_space <= 0:
-                # Queue is full, reject requests
-                return
-            else:
-                self.queue.extend(requests[:available_space])
-        else:
-            self.queue.extend(requests)
+            available_space = max(self.queue_limit - self.queue_length, 0)
+            if len(requests) > available_space:
+                # Queue is full, reject the rest of the requests
+                rejected = requests[available_space:]
+                self.rejected += len(rejected)
+                if self.store.recycle:
+                    self.store.discard(list(rejected))
+                requests = requests[:available_space]
+        if not len(requests):
+            return
+        store = self.store
+        indices = np.asarray(requests)
+        store.stage_entry_time[indices] = current_time
+        self.queued_waiting_offset += (
+            int(store.waiting_time[indices].sum()) - len(requests) * current_time
+        )
+        for index, code in zip(requests, store.type_code[indices].tolist()):
+            self.queues[REQUEST_TYPES[code]].append(index)
+        self.queue_length += len(requests)
 
     def is_empty(self) -> bool:
-        return len(self.queue) == 0
+        return self.queue_length == 0
 
     def process(self, current_time: int):
         # Randomize capacity for this time unit
-        if self.name == "Linia Produkcyjna":
-            self.capacity = random.randint(30, 90)
-        elif self.name == "Personalizacja":
-            self.capacity = random.randint(4, 8)
-        elif self.name == "Standardowe Testy Jakości":
-            self.capacity = random.randint(25, 75)
-        elif self.name == "Badania na Prototypach":
-            self.capacity = random.randint(1, 7)
-        elif self.name == "Wysyłka":
-            self.capacity = random.randint(25, 75)
+        if self.capacity_range is not None:
+            self.capacity = self.capacity_pool.nastepna()
         # For 'Magazyn Surowców', capacity is infinite and doesn't change
 
         # Save capacity history
         self.capacity_history.append(self.capacity)
 
         # Process requests in order of priority: prototype, personalized, standard
-        processed_this_unit = []
-        waiting_times_this_unit = []
-        prototypes = [r for r in self.queue if r.type == "prototype"]
-        personalizeds = [r for r in self.queue if r.type == "personalized"]
-        standards = [r for r in self.queue if r.type == "standard"]
-
-        # Total number of processed requests in this time unit
-        total_processed = 0
-
-        for requests_of_type in [prototypes, personalizeds, standards]:
-            for request in requests_of_type:
-                if total_processed >= self.capacity:
-                    break  # Reached max capacity
-                self.process_request(request, current_time)
-                processed_this_unit.append(request)
-                waiting_times_this_unit.append(request.waiting_time)
-                total_processed += 1
-            if total_processed >= self.capacity:
+        processed: List[int] = []
+
+        for request_type in REQUEST_TYPES_BY_PRIORITY:
+            requests_of_type = self.queues[request_type]
+            count = min(len(requests_of_type), self.capacity - len(processed))
+            for _ in range(count):
+                processed.append(requests_of_type.popleft())
+            self.statistics[request_type] += count
+            if len(processed) >= self.capacity:
                 break  # Reached max capacity
 
-        # Remove processed requests from queue
-        for request in processed_this_unit:
-            self.queue.remove(request)
+        # Total number of processed requests in this time unit
+        total_processed = len(processed)
+        self.queue_length -= total_processed
+        waiting_times_this_unit = self.process_requests(processed, current_time)
 
         # Update queue statistics
-        self.queue_lengths.append(len(self.queue))
-        self.max_queue_length = max(self.max_queue_length, len(self.queue))
+        self.queue_lengths.append(self.queue_length)
+        self.max_queue_length = max(self.max_queue_length, self.queue_length)
 
         # Update utilization statistics
         utilization_percent = (
@@ -127,151 +410,358 @@ class Stage:
         self.time.append(current_time)
 
         # Update total waiting time
-        self.total_waiting_time += sum(r.waiting_time for r in self.queue)
+        self.total_waiting_time += (
+            self.queued_waiting_offset + self.queue_length * current_time
+        )
 
         # Record waiting times
         self.waiting_times.extend(waiting_times_this_unit)
 
         # Calculate average waiting time for this time unit
+        waiting_time_sum = sum(waiting_times_this_unit)
+        self.waiting_time_sums.append(waiting_time_sum)
         if waiting_times_this_unit:
-            avg_waiting_time = sum(waiting_times_this_unit) / len(
-                waiting_times_this_unit
-            )
+            avg_waiting_time = waiting_time_sum / len(waiting_times_this_unit)
         else:
             avg_waiting_time = 0
         self.avg_waiting_times.append(avg_waiting_time)
 
-    def process_request(self, request: Request, current_time: int):
-        # Update statistics
-        self.statistics[request.type] += 1
-
-        # Set current stage for the request
-        request.current_stage = self.name
-
-        # Set request in transit
-        request.in_transit = True
-        request.next_stage_arrival_time = (
-            current_time + 1
-        )  # Will arrive after 1 time unit
-
-        # Add request to transit queue
-        self.transit_queue.append((request, current_time))
+    def process_requests(self, requests: List[int], current_time: int) -> List[int]:
+        # Takes requests just removed from the queues; returns their total
+        # waiting times
+        if not requests:
+            return []
+        store = self.store
+        indices = np.asarray(requests)
+        waiting_time = store.waiting_time[indices]
+        stage_entry_time = store.stage_entry_time[indices]
+        self.queued_waiting_offset -= int((waiting_time - stage_entry_time).sum())
+        waiting_time += current_time - stage_entry_time
+        store.waiting_time[indices] = waiting_time
+
+        # Set current stage for the requests
+        store.stage_code[indices] = self.code
+
+        # Add requests to the transit bucket of their arrival time;
+        # they will arrive after transit_time time units
+        self.transit_queue[current_time + self.transit_time].extend(requests)
+        self.transit_count += len(requests)
+        return waiting_time.tolist()
 
     def update_transit(self, current_time: int):
-        # Check if any requests have arrived at the next stage
-        arrived_requests = []
-        for request, departure_time in self.transit_queue:
-            if current_time >= request.next_stage_arrival_time:
-                arrived_requests.append(request)
-
-        # Remove requests that have arrived
-        self.transit_queue = [
-            (r, t) for r, t in self.transit_queue if r not in arrived_requests
-        ]
+        # Take the requests arriving at the next stage now; called every time
+        # unit, so only the bucket due now has to be drained
+        arrived_requests = self.transit_queue.pop(current_time, [])
+        if not arrived_requests:
+            return
+        self.transit_count -= len(arrived_requests)
+        if self.routing_targets is not None:
+            self.route(arrived_requests, current_time)
+            return
+        store = self.store
+        types = store.type_code[arrived_requests].tolist()
 
         # Redirect requests to next stages based on conditions
-        for request in arrived_requests:
-            request.in_transit = False
+        routed: Dict[Stage, List[int]] = defaultdict(list)
+        exited: List[int] = []
+        for index, code in zip(arrived_requests, types):
+            request = Request(store, index, REQUEST_TYPES[code])
             for next_stage, condition in self.next_stages:
                 if condition(request):
-                    next_stage.receive([request])
+                    routed[next_stage].append(index)
                     break  # Request goes to only one stage
             else:
                 # If no next stage, the request leaves the system
-                self.processed_requests.append(request)
-                request.time_in_system = current_time - request.arrival_time
-
-    def update_waiting_times(self):
-        for request in self.queue:
-            request.waiting_time += 1
+                exited.append(index)
+        for next_stage, requests in routed.items():
+            # The next stage processes them no earlier than in the next time unit
+            next_stage.receive(requests, current_time + 1)
+        self.exit(exited, current_time)
+
+    def route(self, requests: List[int], current_time: int):
+        # Routes requests with the compiled routing table: one categorical
+        # draw for the whole batch
+        store = self.store
+        if len(self.routing_targets) == 1:
+            routed = [requests]
+        else:
+            indices = np.asarray(requests)
+            cumulative = self.routing_cumulative[store.type_code[indices]]
+            draws = self.routing_rng.random(len(requests))
+            targets = (draws[:, None] >= cumulative).sum(axis=1)
+            routed = [
+                indices[targets == target].tolist()
+                for target in range(len(self.routing_targets))
+            ]
+        for next_stage, selected in zip(self.routing_targets, routed):
+            if not selected:
+                continue
+            if next_stage is None:
+                self.exit(selected, current_time)
+            else:
+                # The next stage processes them no earlier than in the next time unit
+                next_stage.receive(selected, current_time + 1)
+
+    def exit(self, requests: List[int], current_time: int):
+        # The requests leave the system from this stage
+        if not requests:
+            return
+        store = self.store
+        store.exit_time[requests] = current_time
+        self.exited_time_in_system += len(requests) * current_time - int(
+            store.arrival_time[requests].sum()
+        )
+        for code, count in enumerate(
+            np.bincount(store.type_code[requests], minlength=len(REQUEST_TYPES))
+        ):
+            self.exited[REQUEST_TYPES[code]] += int(count)
+        if store.recycle:
+            store.release(requests, current_time)
+
+    def flush_waiting_times(self, current_time: int):
+        # Add the waiting time accumulated so far by requests still in the queue
+        store = self.store
+        for requests_of_type in self.queues.values():
+            if requests_of_type:
+                indices = np.fromiter(requests_of_type, dtype=np.int64)
+                store.waiting_time[indices] += (
+                    current_time - store.stage_entry_time[indices]
+                )
+                store.stage_entry_time[indices] = current_time
 
 
 # Definition of specific stages
-class MagazynSurowcow(Stage):
-    def __init__(self):
-        super().__init__("Magazyn Surowców", capacity=float("inf"))
-
+class NetworkStage(Stage):
+    # Stage of the network with its capacity from STAGE_CAPACITIES; a given
+    # capacity_range replaces the default one
+    stage_name: str
 
-class LiniaProdukcyjna(Stage):
-    def __init__(self):
+    def __init__(self, capacity_range: Optional[Tuple[int, int]] = None, **kwargs):
+        capacity, default_range = STAGE_CAPACITIES[self.stage_name]
         super().__init__(
-            "Linia Produkcyjna", capacity=0
-        )  # Initial value doesn't matter
+            self.stage_name,
+            capacity=capacity,
+            capacity_range=capacity_range or default_range,
+            **kwargs,
+        )
 
 
-class Personalizacja(Stage):
-    def __init__(self):
-        super().__init__("Personalizacja", capacity=0)
+class MagazynSurowcow(NetworkStage):
+    stage_name = "Magazyn Surowców"
 
 
-class TestyJakosci(Stage):
-    def __init__(self):
-        super().__init__("Standardowe Testy Jakości", capacity=0)
+class LiniaProdukcyjna(NetworkStage):
+    stage_name = "Linia Produkcyjna"
 
 
-class BadaniaPrototypow(Stage):
-    def __init__(self):
-        super().__init__("Badania na Prototypach", capacity=0)
+class Personalizacja(NetworkStage):
+    stage_name = "Personalizacja"
 
 
-class Wysylka(Stage):
-    def __init__(self):
-        super().__init__("Wysyłka", capacity=0)
+class TestyJakosci(NetworkStage):
+    stage_name = "Standardowe Testy Jakości"
 
 
-def symulacja(czas_trwania: int):
-    # Initialize stages
-    magazyn = MagazynSurowcow()
-    linia_produkcyjna = LiniaProdukcyjna()
-    personalizacja = Personalizacja()
-    testy_jakosci = TestyJakosci()
-    badania_prototypow = BadaniaPrototypow()
-    wysylka = Wysylka()
+class BadaniaPrototypow(NetworkStage):
+    stage_name = "Badania na Prototypach"
 
-    # Define flow between stages
-    magazyn.add_next_stage(linia_produkcyjna, lambda r: True)
 
-    # Linia Produkcyjna
-    linia_produkcyjna.add_next_stage(
-        testy_jakosci, lambda r: r.type == "standard" and random.uniform(0, 1) < 0.99
-    )
-    linia_produkcyjna.add_next_stage(
-        personalizacja,
-        lambda r: r.type == "personalized" and random.uniform(0, 1) < 0.99,
+class Wysylka(NetworkStage):
+    stage_name = "Wysyłka"
+
+
+@dataclass
+class SimulationConfig:
+    czas_trwania: int
+    transit_time: int = 1
+    seed: Optional[int] = None
+    print_results: bool = False
+    save_plots: bool = False
+    plot_directory: str = "."
+    # Options of generate_plots
+    plot_max_points: Optional[int] = None
+    plot_downsampling: str = "min_max"
+    plot_workers: Optional[int] = None
+    # Streaming mode with at most this many points per stage series, see
+    # symulacja
+    series_points: Optional[int] = None
+    # Steady-state statistics without the MSER-5 warm-up period; with
+    # steady_state_length the run stops once that many time units have been
+    # collected after the detected warm-up (at czas_trwania at the latest)
+    truncate_warmup: bool = False
+    steady_state_length: Optional[int] = None
+    # Stage name -> capacity range replacing the default one of that stage
+    capacity_ranges: Optional[Dict[str, Tuple[int, int]]] = None
+    # Stage name -> routing of that stage replacing its part of ROUTING
+    routing: Optional[Dict[str, Dict[str, List[Tuple[Optional[str], float]]]]] = None
+
+    def __post_init__(self):
+        if self.transit_time < 0:
+            raise ValueError(
+                f"transit_time must be non-negative, got {self.transit_time}"
+            )
+
+
+# Time series of a stage kept for plots, see stage_series
+STAGE_SERIES = (
+    "time",
+    "queue_lengths",
+    "utilization",
+    "processed_per_time",
+    "capacity_history",
+    "avg_waiting_times",
+    "waiting_time_sums",
+)
+
+
+@dataclass
+class SimulationResult:
+    simulation_time: int
+    total_requests: int
+    shipped: Dict[str, int]
+    prototype_research: Dict[str, int]
+    total_exited: int
+    avg_time_in_system: float
+    avg_waiting_time: float
+    # Requests remaining in queues and in transit
+    remaining_requests: int
+    # Stage name -> stage_statistics
+    stages: Dict[str, Dict[str, object]]
+    # Stage name -> series name -> values per time unit
+    stage_series: Dict[str, Dict[str, List[float]]] = field(repr=False)
+    # Number of time units averaged in one value of stage_series (grows in the
+    # streaming mode; the last value may cover fewer)
+    series_step: int = 1
+    # All requests (None in the cohort and streaming modes, which do not keep
+    # them)
+    requests: Optional[RequestStore] = field(default=None, repr=False)
+    # Streaming mode: "time_in_system" and "waiting_time" of the exited
+    # requests
+    distributions: Optional[Dict[str, Rozklad]] = field(default=None, repr=False)
+    # Number of initial time units left out of the averages (0 without warm-up
+    # truncation); counts and totals cover the whole run
+    warmup: int = 0
+
+    def statistics(self) -> Dict[str, object]:
+        # Summary without the series, in the form accepted by print_statistics
+        return {
+            "total_requests": self.total_requests,
+            "shipped": self.shipped,
+            "prototype_research": self.prototype_research,
+            "total_exited": self.total_exited,
+            "avg_time_in_system": self.avg_time_in_system,
+            "avg_waiting_time": self.avg_waiting_time,
+            "remaining_requests": self.remaining_requests,
+            "stages": self.stages,
+            "warmup": self.warmup,
+        }
+
+
+def symulacja(
+    czas_trwania: int,
+    transit_time: int = 1,
+    pokaz_wyniki: bool = True,
+    strumienie: Optional[StrumienieLosowe] = None,
+    series_points: Optional[int] = None,
+    truncate_warmup: bool = False,
+    steady_state_length: Optional[int] = None,
+    capacity_ranges: Optional[Dict[str, Tuple[int, int]]] = None,
+    routing: Optional[Dict[str, Dict[str, List[Tuple[Optional[str], float]]]]] = None,
+) -> SimulationResult:
+    # series_points: streaming mode for long runs, in memory independent of
+    # czas_trwania; the stage series are averaged down to at most this many
+    # points, the rows of exited requests are reused and only distributions
+    # of their times are kept (result.distributions instead of
+    # result.requests)
+    #
+    # truncate_warmup: averages from the end of the warm-up period detected
+    # with MSER-5 on the queue lengths and waiting times of every stage;
+    # steady_state_length: stop once that many time units follow the warm-up
+    #
+    # capacity_ranges: stage name -> capacity range used instead of the
+    # default one of the stage; routing: stage name -> routing of the stage
+    # used instead of the one in ROUTING
+    if strumienie is None:
+        strumienie = StrumienieLosowe()
+    # All requests (only those in the system in the streaming mode)
+    zgloszenia = RequestStore(recycle=series_points is not None)
+    stage_options = dict(
+        transit_time=transit_time,
+        rng=strumienie.przepustowosci,
+        store=zgloszenia,
+        routing_rng=strumienie.trasowanie,
+        series_points=series_points,
     )
-    linia_produkcyjna.add_next_stage(
-        badania_prototypow,
-        lambda r: r.type == "prototype" or random.uniform(0, 1) >= 0.99,
+    arrival_counts = pula_calkowitych(strumienie.przyjscia, 20, 80)
+    request_types = pula_kategorii(
+        strumienie.klasy, REQUEST_TYPES, REQUEST_TYPE_PROBABILITIES
     )
 
-    # Personalizacja
-    personalizacja.add_next_stage(testy_jakosci, lambda r: random.uniform(0, 1) < 0.99)
-    personalizacja.add_next_stage(
-        badania_prototypow, lambda r: random.uniform(0, 1) >= 0.99
-    )
+    # Initialize stages
+    magazyn = MagazynSurowcow(**stage_options)
+    linia_produkcyjna = LiniaProdukcyjna(**stage_options)
+    personalizacja = Personalizacja(**stage_options)
+    testy_jakosci = TestyJakosci(**stage_options)
+    badania_prototypow = BadaniaPrototypow(**stage_options)
+    wysylka = Wysylka(**stage_options)
 
-    # Testy Jakości
-    testy_jakosci.add_next_stage(wysylka, lambda r: random.uniform(0, 1) < 0.99)
-    testy_jakosci.add_next_stage(
-        badania_prototypow, lambda r: random.uniform(0, 1) >= 0.99
-    )
+    # Define flow between stages
+    stages_by_name = {
+        stage.name: stage
+        for stage in [
+            magazyn,
+            linia_produkcyjna,
+            personalizacja,
+            testy_jakosci,
+            badania_prototypow,
+            wysylka,
+        ]
+    }
+    for name, capacity_range in (capacity_ranges or {}).items():
+        if name not in stages_by_name:
+            raise ValueError(f"Unknown stage: {name!r}")
+        stage = stages_by_name[name]
+        stage.capacity_range = capacity_range
+        stage.capacity_pool = pula_calkowitych(
+            strumienie.przepustowosci, *capacity_range
+        )
+    for name, stage_routing in {**ROUTING, **(routing or {})}.items():
+        if name not in stages_by_name:
+            raise ValueError(f"Unknown stage: {name!r}")
+        stages_by_name[name].set_routing(
+            {
+                request_type: [
+                    (stages_by_name[target] if target is not None else None, p)
+                    for target, p in targets
+                ]
+                for request_type, targets in stage_routing.items()
+            }
+        )
 
-    # All requests
-    wszystkie_zgloszenia = []
+    # Requests leaving the system and their total time in the system at each
+    # time unit, for the averages without the warm-up period
+    if series_points is None:
+        exited_per_time, time_in_system_per_time = [], []
+    else:
+        exited_per_time = SzeregZdziesiatkowany(series_points)
+        time_in_system_per_time = SzeregZdziesiatkowany(series_points)
+    exit_stages = [badania_prototypow, wysylka]
+    total_exited = total_time_in_system = 0
+    check_period = (
+        max(1, steady_state_length // 4) if steady_state_length is not None else None
+    )
 
     # Main simulation loop
     current_time = 0
     while current_time < czas_trwania:
         # Generate a random number of requests from 20 to 80
-        num_new_requests = random.randint(20, 80)
-        new_requests = [
-            Request(id=len(wszystkie_zgloszenia) + i + 1, arrival_time=current_time)
-            for i in range(num_new_requests)
-        ]
-        wszystkie_zgloszenia.extend(new_requests)
+        num_new_requests = arrival_counts.nastepna()
+        new_requests = zgloszenia.add(
+            current_time, request_types.pobierz(num_new_requests)
+        )
 
         # Add new requests to the warehouse
-        magazyn.receive(new_requests)
+        magazyn.receive(new_requests, current_time)
 
         # Process each stage
         for stage in [
@@ -283,7 +773,6 @@ def symulacja(czas_trwania: int):
             wysylka,
         ]:
             stage.process(current_time)
-            stage.update_waiting_times()
 
         # Update transits between stages
         for stage in [
@@ -296,8 +785,32 @@ def symulacja(czas_trwania: int):
         ]:
             stage.update_transit(current_time)
 
+        exited = sum(sum(stage.exited.values()) for stage in exit_stages)
+        time_in_system = sum(stage.exited_time_in_system for stage in exit_stages)
+        exited_per_time.append(exited - total_exited)
+        time_in_system_per_time.append(time_in_system - total_time_in_system)
+        total_exited, total_time_in_system = exited, time_in_system
+
         current_time += 1
 
+        # Stop early once the steady state has been reached
+        if (
+            check_period
+            and current_time % check_period == 0
+            and steady_state_reached(stages_by_name.values(), steady_state_length)
+        ):
+            break
+
+    for stage in [
+        magazyn,
+        linia_produkcyjna,
+        personalizacja,
+        testy_jakosci,
+        badania_prototypow,
+        wysylka,
+    ]:
+        stage.flush_waiting_times(current_time)
+
     # Collecting statistics
     wszystkie_etapy = [
         magazyn,
@@ -307,324 +820,533 @@ def symulacja(czas_trwania: int):
         badania_prototypow,
         wysylka,
     ]
-    total_exits = len(badania_prototypow.processed_requests) + len(
-        wysylka.processed_requests
-    )
-    total_time_in_system = sum(
-        r.time_in_system
-        for r in badania_prototypow.processed_requests + wysylka.processed_requests
+    total_time_in_system = (
+        badania_prototypow.exited_time_in_system + wysylka.exited_time_in_system
     )
-    total_waiting_times = sum(sum(stage.waiting_times) for stage in wszystkie_etapy)
+    total_waiting_times = sum(suma(stage.waiting_times) for stage in wszystkie_etapy)
+
+    shipped = dict(wysylka.exited)
+    prototype_research = dict(badania_prototypow.exited)
+    total_exited = sum(shipped.values()) + sum(prototype_research.values())
+
+    warmup = 0
+    if truncate_warmup or steady_state_length is not None:
+        warmup = detect_warmup(wszystkie_etapy)
+        if warmup is None:
+            # No steady state detected: the furthest point MSER considers
+            warmup = current_time // 2
+    # Averages over the requests leaving after the warm-up
+    exited_after_warmup = total_exited
+    if warmup:
+        exited_after_warmup = suma_od(exited_per_time, warmup)
+        total_time_in_system = suma_od(time_in_system_per_time, warmup)
+        total_waiting_times = sum(
+            suma_od(stage.waiting_time_sums, warmup) for stage in wszystkie_etapy
+        )
 
-    print("\nWyniki Symulacji:")
-    print(
-        f"Całkowita liczba zgłoszeń wchodzących do systemu: {len(wszystkie_zgloszenia)}"
+    result = SimulationResult(
+        simulation_time=current_time,
+        total_requests=zgloszenia.total_added,
+        shipped=shipped,
+        prototype_research=prototype_research,
+        total_exited=total_exited,
+        avg_time_in_system=(
+            total_time_in_system / exited_after_warmup if exited_after_warmup > 0 else 0
+        ),
+        avg_waiting_time=(
+            total_waiting_times / exited_after_warmup if exited_after_warmup > 0 else 0
+        ),
+        remaining_requests=sum(
+            stage.queue_length + stage.transit_count for stage in wszystkie_etapy
+        ),
+        stages={
+            stage.name: stage_statistics(stage, warmup) for stage in wszystkie_etapy
+        },
+        stage_series={stage.name: stage_series(stage) for stage in wszystkie_etapy},
+        series_step=1 if series_points is None else wysylka.time.krok,
+        warmup=warmup,
     )
-
-    num_standard_shipped = len(
-        [r for r in wysylka.processed_requests if r.type == "standard"]
+    if zgloszenia.recycle:
+        result.distributions = {
+            "time_in_system": zgloszenia.exited_times_in_system,
+            "waiting_time": zgloszenia.exited_waiting_times,
+        }
+    else:
+        result.requests = zgloszenia
+
+    if pokaz_wyniki:
+        print_statistics(result.statistics())
+
+        # Generate plots
+        generate_plots(result)
+
+    return result
+
+
+def run(config: SimulationConfig) -> SimulationResult:
+    # Headless entry point: nothing is printed or plotted unless the
+    # configuration asks for it
+    result = symulacja(
+        config.czas_trwania,
+        transit_time=config.transit_time,
+        pokaz_wyniki=False,
+        strumienie=StrumienieLosowe(config.seed),
+        series_points=config.series_points,
+        truncate_warmup=config.truncate_warmup,
+        steady_state_length=config.steady_state_length,
+        capacity_ranges=config.capacity_ranges,
+        routing=config.routing,
     )
-    num_personalized_shipped = len(
-        [r for r in wysylka.processed_requests if r.type == "personalized"]
+    if config.print_results:
+        print_statistics(result.statistics())
+    if config.save_plots:
+        generate_plots(
+            result,
+            config.plot_directory,
+            max_points=config.plot_max_points,
+            downsampling=config.plot_downsampling,
+            max_workers=config.plot_workers,
+        )
+    return result
+
+
+def detect_warmup(stages) -> Optional[int]:
+    # End of the warm-up period (MSER-5): the latest of the truncation points
+    # of the queue lengths and waiting times of all stages, or None if some
+    # series has not reached a steady state
+    warmup = 0
+    for stage in stages:
+        for truncation in (
+            punkt_obciecia(stage.queue_lengths),
+            punkt_obciecia(stage.waiting_time_sums, stage.processed_per_time),
+        ):
+            if truncation is None:
+                return None
+            warmup = max(warmup, truncation)
+    return warmup
+
+
+def steady_state_reached(stages, steady_state_length: int) -> bool:
+    # Whether steady_state_length time units follow the detected warm-up
+    stages = list(stages)
+    warmup = detect_warmup(stages)
+    return (
+        warmup is not None
+        and len(stages[0].queue_lengths) - warmup >= steady_state_length
     )
-    num_prototype_shipped = len(
-        [r for r in wysylka.processed_requests if r.type == "prototype"]
-    )  # Should be zero
 
-    print("\nProdukty wysłane:")
-    print(f"  Standardowe: {num_standard_shipped}")
-    print(f"  Personalizowane: {num_personalized_shipped}")
-    print(f"  Prototypy: {num_prototype_shipped} (prototypy nie trafiają na wysyłkę)")
 
-    num_prototype_prototype = len(
-        [r for r in badania_prototypow.processed_requests if r.type == "prototype"]
-    )
-    num_standard_prototype = len(
-        [r for r in badania_prototypow.processed_requests if r.type == "standard"]
-    )
-    num_personalized_prototype = len(
-        [r for r in badania_prototypow.processed_requests if r.type == "personalized"]
+def stage_statistics(stage: Stage, warmup: int = 0) -> Dict[str, object]:
+    # warmup: number of initial time units left out of the averages
+    total_waiting_time_stage = suma(stage.waiting_times)
+    if warmup:
+        processed = suma_od(stage.processed_per_time, warmup)
+        return dict(
+            stage_statistics(stage),
+            avg_queue_length=srednia_od(stage.queue_lengths, warmup),
+            avg_utilization=srednia_od(stage.utilization, warmup),
+            avg_waiting_time=(
+                suma_od(stage.waiting_time_sums, warmup) / processed if processed else 0
+            ),
+        )
+    return {
+        "queue_length": stage.queue_length,
+        "transit_count": stage.transit_count,
+        "processed": sum(stage.statistics.values()),
+        "processed_by_type": dict(stage.statistics),
+        "rejected": stage.rejected,
+        "avg_queue_length": srednia(stage.queue_lengths),
+        "max_queue_length": stage.max_queue_length,
+        "avg_utilization": srednia(stage.utilization),
+        "avg_waiting_time": srednia(stage.waiting_times),
+        "total_waiting_time": total_waiting_time_stage,
+    }
+
+
+def batch_means(
+    result: SimulationResult, **options
+) -> Dict[str, Dict[str, PrzedzialSredniePaczek]]:
+    # Confidence intervals of the steady-state stage averages from a single
+    # run (batch means, after the warm-up); options as in srednie_paczek.
+    # Waiting times come from the per-unit sums weighted by the processed
+    # requests, because avg_waiting_times are not weighted by them.
+    step = result.series_step
+    # Whole values only: the last one may average fewer than step time units
+    start, end = -(-result.warmup // step), result.simulation_time // step
+
+    def values(series: Dict[str, List[float]], name: str) -> np.ndarray:
+        return np.asarray(series[name][start:end], dtype=float)
+
+    intervals = {}
+    for name, series in result.stage_series.items():
+        intervals[name] = {
+            "avg_queue_length": srednie_paczek(
+                values(series, "queue_lengths"), rozmiar_paczki=step, **options
+            ),
+            "avg_utilization": srednie_paczek(
+                values(series, "utilization"), rozmiar_paczki=step, **options
+            ),
+            "avg_waiting_time": srednie_paczek(
+                values(series, "waiting_time_sums"),
+                values(series, "processed_per_time"),
+                rozmiar_paczki=step,
+                **options,
+            ),
+        }
+    return intervals
+
+
+def stage_series(stage) -> Dict[str, List[float]]:
+    # Works for Stage and kohorty.CohortStage; in the streaming mode a value
+    # is the average of consecutive time units (and "time" their midpoint)
+    series = {}
+    for name in STAGE_SERIES:
+        values = getattr(stage, name)
+        if isinstance(values, SzeregZdziesiatkowany):
+            values = values.wartosci().tolist()
+        series[name] = values
+    return series
+
+
+def print_statistics(statistics: Dict[str, object]):
+    print("\nWyniki Symulacji:")
+    print(
+        f"Całkowita liczba zgłoszeń wchodzących do systemu: {statistics['total_requests']}"
     )
 
+    shipped = statistics["shipped"]
+    print("\nProdukty wysłane:")
+    print(f"  Standardowe: {shipped['standard']}")
+    print(f"  Personalizowane: {shipped['personalized']}")
+    print(
+        f"  Prototypy: {shipped['prototype']} (prototypy nie trafiają na wysyłkę)"
+    )  # Should be zero
+
+    prototype_research = statistics["prototype_research"]
     print("\nProdukty, które przeszły przez badania prototypowe:")
-    print(f"  Prototypy: {num_prototype_prototype}")
-    print(f"  Standardowe: {num_standard_prototype}")
-    print(f"  Personalizowane: {num_personalized_prototype}")
-
-    total_exited = (
-        num_standard_shipped
-        + num_personalized_shipped
-        + num_prototype_prototype
-        + num_standard_prototype
-        + num_personalized_prototype
-    )
+    print(f"  Prototypy: {prototype_research['prototype']}")
+    print(f"  Standardowe: {prototype_research['standard']}")
+    print(f"  Personalizowane: {prototype_research['personalized']}")
 
     print(
-        f"\nCałkowita liczba zgłoszeń opuszczających system: {total_exited} (powinno być równe lub mniejsze od liczby zgłoszeń wchodzących do systemu)"
+        f"\nCałkowita liczba zgłoszeń opuszczających system: {statistics['total_exited']} (powinno być równe lub mniejsze od liczby zgłoszeń wchodzących do systemu)"
     )
 
     # Additional statistics
-    if total_exited > 0:
-        avg_time_in_system = total_time_in_system / total_exited
-        avg_waiting_time_overall = total_waiting_times / total_exited
+    if statistics["total_exited"] > 0:
         print(
-            f"Średni czas zgłoszenia w sieci: {avg_time_in_system:.2f} jednostek czasu"
+            f"Średni czas zgłoszenia w sieci: {statistics['avg_time_in_system']:.2f} jednostek czasu"
         )
         print(
-            f"Średni całkowity czas oczekiwania w kolejkach: {avg_waiting_time_overall:.2f} jednostek czasu"
+            f"Średni całkowity czas oczekiwania w kolejkach: {statistics['avg_waiting_time']:.2f} jednostek czasu"
         )
     else:
         print("Brak zgłoszeń opuszczających system.")
 
-    # Check if any requests remain in the system
-    remaining_requests = sum(len(stage.queue) for stage in wszystkie_etapy) + sum(
-        len(stage.transit_queue) for stage in wszystkie_etapy
-    )
     print(
-        f"\nLiczba zgłoszeń pozostałych w systemie po zakończeniu symulacji: {remaining_requests}"
+        f"\nLiczba zgłoszeń pozostałych w systemie po zakończeniu symulacji: {statistics['remaining_requests']}"
     )
+    if statistics.get("warmup"):
+        print(
+            f"Średnie liczone od jednostki czasu {statistics['warmup']} (pominięta rozgrzewka)"
+        )
 
     # Display statistics for each stage
     print("\nStatystyki etapów:")
-    for stage in wszystkie_etapy:
-        print(f"Etap: {stage.name}")
-        print(f"  Liczba zgłoszeń w kolejce: {len(stage.queue)}")
-        print(f"  Liczba zgłoszeń w tranzycie: {len(stage.transit_queue)}")
-        print(f"  Przetworzone zgłoszenia: {sum(stage.statistics.values())}")
+    for name, stage in statistics["stages"].items():
+        print(f"Etap: {name}")
+        print(f"  Liczba zgłoszeń w kolejce: {stage['queue_length']}")
+        print(f"  Liczba zgłoszeń w tranzycie: {stage['transit_count']}")
+        print(f"  Przetworzone zgłoszenia: {stage['processed']}")
         print("  Statystyki typów:")
-        for type_, count in stage.statistics.items():
+        for type_, count in stage["processed_by_type"].items():
             print(f"    {type_.capitalize()}: {count}")
-        avg_queue_length = (
-            sum(stage.queue_lengths) / len(stage.queue_lengths)
-            if stage.queue_lengths
-            else 0
-        )
-        print(f"  Średnia długość kolejki: {avg_queue_length:.2f}")
-        print(f"  Maksymalna długość kolejki: {stage.max_queue_length}")
-        avg_utilization = (
-            sum(stage.utilization) / len(stage.utilization)
-            if len(stage.utilization) > 0
-            else 0
-        )
-        print(f"  Średnie wykorzystanie etapu: {avg_utilization:.2f}%")
-        total_waiting_time_stage = sum(stage.waiting_times)
-        avg_waiting_time_stage = (
-            total_waiting_time_stage / len(stage.waiting_times)
-            if stage.waiting_times
-            else 0
-        )
+        if stage.get("rejected"):
+            print(f"  Odrzucone zgłoszenia (pełna kolejka): {stage['rejected']}")
+        print(f"  Średnia długość kolejki: {stage['avg_queue_length']:.2f}")
+        print(f"  Maksymalna długość kolejki: {stage['max_queue_length']}")
+        print(f"  Średnie wykorzystanie etapu: {stage['avg_utilization']:.2f}%")
         print(
-            f"  Średni czas oczekiwania w kolejce: {avg_waiting_time_stage:.2f} jednostek czasu"
+            f"  Średni czas oczekiwania w kolejce: {stage['avg_waiting_time']:.2f} jednostek czasu"
         )
         print(
-            f"  Całkowity czas oczekiwania w kolejce: {total_waiting_time_stage} jednostek czasu"
+            f"  Całkowity czas oczekiwania w kolejce: {stage['total_waiting_time']} jednostek czasu"
         )
         print("")
 
-    # Generate plots
-    generate_plots(wszystkie_etapy, current_time, wszystkie_zgloszenia)
 
+def generate_plots(
+    result: SimulationResult,
+    directory: str = ".",
+    max_points: Optional[int] = None,
+    downsampling: str = "min_max",
+    max_workers: Optional[int] = None,
+):
+    # max_points limits the number of points per time series (min_max or
+    # lttb, see narzedzia.wykresy); the figures are independent, max_workers
+    # is passed to narzedzia.wykresy.rysuj (by default a process pool only for
+    # long series)
+
+    # Skip 'Magazyn Surowców'
+    stage_names = list(result.stage_series)[1:]
+    # The histograms need individual requests or, in the streaming mode, the
+    # distributions (neither is kept in the cohort mode)
+    if result.distributions is not None:
+        histograms = {
+            name: dane_histogramu(distribution) + (srednia(distribution),)
+            for name, distribution in result.distributions.items()
+            if len(distribution)
+        }
+    else:
+        requests = result.requests if result.requests is not None else RequestStore()
+        times_in_system = requests.times_in_system()
+        times_in_system = times_in_system[times_in_system > 0]
+        all_waiting_times = requests.waiting_time[: len(requests)]
+        histograms = {
+            name: (values, None, values.mean())
+            for name, values in (
+                ("time_in_system", times_in_system),
+                ("waiting_time", all_waiting_times),
+            )
+            if len(values)
+        }
+
+    def lines(series_name: str) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+        return [
+            (name,)
+            + tuple(
+                zmniejsz(
+                    result.stage_series[name]["time"],
+                    result.stage_series[name][series_name],
+                    max_points,
+                    downsampling,
+                )
+            )
+            for name in stage_names
+        ]
+
+    def path(file_name: str) -> str:
+        return os.path.join(directory, file_name)
+
+    figures = []
 
-def generate_plots(stages: List[Stage], simulation_time: int, requests: List[Request]):
     # 1. Queue Length Over Time for each stage
-    plt.figure(figsize=(12, 6))
-    for stage in stages[1:]:  # Skip 'Magazyn Surowców'
-        plt.plot(stage.time, stage.queue_lengths, label=stage.name)
-    plt.title("Długości kolejek w zależności od czasu")
-    plt.xlabel("Czas")
-    plt.ylabel("Liczba zgłoszeń w kolejce")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("queue_length_over_time.png")
-    plt.close()
+    figures.append(
+        (
+            plot_lines,
+            (
+                lines("queue_lengths"),
+                "Długości kolejek w zależności od czasu",
+                "Liczba zgłoszeń w kolejce",
+                path("queue_length_over_time.png"),
+            ),
+        )
+    )
 
     # 2. Distribution of Time Spent in the System
-    times_in_system = [r.time_in_system for r in requests if r.time_in_system > 0]
-    if times_in_system:
-        plt.figure(figsize=(8, 6))
-        plt.hist(times_in_system, bins=20, edgecolor="black", label="Czas w sieci")
-        avg_time_in_system = sum(times_in_system) / len(times_in_system)
-        plt.axvline(
-            x=avg_time_in_system,
-            color="red",
-            linestyle="--",
-            label="Średni czas w sieci",
+    if "time_in_system" in histograms:
+        figures.append(
+            (
+                plot_histogram,
+                (
+                    histograms["time_in_system"],
+                    ("Czas w sieci", "Średni czas w sieci"),
+                    "Rozkład czasu spędzonego w sieci przez zgłoszenia",
+                    "Czas (jednostki czasu)",
+                    path("time_in_system_distribution.png"),
+                ),
+            )
         )
-        plt.title("Rozkład czasu spędzonego w sieci przez zgłoszenia")
-        plt.xlabel("Czas (jednostki czasu)")
-        plt.ylabel("Liczba zgłoszeń")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig("time_in_system_distribution.png")
-        plt.close()
 
     # 3. Distribution of Waiting Time in Queues
-    all_waiting_times = []
-    # for stage in stages[1:]:  # Exclude 'Magazyn Surowców'
-    #     all_waiting_times.extend(stage.waiting_times)
-    for request in requests:
-        all_waiting_times.append(request.waiting_time)
-    if all_waiting_times:
-        plt.figure(figsize=(8, 6))
-        plt.hist(
-            all_waiting_times,
-            bins=20,
-            edgecolor="black",
-            label="Czas oczekiwania w kolejce",
-        )
-        avg_waiting_time = sum(all_waiting_times) / len(all_waiting_times)
-        plt.axvline(
-            x=avg_waiting_time,
-            color="red",
-            linestyle="--",
-            label="Średni czas oczekiwania",
+    if "waiting_time" in histograms:
+        figures.append(
+            (
+                plot_histogram,
+                (
+                    histograms["waiting_time"],
+                    ("Czas oczekiwania w kolejce", "Średni czas oczekiwania"),
+                    "Rozkład czasu oczekiwania w kolejkach",
+                    "Czas oczekiwania (jednostki czasu)",
+                    path("waiting_time_distribution.png"),
+                ),
+            )
         )
-        plt.title("Rozkład czasu oczekiwania w kolejkach")
-        plt.xlabel("Czas oczekiwania (jednostki czasu)")
-        plt.ylabel("Liczba zgłoszeń")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig("waiting_time_distribution.png")
-        plt.close()
 
     # 4. Number of Requests Processed Over Time for each stage
-    plt.figure(figsize=(12, 6))
-    for stage in stages[1:]:
-        plt.plot(stage.time, stage.processed_per_time, label=stage.name)
-    plt.title("Liczba przetworzonych zgłoszeń w danej jednostce czasu")
-    plt.xlabel("Czas")
-    plt.ylabel("Liczba przetworzonych zgłoszeń")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("processed_requests_over_time.png")
-    plt.close()
+    figures.append(
+        (
+            plot_lines,
+            (
+                lines("processed_per_time"),
+                "Liczba przetworzonych zgłoszeń w danej jednostce czasu",
+                "Liczba przetworzonych zgłoszeń",
+                path("processed_requests_over_time.png"),
+            ),
+        )
+    )
 
     # 5. Average Waiting Time Over Time for each stage
+    figures.append(
+        (
+            plot_lines,
+            (
+                lines("avg_waiting_times"),
+                "Średni czas oczekiwania w kolejce w danej jednostce czasu",
+                "Średni czas oczekiwania (jednostki czasu)",
+                path("average_waiting_time_over_time.png"),
+            ),
+        )
+    )
+
+    # 6. Stage Utilization
+    figures.append(
+        (
+            plot_bars,
+            (
+                stage_names,
+                [result.stages[name]["avg_utilization"] for name in stage_names],
+                "skyblue",
+                "Średnie wykorzystanie systemów",
+                ("Etap", "Wykorzystanie (%)"),
+                path("stage_utilization.png"),
+            ),
+        )
+    )
+
+    # 7. Number of Requests Processed by Each Stage
+    figures.append(
+        (
+            plot_bars,
+            (
+                stage_names,
+                [result.stages[name]["processed"] for name in stage_names],
+                "green",
+                "Liczba zgłoszeń przetworzonych przez każdy system",
+                ("System", "Liczba przetworzonych zgłoszeń"),
+                path("requests_processed_by_stage.png"),
+            ),
+        )
+    )
+
+    rysuj(figures, max_workers)
+
+
+# Single figures of generate_plots; module-level so that they can run in
+# worker processes
+
+
+def plot_lines(
+    lines: List[Tuple[str, np.ndarray, np.ndarray]], title: str, ylabel: str, path: str
+):
+    plt = pyplot()
     plt.figure(figsize=(12, 6))
-    for stage in stages[1:]:
-        plt.plot(stage.time, stage.avg_waiting_times, label=stage.name)
-    plt.title("Średni czas oczekiwania w kolejce w danej jednostce czasu")
+    for label, x, y in lines:
+        plt.plot(x, y, label=label)
+    plt.title(title)
     plt.xlabel("Czas")
-    plt.ylabel("Średni czas oczekiwania (jednostki czasu)")
+    plt.ylabel(ylabel)
     plt.legend()
     plt.grid(True)
     plt.tight_layout()
-    plt.savefig("average_waiting_time_over_time.png")
+    plt.savefig(path)
     plt.close()
 
-    # 6. Stage Utilization
-    stage_names = [stage.name for stage in stages[1:]]
-    avg_utilizations = [
-        sum(stage.utilization) / len(stage.utilization) if stage.utilization else 0
-        for stage in stages[1:]
-    ]
-    plt.figure(figsize=(10, 6))
-    plt.bar(stage_names, avg_utilizations, color="skyblue")
-    plt.title("Średnie wykorzystanie systemów")
-    plt.xlabel("Etap")
-    plt.ylabel("Wykorzystanie (%)")
-    plt.xticks(rotation=45)
+
+def plot_histogram(
+    data: Tuple[np.ndarray, Optional[np.ndarray], float],
+    labels: Tuple[str, str],
+    title: str,
+    xlabel: str,
+    path: str,
+):
+    # data: values, their weights (None for single observations) and the mean;
+    # labels: of the histogram and of the mean line
+    values, weights, mean = data
+    plt = pyplot()
+    plt.figure(figsize=(8, 6))
+    plt.hist(values, bins=20, weights=weights, edgecolor="black", label=labels[0])
+    plt.axvline(x=mean, color="red", linestyle="--", label=labels[1])
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel("Liczba zgłoszeń")
+    plt.legend()
     plt.grid(True)
     plt.tight_layout()
-    plt.savefig("stage_utilization.png")
+    plt.savefig(path)
     plt.close()
 
-    # 7. Number of Requests Processed by Each Stage
-    total_processed_by_stage = [sum(stage.statistics.values()) for stage in stages[1:]]
+
+def plot_bars(
+    names: List[str],
+    values: List[float],
+    color: str,
+    title: str,
+    labels: Tuple[str, str],
+    path: str,
+):
+    # labels: of the x and y axes
+    plt = pyplot()
     plt.figure(figsize=(10, 6))
-    plt.bar(stage_names, total_processed_by_stage, color="green")
-    plt.title("Liczba zgłoszeń przetworzonych przez każdy system")
-    plt.xlabel("System")
-    plt.ylabel("Liczba przetworzonych zgłoszeń")
+    plt.bar(names, values, color=color)
+    plt.title(title)
+    plt.xlabel(labels[0])
+    plt.ylabel(labels[1])
     plt.xticks(rotation=45)
     plt.grid(True)
     plt.tight_layout()
-    plt.savefig("requests_processed_by_stage.png")
+    plt.savefig(path)
     plt.close()
 
 
 def find_probability(state: List[int]) -> float:
+    # Product-form probability of `state` = numbers of requests at: production,
+    # personalization, testing, shipping, prototype research; see jackson.py
     if len(state) != 5:
         return 0
 
-    probability = 1
-
-    mi_produkcja = 60
-    mi_personalizacja = 6
-    mi_testy = 50
-    mi_badania = 4
-    mi_wysylka = 50
-
-    p_mag_produkcja_standard, p_mag_produkcja_person, p_mag_produkcja_prototyp = 1, 1, 1
-    p_produkcja_testy_standard = 0.99
-    p_produkcja_badania_standard = 0.01
-    p_testy_wysylka_standard = 0.99
-    p_testy_badania_standard = 0.01
-
-    p_produkcja_personalizacja_person = 1
-    p_personalizacja_testy_person = 0.99
-    p_personalizacja_badania_person = 0.01
-    p_testy_wysylka_person = 0.99
-    p_testy_badania_person = 0.01
-
-    p_produkcja_badania_prototyp = 1
-
-    e_produkcja_standard = p_mag_produkcja_standard
-    e_testy_standard = e_produkcja_standard * p_produkcja_testy_standard
-    e_badania_standard = (
-        e_produkcja_standard * p_produkcja_badania_standard
-        + e_testy_standard * p_testy_badania_standard
-    )
-    e_wysylka_standard = e_testy_standard * p_testy_wysylka_standard
-
-    e_produkcja_person = p_mag_produkcja_person
-    e_personalizacja_person = e_produkcja_person * p_produkcja_personalizacja_person
-    e_testy_person = e_personalizacja_person * p_personalizacja_testy_person
-    e_badania_person = (
-        e_personalizacja_person * p_personalizacja_badania_person
-        + e_testy_person * p_testy_badania_person
-    )
-    e_wysylka_person = e_testy_person * p_testy_wysylka_person
+    stages = ["produkcja", "personalizacja", "testy", "wysylka", "badania"]
+    produkcja, personalizacja, testy, wysylka, badania = range(len(stages))
+    mi = [60, 6, 50, 50, 4]
 
-    e_produkcja_prototyp = p_mag_produkcja_prototyp
-    e_badania_prototyp = e_produkcja_prototyp * p_produkcja_badania_prototyp
+    # Routing per request class: standard, personalized, prototype
+    routing = np.zeros((3, len(stages), len(stages)))
+    standard, person, prototyp = routing
+    standard[produkcja, testy], standard[produkcja, badania] = 0.99, 0.01
+    standard[testy, wysylka], standard[testy, badania] = 0.99, 0.01
+    person[produkcja, personalizacja] = 1
+    person[personalizacja, testy], person[personalizacja, badania] = 0.99, 0.01
+    person[testy, wysylka], person[testy, badania] = 0.99, 0.01
+    prototyp[produkcja, badania] = 1
 
-    lambda_standard, lambda_person, lambda_prototyp = 50 * 0.85, 50 * 0.1, 50 * 0.05
+    # All requests enter production from the warehouse
+    external_rates = np.zeros((3, len(stages)))
+    external_rates[:, produkcja] = [50 * 0.85, 50 * 0.1, 50 * 0.05]
 
-    ro_produkcja = (
-        lambda_standard * (e_produkcja_standard / mi_produkcja)
-        + lambda_person * (e_produkcja_person / mi_produkcja)
-        + lambda_prototyp * (e_produkcja_prototyp / mi_produkcja)
-    )
-
-    ro_personalizacja = lambda_person * (e_personalizacja_person / mi_personalizacja)
-    ro_testy = lambda_standard * (e_testy_standard / mi_testy) + lambda_person * (
-        e_testy_person / mi_testy
-    )
-    ro_wysylka = lambda_standard * (e_wysylka_standard / mi_wysylka) + lambda_person * (
-        e_wysylka_person / mi_wysylka
-    )
-    ro_badania = (
-        lambda_standard * (e_badania_standard / mi_badania)
-        + lambda_person * (e_badania_person / mi_badania)
-        + lambda_prototyp * (e_badania_prototyp / mi_badania)
-    )
-
-    ros = [ro_produkcja, ro_personalizacja, ro_testy, ro_wysylka, ro_badania]
-
-    for amount, ro in zip(state, ros):
-        probability *= calc_prob(ro=ro, amount=amount)
-    return probability
+    network = jackson_network(stages, mi, external_rates, routing)
+    return network.state_probability(state)
 
 
 def calc_prob(ro: float, amount: int):
     return (1 - ro) * (ro**amount)
 
 
+def replikacja(configuration, seed) -> Dict[str, object]:
+    # A single run without printing or plots, e.g. for narzedzia.replikacje.
+    # configuration: SimulationConfig or a dict with czas_trwania and
+    # optionally transit_time, capacity_ranges and routing
+    if not isinstance(configuration, SimulationConfig):
+        configuration = SimulationConfig(
+            configuration["czas_trwania"],
+            transit_time=configuration.get("transit_time", 1),
+            capacity_ranges=configuration.get("capacity_ranges"),
+            routing=configuration.get("routing"),
+        )
+    return run(
+        replace(configuration, seed=seed, print_results=False, save_plots=False)
+    ).statistics()
+
+
 def main():
     # state = [2, 3, 2, 1, 2]
     # prob = find_probability(state=state)
@@ -0,0 +1,191 @@
+# Przybliżenia analityczne modelu kas z koeljkav5, bez uruchamiania symulacji.
+#
+# Kasy to c jednakowych kanałów obsługi, klienci przychodzą strumieniem
+# Poissona, a czas obsługi zależy od klasy klienta (SERVICE_TIMES z wagami
+# CLIENT_AMOUNT_WEIGHTS). Używamy:
+# - wzoru Erlanga C i przybliżenia Allena-Cunneena dla M/G/c bez rezygnacji,
+# - modelu Erlang-A (M/M/c+M): proces narodzin i śmierci z wykładniczą
+#   cierpliwością o średniej `cierpliwosc` (domyślnie CLIENT_PATIENCE),
+#   rozwiązany numerycznie.
+# Symulacja liczy czas w pełnych jednostkach, a cierpliwość jest w niej stała,
+# więc wyniki są przybliżeniem; porownanie_z_symulacja pokazuje, jak dokładnym.
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+from narzedzia.losowanie import StrumienieLosowe
+from system_kolejkowy.koeljkav5 import (
+    CLIENT_AMOUNTS,
+    CLIENT_AMOUNT_PROBABILITIES,
+    CLIENT_PATIENCE,
+    SERVICE_TIMES,
+    Kolejka,
+    SSCheckout,
+    symulacja_zdarzeniowa,
+)
+
+
+def momenty_czasu_obslugi():
+    # Średnia i kwadrat współczynnika zmienności czasu obsługi
+    times = np.array([SERVICE_TIMES[a] for a in CLIENT_AMOUNTS], dtype=float)
+    srednia = float(CLIENT_AMOUNT_PROBABILITIES @ times)
+    drugi_moment = float(CLIENT_AMOUNT_PROBABILITIES @ times**2)
+    return srednia, drugi_moment / srednia**2 - 1
+
+
+def erlang_c(liczba_kas: int, obciazenie: float) -> float:
+    # Prawdopodobieństwo oczekiwania w M/M/c; obciazenie = lambda * E[S]
+    if obciazenie >= liczba_kas:
+        return 1.0
+    # Erlang B rekurencyjnie, potem przejście do Erlanga C
+    erlang_b = 1.0
+    for k in range(1, liczba_kas + 1):
+        erlang_b = obciazenie * erlang_b / (k + obciazenie * erlang_b)
+    rho = obciazenie / liczba_kas
+    return erlang_b / (1 - rho + rho * erlang_b)
+
+
+def oczekiwanie_mgc(
+    liczba_kas: int,
+    intensywnosc_przyjsc: float,
+    sredni_czas_obslugi: float,
+    kwadrat_zmiennosci: float,
+) -> float:
+    # Średni czas oczekiwania w M/G/c bez rezygnacji (Allen-Cunneen)
+    obciazenie = intensywnosc_przyjsc * sredni_czas_obslugi
+    if obciazenie >= liczba_kas:
+        return math.inf
+    mu = 1 / sredni_czas_obslugi
+    return (
+        erlang_c(liczba_kas, obciazenie)
+        / (liczba_kas * mu - intensywnosc_przyjsc)
+        * (1 + kwadrat_zmiennosci)
+        / 2
+    )
+
+
+def erlang_a(
+    liczba_kas: int,
+    intensywnosc_przyjsc: float,
+    intensywnosc_obslugi: float,
+    intensywnosc_rezygnacji: float,
+    tolerancja: float = 1e-12,
+) -> Dict[str, float]:
+    # Model M/M/c+M jako proces narodzin i śmierci: w stanie n przyjścia mają
+    # intensywność lambda, a odejścia min(n, c) * mu + max(n - c, 0) * theta
+    lam, mu, theta, c = (
+        intensywnosc_przyjsc,
+        intensywnosc_obslugi,
+        intensywnosc_rezygnacji,
+        liczba_kas,
+    )
+    # Liczba stanów, po której prawdopodobieństwa są pomijalne
+    liczba_stanow = c + 1
+    while True:
+        n = np.arange(1, liczba_stanow)
+        deaths = np.minimum(n, c) * mu + np.maximum(n - c, 0) * theta
+        log_pi = np.concatenate(([0.0], np.cumsum(np.log(lam / deaths))))
+        pi = np.exp(log_pi - log_pi.max())
+        pi /= pi.sum()
+        if pi[-1] < tolerancja or liczba_stanow > 10**6:
+            break
+        liczba_stanow *= 2
+
+    n = np.arange(liczba_stanow)
+    w_kolejce = np.maximum(n - c, 0)
+    busy = np.minimum(n, c)
+    srednia_dlugosc_kolejki = float(pi @ w_kolejce)
+
+    # Klient, który zastaje n >= c klientów, jest j = n - c + 1 w kolejce.
+    # Każdy krok do przodu trwa średnio 1 / (c mu + i theta) i kończy się
+    # awansem z prawdopodobieństwem (c mu + (i - 1) theta) / (c mu + i theta).
+    j = np.arange(1, liczba_stanow - c + 1)
+    step_rate = c * mu + j * theta
+    p_obsluzony = np.cumprod((c * mu + (j - 1) * theta) / step_rate)
+    oczekiwanie = np.cumsum(1 / step_rate)
+    p_czeka = pi[c:]
+    p_obsluga = pi[:c].sum() + p_czeka @ p_obsluzony
+    return {
+        "prawdopodobienstwo_oczekiwania": float(p_czeka.sum()),
+        "prawdopodobienstwo_rezygnacji": float(1 - p_obsluga),
+        # Średni czas oczekiwania obsłużonych klientów
+        "sredni_czas_oczekiwania": float(
+            (p_czeka @ (p_obsluzony * oczekiwanie)) / p_obsluga
+        ),
+        "srednia_dlugosc_kolejki": srednia_dlugosc_kolejki,
+        "wykorzystanie": float(pi @ busy) / c,
+    }
+
+
+def przyblizenie_analityczne(
+    liczba_kas: int,
+    srednia_intensywnosc_przyjsc: float,
+    cierpliwosc: float = CLIENT_PATIENCE,
+) -> Dict[str, float]:
+    # Miary o tych samych nazwach co w koeljkav5.podsumowanie; wykorzystanie
+    # kas jest średnią dla wszystkich kas
+    sredni_czas_obslugi, kwadrat_zmiennosci = momenty_czasu_obslugi()
+    wynik = erlang_a(
+        liczba_kas,
+        srednia_intensywnosc_przyjsc,
+        1 / sredni_czas_obslugi,
+        1 / cierpliwosc,
+    )
+    return {
+        "sredni_czas_oczekiwania": wynik["sredni_czas_oczekiwania"],
+        "odsetek_niecierpliwych": wynik["prawdopodobienstwo_rezygnacji"] * 100,
+        "srednia_dlugosc_kolejki": wynik["srednia_dlugosc_kolejki"],
+        "wykorzystanie_kas": wynik["wykorzystanie"] * 100,
+        "prawdopodobienstwo_oczekiwania": wynik["prawdopodobienstwo_oczekiwania"],
+        # Bez rezygnacji klientów (M/G/c)
+        "sredni_czas_oczekiwania_mgc": oczekiwanie_mgc(
+            liczba_kas,
+            srednia_intensywnosc_przyjsc,
+            sredni_czas_obslugi,
+            kwadrat_zmiennosci,
+        ),
+    }
+
+
+def porownanie_z_symulacja(
+    liczba_kas: int,
+    srednia_intensywnosc_przyjsc: float,
+    czas_trwania: int = 10000,
+    strumienie: Optional[StrumienieLosowe] = None,
+    cierpliwosc: int = CLIENT_PATIENCE,
+) -> Dict[str, Dict[str, float]]:
+    # Przybliżenie analityczne obok wyniku jednej symulacji (bez wykresów)
+    analitycznie = przyblizenie_analityczne(
+        liczba_kas, srednia_intensywnosc_przyjsc, cierpliwosc
+    )
+    wynik = symulacja_zdarzeniowa(
+        kolejka=Kolejka(),
+        kasy=[SSCheckout() for _ in range(liczba_kas)],
+        czas_trwania=czas_trwania,
+        srednia_intensywnosc_przyjsc=srednia_intensywnosc_przyjsc,
+        pokaz_wyniki=False,
+        strumienie=strumienie,
+        cierpliwosc=cierpliwosc,
+    )
+    symulacja = dict(
+        wynik.statystyki(), wykorzystanie_kas=float(np.mean(wynik.wykorzystanie_kas))
+    )
+
+    porownanie = {}
+    for miara in (
+        "sredni_czas_oczekiwania",
+        "odsetek_niecierpliwych",
+        "srednia_dlugosc_kolejki",
+        "wykorzystanie_kas",
+    ):
+        roznica = analitycznie[miara] - symulacja[miara]
+        porownanie[miara] = {
+            "analitycznie": analitycznie[miara],
+            "symulacja": symulacja[miara],
+            "roznica": roznica,
+            "roznica_wzgledna": (
+                roznica / symulacja[miara] if symulacja[miara] else math.nan
+            ),
+        }
+    return porownanie
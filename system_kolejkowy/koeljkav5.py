@@ -1,18 +1,63 @@
-import random
+import heapq
+import math
+import os
+from collections import deque
+from dataclasses import dataclass, replace
+from functools import partial
 import numpy as np
-import matplotlib.pyplot as plt
-from typing import List
+from typing import Deque, Dict, List, Optional, Tuple
+
+from narzedzia.losowanie import (
+    PulaLosowan,
+    StrumienieLosowe,
+    pula_jednostajna,
+    pula_kategorii,
+)
+from narzedzia.statystyki import (
+    PrzedzialSredniePaczek,
+    punkt_obciecia,
+    srednie_paczek_szeregu,
+)
+from narzedzia.strumieniowe import (
+    Rozklad,
+    SzeregZdziesiatkowany,
+    dane_histogramu,
+    dopisz,
+    punkty,
+    srednia,
+    srednia_od,
+    suma_od,
+)
+from narzedzia.wykresy import pyplot, rysuj, zmniejsz
+
+
+# Klasy klientów (liczba zakupów) i ich udział w strumieniu przyjść
+CLIENT_AMOUNTS = ["little", "medium", "many"]
+CLIENT_AMOUNT_WEIGHTS = [20, 60, 20]
+CLIENT_AMOUNT_PROBABILITIES = np.array(CLIENT_AMOUNT_WEIGHTS) / sum(
+    CLIENT_AMOUNT_WEIGHTS
+)
+# Czas obsługi w kasie dla każdej klasy klienta
+# (wcześniej losowany: little 1-3, medium 4-7, many 8-10)
+SERVICE_TIMES = {"little": 2, "medium": 4, "many": 6}
+# Maksymalny czas oczekiwania w kolejce
+# (wcześniej losowany: random.randint(5, 15))
+CLIENT_PATIENCE = 2
+
+# Rodzaje zdarzeń w kalendarzu silnika zdarzeniowego (końce obsługi są
+# brane z kopca zajętych kas, zob. PulaKas)
+ZDARZENIE_PRZYJSCIE = 0
+ZDARZENIE_UTRATA_CIERPLIWOSCI = 1
+ZDARZENIE_KONTROLA_STANU = 2  # Sprawdzenie, czy osiągnięto stan ustalony
 
 
 class Client:
-    def __init__(self, arrival_time):
-        self.amount = random.choices(
-            ["little", "medium", "many"], weights=[20, 60, 20], k=1
-        )[0]
-        self.time_in_queue = 0
+    def __init__(self, arrival_time, amount: str, patience: int = CLIENT_PATIENCE):
+        self.amount = amount
+        self.time_in_queue = 0  # Uzupełniane przy opuszczeniu kolejki
         self.arrival_time = arrival_time
-        # self.patience = random.randint(5, 15)  # Maksymalny czas oczekiwania
-        self.patience = 2
+        self.in_queue = False
+        self.patience = patience  # Maksymalny czas oczekiwania
 
     def __repr__(self):
         return f"Amount: {self.amount}; Time in queue = {self.time_in_queue}"
@@ -28,53 +73,419 @@ class SSCheckout:
         return f"Free at: {self.free_at}"
 
     def process_client(self, client: Client, current_time):
-        client_time = 0
-        if client.amount == "little":
-            # client_time = random.randint(1, 3)
-            client_time = 2
-        elif client.amount == "medium":
-            # client_time = random.randint(4, 7)
-            client_time = 4
-        elif client.amount == "many":
-            # client_time = random.randint(8, 10)
-            client_time = 6
+        client_time = SERVICE_TIMES[client.amount]
         self.free_at = current_time + client_time
         self.clients_served += 1  # Zwiększ licznik obsłużonych klientów przez tę kasę
         return client_time
 
 
+class PulaKas:
+    # Kasy podzielone na wolne (lista, losowanie i usuwanie w O(1)) i zajęte
+    # (kopiec par (free_at, numer kasy)), więc jednostka czasu nie wymaga
+    # przeglądania wszystkich kas. Czas zajętości kasy jest dopisywany od razu
+    # przy rozpoczęciu obsługi, jako długość przedziału obsługi obciętego do
+    # końca symulacji.
+    def __init__(self, kasy: List[SSCheckout], czas_trwania: int):
+        self.kasy = kasy
+        self.czas_trwania = czas_trwania
+        self.wolne: List[int] = []
+        self.zajete = [(kasa.free_at, i) for i, kasa in enumerate(kasy)]
+        heapq.heapify(self.zajete)
+
+    @property
+    def liczba_zajetych(self) -> int:
+        return len(self.zajete)
+
+    def zwolnij(self, timer: int):
+        # Kasy, które są wolne w jednostce czasu timer
+        while self.zajete and self.zajete[0][0] <= timer:
+            self.wolne.append(heapq.heappop(self.zajete)[1])
+
+    def obsluz(self, client: Client, timer: int, u: float) -> int:
+        # Obsługa klienta w losowej wolnej kasie (u z przedziału [0, 1));
+        # zwraca czas obsługi
+        pozycja = int(u * len(self.wolne))
+        i = self.wolne[pozycja]
+        self.wolne[pozycja] = self.wolne[-1]
+        self.wolne.pop()
+        kasa = self.kasy[i]
+        processing_time = kasa.process_client(client, timer)
+        kasa.busy_time += min(kasa.free_at, self.czas_trwania) - timer
+        heapq.heappush(self.zajete, (kasa.free_at, i))
+        return processing_time
+
+    def zakoncz(self, koniec: int):
+        # Symulacja kończy się wcześniej (w jednostce koniec): bez zajętości po
+        # tej jednostce, dopisanej przy rozpoczęciu obsługi
+        for free_at, i in self.zajete:
+            if free_at > koniec:
+                self.kasy[i].busy_time -= min(free_at, self.czas_trwania) - koniec
+
+
 class Kolejka:
     def __init__(self):
-        self.queue: List[Client] = []
+        self.queue: Deque[Client] = deque()
+        # Kopiec terminów utraty cierpliwości: (arrival_time + patience, numer, klient).
+        # Klienci obsłużeni lub już usunięci są pomijani leniwie.
+        self.deadlines: List[Tuple[int, int, Client]] = []
+        self.num_waiting = 0  # Liczba klientów faktycznie czekających w kolejce
         self.num_impatient_clients = 0  # Licznik niecierpliwych klientów
+        self._next_number = 0
+
+    def __len__(self):
+        return self.num_waiting
 
     def is_empty(self):
-        return len(self.queue) == 0
+        return self.num_waiting == 0
 
     def add_client(self, client: Client):
+        client.in_queue = True
         self.queue.append(client)
+        heapq.heappush(
+            self.deadlines,
+            (client.arrival_time + client.patience, self._next_number, client),
+        )
+        self._next_number += 1
+        self.num_waiting += 1
+
+    def pop_client(self, current_time) -> Client:
+        self._drop_departed_from_front()
+        client = self.queue.popleft()
+        client.in_queue = False
+        client.time_in_queue = current_time - client.arrival_time
+        self.num_waiting -= 1
+        return client
 
-    def remove_impatient_clients(self):
-        remaining_clients = []
-        for client in self.queue:
-            if client.time_in_queue < client.patience:
-                # Klient jest cierpliwy, pozostaje w kolejce
-                remaining_clients.append(client)
-            else:
-                # Klient jest niecierpliwy
-                # if random.uniform(0, 1) > 0.5:
-                #     # Klient decyduje się opuścić kolejkę
-                #     self.num_impatient_clients += 1  # Zwiększ licznik
-                #     # Nie dodajemy klienta do remaining_clients
-                # else:
-                #     # Klient decyduje się pozostać w kolejce
-                #     remaining_clients.append(client)
+    def remove_impatient_clients(self, current_time):
+        # Na koniec jednostki czasu current_time klient spędził w kolejce
+        # current_time - arrival_time + 1 jednostek; jeśli to co najmniej
+        # patience, opuszcza kolejkę
+        while self.deadlines and self.deadlines[0][0] <= current_time + 1:
+            _, _, client = heapq.heappop(self.deadlines)
+            if client.in_queue:
+                client.in_queue = False
+                client.time_in_queue = current_time - client.arrival_time + 1
+                self.num_waiting -= 1
                 self.num_impatient_clients += 1
-        self.queue = remaining_clients
+        self._drop_departed_from_front()
+
+    def next_impatience_time(self) -> Optional[int]:
+        # Najbliższa jednostka czasu, na końcu której ktoś straci cierpliwość
+        while self.deadlines and not self.deadlines[0][2].in_queue:
+            heapq.heappop(self.deadlines)
+        if not self.deadlines:
+            return None
+        return self.deadlines[0][0] - 1
+
+    def _drop_departed_from_front(self):
+        while self.queue and not self.queue[0].in_queue:
+            self.queue.popleft()
+
+
+@dataclass
+class KonfiguracjaSymulacji:
+    liczba_kas: int
+    czas_trwania: int
+    srednia_intensywnosc_przyjsc: float
+    seed: Optional[object] = None  # Ziarno strumieni losowych (int lub SeedSequence)
+    zdarzeniowa: bool = True  # symulacja_zdarzeniowa albo symulacja krok po kroku
+    # Liczba punktów szeregów czasowych w trybie strumieniowym (stała pamięć,
+    # zob. serie_pomiarow); None oznacza pełne listy
+    punkty_szeregow: Optional[int] = None
+    # Statystyki stanu ustalonego: bez okresu rozgrzewki wykrytego metodą
+    # MSER-5; z dlugosc_ustalona symulacja kończy się, gdy po wykrytej
+    # rozgrzewce zebrano tyle jednostek czasu (najpóźniej po czas_trwania)
+    usun_rozgrzewke: bool = False
+    dlugosc_ustalona: Optional[int] = None
+    cierpliwosc: int = CLIENT_PATIENCE  # Maksymalny czas oczekiwania klientów
+    wypisz_wyniki: bool = False
+    zapisz_wykresy: bool = False
+    katalog_wykresow: str = "."
+    # Opcje zapisz_wykresy
+    liczba_punktow_wykresow: Optional[int] = None
+    metoda_zmniejszania: str = "min_max"
+    procesy_wykresow: Optional[int] = None
+
+
+@dataclass
+class WynikSymulacji:
+    czas_trwania: int
+    total_clients_arrived: int
+    total_clients_served: int
+    num_impatient_clients: int
+    odsetek_niecierpliwych: float
+    clients_remaining_in_queue: int
+    sredni_czas_w_systemie: float
+    sredni_czas_oczekiwania: float
+    srednia_dlugosc_kolejki: float
+    wykorzystanie_kas: List[float]
+    clients_served_by_cashier: List[int]
+    # Liczba początkowych jednostek czasu pominiętych w średnich czasów i
+    # długości kolejki (0 bez usuwania rozgrzewki); liczby klientów i
+    # wykorzystanie kas dotyczą całej symulacji
+    rozgrzewka: int
+    # Szeregi czasowe, po jednej wartości na jednostkę czasu
+    # (SzeregZdziesiatkowany w trybie strumieniowym)
+    queue_lengths: List[int]
+    clients_served_per_time: List[int]
+    # Średnie narastające do danej jednostki czasu, zob. SrednieBiezace
+    cumulative_waiting_time: List[float]
+    cumulative_time_in_system: List[float]
+    running_utilization: List[float]
+    # Sumy czasów oczekiwania i czasów w systemie klientów obsłużonych w danej
+    # jednostce czasu oraz liczba zajętych kas
+    waiting_time_per_time: List[int]
+    time_in_system_per_time: List[int]
+    busy_cashiers: List[int]
+    # Czasy obsłużonych klientów, w kolejności obsługi (Rozklad w trybie
+    # strumieniowym)
+    processed_clients_times: List[int]
+    waiting_times: List[int]
+
+    def statystyki(self) -> Dict[str, object]:
+        # Same statystyki (bez szeregów), np. dla narzedzia.replikacje
+        return {nazwa: getattr(self, nazwa) for nazwa in STATYSTYKI}
+
+
+# Pola WynikSymulacji zwracane przez statystyki()
+STATYSTYKI = (
+    "total_clients_arrived",
+    "total_clients_served",
+    "num_impatient_clients",
+    "odsetek_niecierpliwych",
+    "clients_remaining_in_queue",
+    "sredni_czas_w_systemie",
+    "sredni_czas_oczekiwania",
+    "srednia_dlugosc_kolejki",
+    "wykorzystanie_kas",
+    "clients_served_by_cashier",
+    "rozgrzewka",
+)
+
+
+def pula_klas_klientow(rng: np.random.Generator) -> PulaLosowan:
+    # Klasy kolejnych klientów, losowane blokami
+    return pula_kategorii(rng, CLIENT_AMOUNTS, CLIENT_AMOUNT_PROBABILITIES)
+
+
+def czasy_przyjsc(
+    czas_trwania: int, srednia_intensywnosc_przyjsc: float, rng: np.random.Generator
+):
+    # Kolejne czasy przyjść, losowane dopiero wtedy, gdy są potrzebne
+    next_arrival = rng.exponential(1 / srednia_intensywnosc_przyjsc)
+    while next_arrival < czas_trwania:
+        yield int(next_arrival)
+        next_arrival += rng.exponential(1 / srednia_intensywnosc_przyjsc)
+
+
+def generuj_czasy_przyjsc(
+    czas_trwania: int, srednia_intensywnosc_przyjsc: float, rng: np.random.Generator
+):
+    return list(czasy_przyjsc(czas_trwania, srednia_intensywnosc_przyjsc, rng))
+
+
+def nowa_seria(punkty_szeregow: Optional[int] = None):
+    # Szereg czasowy: lista albo, w trybie strumieniowym, szereg o stałej
+    # liczbie punktów
+    if punkty_szeregow is None:
+        return []
+    return SzeregZdziesiatkowany(punkty_szeregow)
+
+
+def serie_pomiarow(punkty_szeregow: Optional[int] = None):
+    # processed_clients_times, waiting_times, queue_lengths,
+    # clients_served_per_time: listy albo, w trybie strumieniowym, rozkłady i
+    # szeregi o stałej liczbie punktów
+    if punkty_szeregow is None:
+        return [], [], [], []
+    return (
+        Rozklad(),
+        Rozklad(),
+        nowa_seria(punkty_szeregow),
+        nowa_seria(punkty_szeregow),
+    )
+
+
+class SrednieBiezace:
+    # Średnie narastające (od początku symulacji do końca danej jednostki
+    # czasu): czas oczekiwania i czas w systemie obsłużonych klientów oraz
+    # wykorzystanie kas. Trzymane są tylko sumy, więc każda aktualizacja
+    # kosztuje O(1) niezależnie od liczby obsłużonych klientów i liczby kas;
+    # liczba zajętych kas pochodzi z puli kas. Do tego sumy z każdej jednostki
+    # czasu osobno, z których liczone są statystyki bez okresu rozgrzewki.
+    def __init__(self, pula: PulaKas, punkty_szeregow: Optional[int] = None):
+        self.pula = pula
+        self.liczba_obsluzonych = 0
+        self.suma_oczekiwania = 0
+        self.suma_czasu_w_systemie = 0
+        self.czas_zajetosci = 0  # Suma zajętych kas po jednostkach czasu
+        self.liczba_jednostek = 0
+        # Sumy dla bieżącej jednostki czasu
+        self.oczekiwanie_w_jednostce = 0
+        self.czas_w_systemie_w_jednostce = 0
+        self.cumulative_waiting_time = nowa_seria(punkty_szeregow)
+        self.cumulative_time_in_system = nowa_seria(punkty_szeregow)
+        self.running_utilization = nowa_seria(punkty_szeregow)
+        self.waiting_time_per_time = nowa_seria(punkty_szeregow)
+        self.time_in_system_per_time = nowa_seria(punkty_szeregow)
+        self.busy_cashiers = nowa_seria(punkty_szeregow)
+        self.strumieniowe = punkty_szeregow is not None
+
+    @property
+    def sredni_czas_oczekiwania(self) -> float:
+        if not self.liczba_obsluzonych:
+            return 0
+        return self.suma_oczekiwania / self.liczba_obsluzonych
+
+    @property
+    def sredni_czas_w_systemie(self) -> float:
+        if not self.liczba_obsluzonych:
+            return 0
+        return self.suma_czasu_w_systemie / self.liczba_obsluzonych
+
+    def obsluga(self, czas_oczekiwania: int, czas_obslugi: int):
+        self.liczba_obsluzonych += 1
+        self.suma_oczekiwania += czas_oczekiwania
+        self.suma_czasu_w_systemie += czas_oczekiwania + czas_obslugi
+        self.oczekiwanie_w_jednostce += czas_oczekiwania
+        self.czas_w_systemie_w_jednostce += czas_oczekiwania + czas_obslugi
+
+    def zapisz(self, liczba_jednostek: int = 1):
+        # Koniec liczba_jednostek jednostek czasu, w których stan się nie
+        # zmienia (kolejne jednostki bez zdarzeń w silniku zdarzeniowym).
+        # W trybie strumieniowym koszt nie zależy od liczba_jednostek.
+        zajete_kasy = self.pula.liczba_zajetych
+        liczba_kas = len(self.pula.kasy)
+        if self.strumieniowe:
+            self._zapisz_strumieniowo(liczba_jednostek, zajete_kasy, liczba_kas)
+        else:
+            dopisz(
+                self.cumulative_waiting_time,
+                self.sredni_czas_oczekiwania,
+                liczba_jednostek,
+            )
+            dopisz(
+                self.cumulative_time_in_system,
+                self.sredni_czas_w_systemie,
+                liczba_jednostek,
+            )
+            # Wykorzystanie zmienia się w każdej jednostce, bo rośnie mianownik
+            self.running_utilization.extend(
+                (self.czas_zajetosci + zajete_kasy * k)
+                / (liczba_kas * (self.liczba_jednostek + k))
+                * 100
+                for k in range(1, liczba_jednostek + 1)
+            )
+            dopisz(self.busy_cashiers, zajete_kasy, liczba_jednostek)
+            # Obsługi były tylko w pierwszej z jednostek
+            for seria, wartosc in (
+                (self.waiting_time_per_time, self.oczekiwanie_w_jednostce),
+                (self.time_in_system_per_time, self.czas_w_systemie_w_jednostce),
+            ):
+                seria.append(wartosc)
+                dopisz(seria, 0, liczba_jednostek - 1)
+        self.czas_zajetosci += zajete_kasy * liczba_jednostek
+        self.liczba_jednostek += liczba_jednostek
+        self.oczekiwanie_w_jednostce = 0
+        self.czas_w_systemie_w_jednostce = 0
+
+    def _zapisz_strumieniowo(
+        self, liczba_jednostek: int, zajete_kasy: int, liczba_kas: int
+    ):
+        # Wartości stałe w przerwie dopisywane są razem z liczbą powtórzeń,
+        # a wykorzystanie narastające sumami fragmentów w postaci zamkniętej
+        self.cumulative_waiting_time.append(
+            self.sredni_czas_oczekiwania, liczba_jednostek
+        )
+        self.cumulative_time_in_system.append(
+            self.sredni_czas_w_systemie, liczba_jednostek
+        )
+        self.running_utilization.append_ciagu(
+            partial(
+                _suma_wykorzystania,
+                self.czas_zajetosci,
+                zajete_kasy,
+                liczba_kas,
+                self.liczba_jednostek,
+            ),
+            liczba_jednostek,
+        )
+        self.busy_cashiers.append(zajete_kasy, liczba_jednostek)
+        self.waiting_time_per_time.append(self.oczekiwanie_w_jednostce)
+        self.time_in_system_per_time.append(self.czas_w_systemie_w_jednostce)
+        if liczba_jednostek > 1:
+            self.waiting_time_per_time.append(0, liczba_jednostek - 1)
+            self.time_in_system_per_time.append(0, liczba_jednostek - 1)
+
+
+def _suma_wykorzystania(
+    czas_zajetosci: int,
+    zajete_kasy: int,
+    liczba_kas: int,
+    liczba_jednostek: int,
+    od: int,
+    do: int,
+) -> float:
+    # Suma wykorzystania narastającego (w procentach) po jednostkach
+    # liczba_jednostek + k dla k = od + 1, ..., do, gdy zajętych jest stale
+    # zajete_kasy kas: (B + z k) / (c (T + k)) = (z + (B - z T) / (T + k)) / c
+    return (
+        100
+        / liczba_kas
+        * (
+            zajete_kasy * (do - od)
+            + (czas_zajetosci - zajete_kasy * liczba_jednostek)
+            * _suma_odwrotnosci(liczba_jednostek + od, liczba_jednostek + do)
+        )
+    )
+
+
+def _suma_odwrotnosci(m1: int, m2: int) -> float:
+    # 1 / (m1 + 1) + ... + 1 / m2: krótkie sumy wprost, długie z rozwinięcia
+    # asymptotycznego liczb harmonicznych (błąd rzędu 1e-12)
+    suma = 0.0
+    while m1 < m2 and (m1 < 32 or m2 - m1 <= 32):
+        m1 += 1
+        suma += 1 / m1
+    if m1 < m2:
+        suma += (
+            math.log1p((m2 - m1) / m1)
+            + (1 / m2 - 1 / m1) / 2
+            - (1 / m2**2 - 1 / m1**2) / 12
+            + (1 / m2**4 - 1 / m1**4) / 120
+        )
+    return suma
+
+
+def koniec_rozgrzewki(
+    queue_lengths, clients_served_per_time, srednie: SrednieBiezace
+) -> Optional[int]:
+    # Punkt obcięcia rozgrzewki (MSER-5): późniejszy z wyznaczonych dla
+    # długości kolejki i czasu oczekiwania obsłużonych klientów albo None,
+    # jeśli stanu ustalonego nie wykryto
+    obciecia = (
+        punkt_obciecia(queue_lengths),
+        punkt_obciecia(srednie.waiting_time_per_time, clients_served_per_time),
+    )
+    if None in obciecia:
+        return None
+    return max(obciecia)
+
+
+def stan_ustalony(
+    queue_lengths,
+    clients_served_per_time,
+    srednie: SrednieBiezace,
+    dlugosc_ustalona: int,
+) -> bool:
+    # Czy po wykrytej rozgrzewce jest już dlugosc_ustalona jednostek czasu
+    obciecie = koniec_rozgrzewki(queue_lengths, clients_served_per_time, srednie)
+    return obciecie is not None and len(queue_lengths) - obciecie >= dlugosc_ustalona
 
-    def increase_clients_in_queue_time(self):
-        for client in self.queue:
-            client.time_in_queue += 1
+
+def okres_kontroli(dlugosc_ustalona: Optional[int]) -> Optional[int]:
+    # Co ile jednostek czasu sprawdzać, czy osiągnięto stan ustalony
+    return None if dlugosc_ustalona is None else max(1, dlugosc_ustalona // 4)
 
 
 def symulacja(
@@ -82,207 +493,647 @@ def symulacja(
     kasy: List[SSCheckout],
     czas_trwania: int,
     srednia_intensywnosc_przyjsc: float,
-):
+    pokaz_wyniki: bool = True,
+    strumienie: Optional[StrumienieLosowe] = None,
+    punkty_szeregow: Optional[int] = None,
+    usun_rozgrzewke: bool = False,
+    dlugosc_ustalona: Optional[int] = None,
+    cierpliwosc: int = CLIENT_PATIENCE,
+) -> WynikSymulacji:
+    if strumienie is None:
+        strumienie = StrumienieLosowe()
+
     # Inicjalizacja zmiennych
-    processed_clients_times: List[int] = []
-    queue_lengths: List[int] = []
-    waiting_times: List[int] = []
-    clients_served_per_time = [0] * czas_trwania
-    cumulative_waiting_time = []
+    (
+        processed_clients_times,
+        waiting_times,
+        queue_lengths,
+        clients_served_per_time,
+    ) = serie_pomiarow(punkty_szeregow)
+    pula_kas = PulaKas(kasy, czas_trwania)
+    srednie = SrednieBiezace(pula_kas, punkty_szeregow)
     total_clients_served = 0
 
-    # Generowanie czasów przyjścia klientów
-    arrival_times = []
-    next_arrival = np.random.exponential(1 / srednia_intensywnosc_przyjsc)
-    while next_arrival < czas_trwania:
-        arrival_times.append(int(next_arrival))
-        next_arrival += np.random.exponential(1 / srednia_intensywnosc_przyjsc)
+    # Czasy przyjścia klientów
+    arrival_times = czasy_przyjsc(
+        czas_trwania, srednia_intensywnosc_przyjsc, strumienie.przyjscia
+    )
+    next_arrival = next(arrival_times, None)
 
-    total_clients_arrived = len(arrival_times)
+    total_clients_arrived = 0
+    klasy_klientow = pula_klas_klientow(strumienie.klasy)
+    wybor_kasy = pula_jednostajna(strumienie.obsluga)
+    koniec = czas_trwania
+    okres = okres_kontroli(dlugosc_ustalona)
 
     # Główna pętla symulacji
-    current_arrival_index = 0
     for timer in range(czas_trwania):
         # Przybycie klienta
-        while (
-            current_arrival_index < len(arrival_times)
-            and timer == arrival_times[current_arrival_index]
-        ):
-            klient = Client(arrival_time=timer)
+        while next_arrival == timer:
+            klient = Client(
+                arrival_time=timer,
+                amount=klasy_klientow.nastepna(),
+                patience=cierpliwosc,
+            )
             kolejka.add_client(klient)
-            current_arrival_index += 1
+            total_clients_arrived += 1
+            next_arrival = next(arrival_times, None)
 
         # Obsługa klientów w kasach
-        free_cashiers = [i for i, kasa in enumerate(kasy) if kasa.free_at <= timer]
-        while free_cashiers and not kolejka.is_empty():
-            # Losowo wybieramy indeks wolnej kasy
-            i = random.choice(free_cashiers)
-            kasa = kasy[i]
-
-            # Obsługujemy klienta
-            client = kolejka.queue.pop(0)
+        served_this_unit = 0
+        pula_kas.zwolnij(timer)
+        while pula_kas.wolne and not kolejka.is_empty():
+            # Obsługujemy klienta w losowo wybranej wolnej kasie
+            client = kolejka.pop_client(timer)
             client_wait_time = timer - client.arrival_time
-            processing_time = kasa.process_client(client, timer)
+            processing_time = pula_kas.obsluz(client, timer, wybor_kasy.nastepna())
             total_time_in_system = client_wait_time + processing_time
             processed_clients_times.append(total_time_in_system)
             waiting_times.append(client_wait_time)
-            clients_served_per_time[timer] += (
+            srednie.obsluga(client_wait_time, processing_time)
+            served_this_unit += (
                 1  # Zwiększ licznik obsłużonych klientów w tym momencie czasu
             )
             total_clients_served += 1  # Zwiększ całkowity licznik obsłużonych klientów
 
-            # Aktualizujemy listę wolnych kas
-            free_cashiers.remove(i)
+        clients_served_per_time.append(served_this_unit)
+        srednie.zapisz()
+
+        # Usunięcie klientów, którym skończyła się cierpliwość
+        kolejka.remove_impatient_clients(timer)
+
+        # Zbieranie danych do wykresów
+        queue_lengths.append(len(kolejka))
+
+        # Wcześniejsze zakończenie po osiągnięciu stanu ustalonego
+        if (
+            okres
+            and (timer + 1) % okres == 0
+            and stan_ustalony(
+                queue_lengths, clients_served_per_time, srednie, dlugosc_ustalona
+            )
+        ):
+            koniec = timer + 1
+            pula_kas.zakoncz(koniec)
+            break
+
+    return podsumowanie(
+        kolejka=kolejka,
+        kasy=kasy,
+        czas_trwania=koniec,
+        total_clients_arrived=total_clients_arrived,
+        total_clients_served=total_clients_served,
+        processed_clients_times=processed_clients_times,
+        waiting_times=waiting_times,
+        queue_lengths=queue_lengths,
+        clients_served_per_time=clients_served_per_time,
+        srednie=srednie,
+        pokaz_wyniki=pokaz_wyniki,
+        usun_rozgrzewke=usun_rozgrzewke or dlugosc_ustalona is not None,
+    )
+
+
+def symulacja_zdarzeniowa(
+    kolejka: Kolejka,
+    kasy: List[SSCheckout],
+    czas_trwania: int,
+    srednia_intensywnosc_przyjsc: float,
+    pokaz_wyniki: bool = True,
+    strumienie: Optional[StrumienieLosowe] = None,
+    punkty_szeregow: Optional[int] = None,
+    usun_rozgrzewke: bool = False,
+    dlugosc_ustalona: Optional[int] = None,
+    cierpliwosc: int = CLIENT_PATIENCE,
+) -> WynikSymulacji:
+    # Silnik zdarzeniowy: zegar przeskakuje od razu do najbliższego zdarzenia
+    # (przyjście, koniec obsługi, utrata cierpliwości), a jednostki czasu bez
+    # zdarzeń są jedynie uzupełniane w seriach danych. Statystyki są takie same
+    # jak w symulacja(), ale koszt zależy od liczby zdarzeń, a nie od
+    # czas_trwania * liczba kas.
+    if strumienie is None:
+        strumienie = StrumienieLosowe()
+
+    (
+        processed_clients_times,
+        waiting_times,
+        queue_lengths,
+        clients_served_per_time,
+    ) = serie_pomiarow(punkty_szeregow)
+    pula_kas = PulaKas(kasy, czas_trwania)
+    srednie = SrednieBiezace(pula_kas, punkty_szeregow)
+    total_clients_served = 0
+
+    # Czasy przyjścia klientów
+    arrival_times = czasy_przyjsc(
+        czas_trwania, srednia_intensywnosc_przyjsc, strumienie.przyjscia
+    )
+    next_arrival = next(arrival_times, None)
+
+    total_clients_arrived = 0
+    klasy_klientow = pula_klas_klientow(strumienie.klasy)
+    wybor_kasy = pula_jednostajna(strumienie.obsluga)
+
+    # Kalendarz zdarzeń: kopiec par (czas, rodzaj zdarzenia)
+    kalendarz = []
+    if next_arrival is not None:
+        heapq.heappush(kalendarz, (next_arrival, ZDARZENIE_PRZYJSCIE))
+    koniec = czas_trwania
+    okres = okres_kontroli(dlugosc_ustalona)
+    if okres:
+        heapq.heappush(kalendarz, (okres - 1, ZDARZENIE_KONTROLA_STANU))
+
+    last_timer = -1
+    # Jednostki czasu jeszcze niezapisane w seriach danych (ostatnia jednostka
+    # ze zdarzeniem i przerwa po niej mają ten sam stan, więc są zapisywane
+    # razem) i liczba klientów obsłużonych w pierwszej z nich
+    niezapisane = 0
+    obsluzeni = 0
+    while kalendarz or pula_kas.zajete:
+        # Najbliższe zdarzenie: z kalendarza albo koniec obsługi w kasie
+        if pula_kas.zajete and (
+            not kalendarz or pula_kas.zajete[0][0] <= kalendarz[0][0]
+        ):
+            timer = pula_kas.zajete[0][0]
+        else:
+            timer, _ = heapq.heappop(kalendarz)
+        if timer >= czas_trwania:
+            break
+        if timer <= last_timer:
+            # Ta jednostka czasu została już obsłużona
+            continue
+
+        # Zapis poprzedniej jednostki ze zdarzeniem i jednostek bez zdarzeń
+        niezapisane += timer - last_timer - 1
+        if niezapisane:
+            zapisz_jednostki(
+                queue_lengths,
+                clients_served_per_time,
+                srednie,
+                len(kolejka),
+                obsluzeni,
+                niezapisane,
+            )
+
+        # Przybycie klienta
+        while next_arrival == timer:
+            klient = Client(
+                arrival_time=timer,
+                amount=klasy_klientow.nastepna(),
+                patience=cierpliwosc,
+            )
+            kolejka.add_client(klient)
+            total_clients_arrived += 1
+            next_arrival = next(arrival_times, None)
+        if next_arrival is not None:
+            heapq.heappush(kalendarz, (next_arrival, ZDARZENIE_PRZYJSCIE))
+
+        # Obsługa klientów w kasach
+        served_this_unit = 0
+        pula_kas.zwolnij(timer)
+        while pula_kas.wolne and not kolejka.is_empty():
+            # Obsługujemy klienta w losowo wybranej wolnej kasie
+            client = kolejka.pop_client(timer)
+            client_wait_time = timer - client.arrival_time
+            processing_time = pula_kas.obsluz(client, timer, wybor_kasy.nastepna())
+            total_time_in_system = client_wait_time + processing_time
+            processed_clients_times.append(total_time_in_system)
+            waiting_times.append(client_wait_time)
+            srednie.obsluga(client_wait_time, processing_time)
+            served_this_unit += 1
+            total_clients_served += 1
 
-        cumulative_waiting_time.append(
-            sum(waiting_times) / total_clients_served if total_clients_served > 0 else 0
+        # Usunięcie klientów, którym skończyła się cierpliwość
+        kolejka.remove_impatient_clients(timer)
+        next_impatience_time = kolejka.next_impatience_time()
+        if next_impatience_time is not None:
+            heapq.heappush(
+                kalendarz, (next_impatience_time, ZDARZENIE_UTRATA_CIERPLIWOSCI)
+            )
+
+        # Dane tej jednostki są zapisywane przy następnym zdarzeniu
+        niezapisane, obsluzeni = 1, served_this_unit
+        last_timer = timer
+
+        # Wcześniejsze zakończenie po osiągnięciu stanu ustalonego
+        if okres and (timer + 1) % okres == 0:
+            zapisz_jednostki(
+                queue_lengths,
+                clients_served_per_time,
+                srednie,
+                len(kolejka),
+                obsluzeni,
+                niezapisane,
+            )
+            niezapisane, obsluzeni = 0, 0
+            if stan_ustalony(
+                queue_lengths, clients_served_per_time, srednie, dlugosc_ustalona
+            ):
+                koniec = timer + 1
+                pula_kas.zakoncz(koniec)
+                break
+            heapq.heappush(kalendarz, (timer + okres, ZDARZENIE_KONTROLA_STANU))
+
+    # Uzupełnienie danych do końca symulacji
+    niezapisane += koniec - last_timer - 1
+    if niezapisane:
+        zapisz_jednostki(
+            queue_lengths,
+            clients_served_per_time,
+            srednie,
+            len(kolejka),
+            obsluzeni,
+            niezapisane,
         )
-        # Aktualizacja czasu zajętości kas
-        for kasa in kasy:
-            if kasa.free_at > timer:
-                kasa.busy_time += 1
 
-        # Aktualizacja czasu oczekiwania klientów w kolejce
-        kolejka.increase_clients_in_queue_time()
-        kolejka.remove_impatient_clients()
+    return podsumowanie(
+        kolejka=kolejka,
+        kasy=kasy,
+        czas_trwania=koniec,
+        total_clients_arrived=total_clients_arrived,
+        total_clients_served=total_clients_served,
+        processed_clients_times=processed_clients_times,
+        waiting_times=waiting_times,
+        queue_lengths=queue_lengths,
+        clients_served_per_time=clients_served_per_time,
+        srednie=srednie,
+        pokaz_wyniki=pokaz_wyniki,
+        usun_rozgrzewke=usun_rozgrzewke or dlugosc_ustalona is not None,
+    )
+
+
+def zapisz_jednostki(
+    queue_lengths,
+    clients_served_per_time,
+    srednie: SrednieBiezace,
+    dlugosc_kolejki: int,
+    obsluzeni: int,
+    liczba_jednostek: int,
+):
+    # Kolejne jednostki czasu, w których kolejka i zajętość kas się nie
+    # zmieniają, a klienci są obsługiwani tylko w pierwszej z nich
+    dopisz(queue_lengths, dlugosc_kolejki, liczba_jednostek)
+    clients_served_per_time.append(obsluzeni)
+    dopisz(clients_served_per_time, 0, liczba_jednostek - 1)
+    srednie.zapisz(liczba_jednostek)
 
-        # Zbieranie danych do wykresów
-        queue_lengths.append(len(kolejka.queue))
 
+def podsumowanie(
+    kolejka: Kolejka,
+    kasy: List[SSCheckout],
+    czas_trwania: int,
+    total_clients_arrived: int,
+    total_clients_served: int,
+    processed_clients_times: List[int],
+    waiting_times: List[int],
+    queue_lengths: List[int],
+    clients_served_per_time: List[int],
+    srednie: SrednieBiezace,
+    pokaz_wyniki: bool = True,
+    usun_rozgrzewke: bool = False,
+) -> WynikSymulacji:
     # Obliczenia statystyk
-    if processed_clients_times:
-        sredni_czas_w_systemie = round(
-            sum(processed_clients_times) / len(processed_clients_times), 2
-        )
-        sredni_czas_oczekiwania = round(sum(waiting_times) / len(waiting_times), 2)
-    else:
-        sredni_czas_w_systemie = 0
-        sredni_czas_oczekiwania = 0
-    wykorzystanie_kas = [
-        round((kasa.busy_time / czas_trwania) * 100, 2) for kasa in kasy
-    ]
+    sredni_czas_w_systemie = srednia(processed_clients_times)
+    sredni_czas_oczekiwania = srednia(waiting_times)
+    srednia_dlugosc_kolejki = srednia(queue_lengths)
+    rozgrzewka = 0
+    if usun_rozgrzewke:
+        rozgrzewka = koniec_rozgrzewki(queue_lengths, clients_served_per_time, srednie)
+        if rozgrzewka is None:
+            # Bez wykrytego stanu ustalonego: najdalszy punkt rozważany przez
+            # MSER, czyli połowa symulacji
+            rozgrzewka = czas_trwania // 2
+    if rozgrzewka:
+        obsluzeni = suma_od(clients_served_per_time, rozgrzewka)
+        if obsluzeni:
+            sredni_czas_w_systemie = (
+                suma_od(srednie.time_in_system_per_time, rozgrzewka) / obsluzeni
+            )
+            sredni_czas_oczekiwania = (
+                suma_od(srednie.waiting_time_per_time, rozgrzewka) / obsluzeni
+            )
+        srednia_dlugosc_kolejki = srednia_od(queue_lengths, rozgrzewka)
+    wynik = WynikSymulacji(
+        czas_trwania=czas_trwania,
+        total_clients_arrived=total_clients_arrived,
+        total_clients_served=total_clients_served,
+        num_impatient_clients=kolejka.num_impatient_clients,
+        odsetek_niecierpliwych=(
+            kolejka.num_impatient_clients / total_clients_arrived * 100
+            if total_clients_arrived > 0
+            else 0
+        ),
+        clients_remaining_in_queue=len(kolejka),
+        sredni_czas_w_systemie=sredni_czas_w_systemie,
+        sredni_czas_oczekiwania=sredni_czas_oczekiwania,
+        srednia_dlugosc_kolejki=srednia_dlugosc_kolejki,
+        wykorzystanie_kas=[(kasa.busy_time / czas_trwania) * 100 for kasa in kasy],
+        clients_served_by_cashier=[kasa.clients_served for kasa in kasy],
+        rozgrzewka=rozgrzewka,
+        queue_lengths=queue_lengths,
+        clients_served_per_time=clients_served_per_time,
+        cumulative_waiting_time=srednie.cumulative_waiting_time,
+        cumulative_time_in_system=srednie.cumulative_time_in_system,
+        running_utilization=srednie.running_utilization,
+        waiting_time_per_time=srednie.waiting_time_per_time,
+        time_in_system_per_time=srednie.time_in_system_per_time,
+        busy_cashiers=srednie.busy_cashiers,
+        processed_clients_times=processed_clients_times,
+        waiting_times=waiting_times,
+    )
+    if pokaz_wyniki:
+        wypisz_wyniki(wynik)
+        zapisz_wykresy(wynik)
+    return wynik
+
 
-    clients_remaining_in_queue = len(kolejka.queue)
+def srednie_paczek_wyniku(
+    wynik: WynikSymulacji, **opcje
+) -> Dict[str, PrzedzialSredniePaczek]:
+    # Przedziały ufności średnich w stanie ustalonym z jednego przebiegu
+    # (metoda średnich z paczek, po pominięciu rozgrzewki). Czasy liczone są
+    # z sum na jednostkę czasu ważonych liczbą obsłużonych klientów, bo
+    # średnie narastające nie są stacjonarne. Opcje jak w srednie_paczek.
+    pomin = wynik.rozgrzewka
+    przedzialy = {
+        "srednia_dlugosc_kolejki": srednie_paczek_szeregu(
+            wynik.queue_lengths, pomin=pomin, **opcje
+        ),
+        "sredni_czas_oczekiwania": srednie_paczek_szeregu(
+            wynik.waiting_time_per_time,
+            wynik.clients_served_per_time,
+            pomin=pomin,
+            **opcje,
+        ),
+        "sredni_czas_w_systemie": srednie_paczek_szeregu(
+            wynik.time_in_system_per_time,
+            wynik.clients_served_per_time,
+            pomin=pomin,
+            **opcje,
+        ),
+    }
+    # Średnie wykorzystanie kas w procentach
+    zajete = srednie_paczek_szeregu(wynik.busy_cashiers, pomin=pomin, **opcje)
+    skala = 100 / len(wynik.wykorzystanie_kas)
+    przedzialy["wykorzystanie_kas"] = replace(
+        zajete,
+        srednia=zajete.srednia * skala,
+        wariancja=zajete.wariancja * skala**2,
+        polowa_szerokosci=zajete.polowa_szerokosci * skala,
+    )
+    return przedzialy
+
+
+def wypisz_wyniki(wynik: WynikSymulacji):
+    sredni_czas_w_systemie = round(wynik.sredni_czas_w_systemie, 2)
+    sredni_czas_oczekiwania = round(wynik.sredni_czas_oczekiwania, 2)
+    wykorzystanie_kas = [round(w, 2) for w in wynik.wykorzystanie_kas]
 
     # Wyświetlenie wyników
     print(
-        f"Całkowita liczba klientów, którzy przyszli do systemu: {total_clients_arrived}"
+        f"Całkowita liczba klientów, którzy przyszli do systemu: {wynik.total_clients_arrived}"
     )
-    print(f"Liczba obsłużonych klientów: {total_clients_served}")
+    print(f"Liczba obsłużonych klientów: {wynik.total_clients_served}")
     print(
-        f"Liczba klientów, którzy opuścili kolejkę z powodu braku cierpliwości: {kolejka.num_impatient_clients}"
+        f"Liczba klientów, którzy opuścili kolejkę z powodu braku cierpliwości: {wynik.num_impatient_clients}"
     )
     print(
-        f"Liczba klientów pozostałych w kolejce po zakończeniu symulacji: {clients_remaining_in_queue}"
+        f"Liczba klientów pozostałych w kolejce po zakończeniu symulacji: {wynik.clients_remaining_in_queue}"
     )
+    if wynik.rozgrzewka:
+        print(
+            f"Średnie liczone od jednostki czasu {wynik.rozgrzewka} (pominięta rozgrzewka)"
+        )
     print(f"Średni czas klienta w systemie = {sredni_czas_w_systemie}")
     print(f"Średni czas oczekiwania w kolejce = {sredni_czas_oczekiwania}")
+    if isinstance(wynik.waiting_times, Rozklad):
+        # Kwantyle z histogramu trybu strumieniowego
+        print(
+            f"95. percentyl czasu oczekiwania w kolejce = {wynik.waiting_times.kwantyl(0.95)}"
+        )
     for i, wykorzystanie in enumerate(wykorzystanie_kas):
         print(
-            f"Kasa {i + 1} była zajęta przez {wykorzystanie}% czasu i obsłużyła {kasy[i].clients_served} klientów."
+            f"Kasa {i + 1} była zajęta przez {wykorzystanie}% czasu i obsłużyła {wynik.clients_served_by_cashier[i]} klientów."
         )
 
-    # Generowanie wykresów
-    # Wykres długości kolejki w czasie
+
+def zapisz_wykresy(
+    wynik: WynikSymulacji,
+    katalog: str = ".",
+    liczba_punktow: Optional[int] = None,
+    metoda: str = "min_max",
+    max_workers: Optional[int] = None,
+):
+    # Wykresy zapisywane jako pliki PNG w katalogu `katalog`. liczba_punktow
+    # ogranicza liczbę punktów szeregów czasowych (metoda min_max lub lttb,
+    # zob. narzedzia.wykresy); max_workers jak w narzedzia.wykresy.rysuj
+    # (domyślnie pula procesów tylko dla długich serii)
+    liczba_kas = len(wynik.wykorzystanie_kas)
+    numery_kas = list(range(1, liczba_kas + 1))
+
+    def plik(nazwa: str) -> str:
+        return os.path.join(katalog, nazwa)
+
+    wykresy = [
+        # Wykres długości kolejki w czasie
+        (
+            wykres_liniowy,
+            (
+                zmniejsz(*punkty(wynik.queue_lengths), liczba_punktow, metoda),
+                "Długość kolejki",
+                ("Długość kolejki w czasie", "Liczba klientów w kolejce"),
+                plik("queue_length_over_time.png"),
+                # Średnia długość kolejki
+                wynik.srednia_dlugosc_kolejki,
+            ),
+        ),
+        # Histogram czasu spędzonego w systemie przez klientów
+        (
+            histogram,
+            (
+                dane_histogramu(wynik.processed_clients_times),
+                ("Czas w systemie", "Średni czas w systemie"),
+                wynik.sredni_czas_w_systemie,
+                (
+                    "Rozkład czasu spędzonego w systemie przez klientów",
+                    "Czas (jednostki czasu)",
+                ),
+                plik("time_in_system_distribution.png"),
+            ),
+        ),
+        # Histogram czasu oczekiwania w kolejce
+        (
+            histogram,
+            (
+                dane_histogramu(wynik.waiting_times),
+                ("Czas oczekiwania w kolejce", "Średni czas oczekiwania"),
+                wynik.sredni_czas_oczekiwania,
+                (
+                    "Rozkład czasu oczekiwania w kolejce",
+                    "Czas oczekiwania (jednostki czasu)",
+                ),
+                plik("waiting_time_distribution.png"),
+            ),
+        ),
+        # Wykres liczby obsłużonych klientów w czasie
+        (
+            wykres_liniowy,
+            (
+                zmniejsz(
+                    *punkty(wynik.clients_served_per_time), liczba_punktow, metoda
+                ),
+                "Obsłużeni klienci",
+                ("Liczba obsłużonych klientów w czasie", "Liczba obsłużonych klientów"),
+                plik("clients_served_over_time.png"),
+            ),
+        ),
+        # Wykres średniego czasu oczekiwania w czasie
+        (
+            wykres_liniowy,
+            (
+                zmniejsz(
+                    *punkty(wynik.cumulative_waiting_time), liczba_punktow, metoda
+                ),
+                "Średni czas oczekiwania",
+                (
+                    "Średni czas oczekiwania w czasie",
+                    "Średni czas oczekiwania (jednostki czasu)",
+                ),
+                plik("average_waiting_time_over_time.png"),
+            ),
+        ),
+        # Wykres wykorzystania kas
+        (
+            wykres_slupkowy,
+            (
+                numery_kas,
+                [round(w, 2) for w in wynik.wykorzystanie_kas],
+                ("Wykorzystanie kas", "Procent czasu zajętości"),
+                plik("cashier_utilization.png"),
+            ),
+        ),
+        # Wykres liczby klientów obsłużonych przez każdą kasę
+        (
+            wykres_slupkowy,
+            (
+                numery_kas,
+                wynik.clients_served_by_cashier,
+                (
+                    "Liczba klientów obsłużonych przez każdą kasę",
+                    "Liczba obsłużonych klientów",
+                ),
+                plik("clients_served_by_cashier.png"),
+            ),
+        ),
+    ]
+    rysuj(wykresy, max_workers)
+
+
+# Pojedyncze wykresy zapisz_wykresy; na poziomie modułu, żeby dało się je
+# rysować w innych procesach
+
+
+def wykres_liniowy(
+    seria: Tuple[np.ndarray, np.ndarray],
+    etykieta: str,
+    opisy: Tuple[str, str],
+    plik: str,
+    srednia: Optional[float] = None,
+):
+    # opisy: tytuł i opis osi y; srednia rysowana jako pozioma linia
+    plt = pyplot()
     plt.figure(figsize=(12, 6))
-    plt.plot(range(czas_trwania), queue_lengths, label="Długość kolejki")
-    avg_queue_length = np.mean(queue_lengths)
-    plt.axhline(
-        y=avg_queue_length, color="red", linestyle="--", label="Średnia długość kolejki"
-    )
-    plt.title("Długość kolejki w czasie")
+    plt.plot(*seria, label=etykieta)
+    if srednia is not None:
+        plt.axhline(
+            y=srednia, color="red", linestyle="--", label=f"Średnia {etykieta.lower()}"
+        )
+    plt.title(opisy[0])
     plt.xlabel("Czas")
-    plt.ylabel("Liczba klientów w kolejce")
+    plt.ylabel(opisy[1])
     plt.legend()
     plt.grid(True)
-    plt.savefig("queue_length_over_time.png")
+    plt.savefig(plik)
     plt.close()
 
-    # Histogram czasu spędzonego w systemie przez klientów
+
+def histogram(
+    dane: Tuple[np.ndarray, Optional[np.ndarray]],
+    etykiety: Tuple[str, str],
+    srednia: float,
+    opisy: Tuple[str, str],
+    plik: str,
+):
+    # dane: wartości i ich wagi (zob. dane_histogramu); etykiety: histogramu i
+    # linii średniej; opisy: tytuł i opis osi x
+    wartosci, wagi = dane
+    plt = pyplot()
     plt.figure(figsize=(8, 6))
-    plt.hist(
-        processed_clients_times, bins=20, edgecolor="black", label="Czas w systemie"
-    )
-    plt.xlim(0, max(processed_clients_times) + 1)
-    plt.axvline(
-        x=sredni_czas_w_systemie,
-        color="red",
-        linestyle="--",
-        label="Średni czas w systemie",
-    )
-    plt.title("Rozkład czasu spędzonego w systemie przez klientów")
-    plt.xlabel("Czas (jednostki czasu)")
+    plt.hist(wartosci, bins=20, weights=wagi, edgecolor="black", label=etykiety[0])
+    if len(wartosci):
+        plt.xlim(0, max(wartosci) + 1)
+    plt.axvline(x=srednia, color="red", linestyle="--", label=etykiety[1])
+    plt.title(opisy[0])
+    plt.xlabel(opisy[1])
     plt.ylabel("Liczba klientów")
     plt.legend()
     plt.grid(True)
-    plt.savefig("time_in_system_distribution.png")
+    plt.savefig(plik)
     plt.close()
 
-    # Histogram czasu oczekiwania w kolejce
+
+def wykres_slupkowy(
+    numery_kas: List[int], wartosci: List[float], opisy: Tuple[str, str], plik: str
+):
+    # opisy: tytuł i opis osi y
+    plt = pyplot()
     plt.figure(figsize=(8, 6))
-    plt.hist(
-        waiting_times, bins=20, edgecolor="black", label="Czas oczekiwania w kolejce"
-    )
-    plt.axvline(
-        x=sredni_czas_oczekiwania,
-        color="red",
-        linestyle="--",
-        label="Średni czas oczekiwania",
-    )
-    plt.title("Rozkład czasu oczekiwania w kolejce")
-    plt.xlabel("Czas oczekiwania (jednostki czasu)")
-    plt.ylabel("Liczba klientów")
-    plt.legend()
+    plt.bar(numery_kas, wartosci)
+    plt.title(opisy[0])
+    plt.xlabel("Numer kasy")
+    plt.ylabel(opisy[1])
     plt.grid(True)
-    plt.savefig("waiting_time_distribution.png")
+    plt.savefig(plik)
     plt.close()
 
-    # Wykres liczby obsłużonych klientów w czasie
-    plt.figure(figsize=(12, 6))
-    plt.plot(range(czas_trwania), clients_served_per_time, label="Obsłużeni klienci")
-    plt.title("Liczba obsłużonych klientów w czasie")
-    plt.xlabel("Czas")
-    plt.ylabel("Liczba obsłużonych klientów")
-    plt.legend()
-    plt.grid(True)
-    plt.savefig("clients_served_over_time.png")
-    plt.close()
 
-    # Wykres średniego czasu oczekiwania w czasie
-    plt.figure(figsize=(12, 6))
-    plt.plot(
-        range(len(cumulative_waiting_time)),
-        cumulative_waiting_time,
-        label="Średni czas oczekiwania",
+def uruchom(konfiguracja: KonfiguracjaSymulacji) -> WynikSymulacji:
+    # Wejście dla programów: bez input(), wydruki i wykresy tylko na życzenie
+    silnik = symulacja_zdarzeniowa if konfiguracja.zdarzeniowa else symulacja
+    wynik = silnik(
+        kolejka=Kolejka(),
+        kasy=[SSCheckout() for _ in range(konfiguracja.liczba_kas)],
+        czas_trwania=konfiguracja.czas_trwania,
+        srednia_intensywnosc_przyjsc=konfiguracja.srednia_intensywnosc_przyjsc,
+        pokaz_wyniki=False,
+        strumienie=StrumienieLosowe(konfiguracja.seed),
+        punkty_szeregow=konfiguracja.punkty_szeregow,
+        usun_rozgrzewke=konfiguracja.usun_rozgrzewke,
+        dlugosc_ustalona=konfiguracja.dlugosc_ustalona,
+        cierpliwosc=konfiguracja.cierpliwosc,
     )
-    plt.title("Średni czas oczekiwania w czasie")
-    plt.xlabel("Czas")
-    plt.ylabel("Średni czas oczekiwania (jednostki czasu)")
-    plt.legend()
-    plt.grid(True)
-    plt.savefig("average_waiting_time_over_time.png")
-    plt.close()
+    if konfiguracja.wypisz_wyniki:
+        wypisz_wyniki(wynik)
+    if konfiguracja.zapisz_wykresy:
+        zapisz_wykresy(
+            wynik,
+            konfiguracja.katalog_wykresow,
+            liczba_punktow=konfiguracja.liczba_punktow_wykresow,
+            metoda=konfiguracja.metoda_zmniejszania,
+            max_workers=konfiguracja.procesy_wykresow,
+        )
+    return wynik
 
-    # Wykres wykorzystania kas
-    plt.figure(figsize=(8, 6))
-    plt.bar(range(1, len(kasy) + 1), wykorzystanie_kas)
-    plt.title("Wykorzystanie kas")
-    plt.xlabel("Numer kasy")
-    plt.ylabel("Procent czasu zajętości")
-    plt.grid(True)
-    plt.savefig("cashier_utilization.png")
-    plt.close()
 
-    # Wykres liczby klientów obsłużonych przez każdą kasę
-    clients_served_by_cashier = [kasa.clients_served for kasa in kasy]
-    plt.figure(figsize=(8, 6))
-    plt.bar(range(1, len(kasy) + 1), clients_served_by_cashier)
-    plt.title("Liczba klientów obsłużonych przez każdą kasę")
-    plt.xlabel("Numer kasy")
-    plt.ylabel("Liczba obsłużonych klientów")
-    plt.grid(True)
-    plt.savefig("clients_served_by_cashier.png")
-    plt.close()
+def replikacja(konfiguracja, seed) -> Dict[str, object]:
+    # Jedna replikacja bez wydruków i wykresów, np. dla narzedzia.replikacje.
+    # konfiguracja: KonfiguracjaSymulacji albo słownik z polami liczba_kas,
+    # czas_trwania, srednia_intensywnosc_przyjsc
+    if isinstance(konfiguracja, dict):
+        konfiguracja = KonfiguracjaSymulacji(**konfiguracja)
+    konfiguracja = replace(
+        konfiguracja, seed=seed, wypisz_wyniki=False, zapisz_wykresy=False
+    )
+    return uruchom(konfiguracja).statystyki()
 
 
 def main():
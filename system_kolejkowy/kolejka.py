@@ -1,12 +1,23 @@
 import random
 from typing import List
 
+import numpy as np
+
+from narzedzia.losowanie import pula_calkowitych, pula_kategorii
+
+# Klasy klientów i czasy obsługi losowane blokami zamiast pojedynczo
+_rng = np.random.default_rng()
+_klasy_klientow = pula_kategorii(_rng, ["little", "medium", "many"], [0.2, 0.6, 0.2])
+_czasy_obslugi = {
+    "little": pula_calkowitych(_rng, 1, 3),
+    "medium": pula_calkowitych(_rng, 4, 7),
+    "many": pula_calkowitych(_rng, 7, 10),
+}
+
 
 class Client:
     def __init__(self):
-        self.amount = random.choices(
-            ["little", "medium", "many"], weights=[20, 60, 20], k=1
-        )[0]
+        self.amount = _klasy_klientow.nastepna()
         self.time_in_queue = 0
 
     def __repr__(self):
@@ -21,16 +32,8 @@ class SSCheckout:
         return f"Free at: {self.free_at}"
 
     def process_client(self, client: Client):
-        client_time = 0
-        if client.amount == "little":
-            client_time = random.randint(1, 3)
-            self.free_at += client_time
-        elif client.amount == "medium":
-            client_time = random.randint(4, 7)
-            self.free_at += client_time
-        elif client.amount == "many":
-            client_time = random.randint(7, 10)
-            self.free_at += client_time
+        client_time = _czasy_obslugi[client.amount].nastepna()
+        self.free_at += client_time
         return client, client_time
 
 
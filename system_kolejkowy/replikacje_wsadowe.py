@@ -0,0 +1,174 @@
+# Wsadowy silnik modelu kas z koeljkav5: R niezależnych replikacji jest
+# symulowanych jednocześnie, krok po kroku, na tablicach NumPy.
+#
+# Stan każdej replikacji to liczby klientów w kolejce pogrupowane według wieku
+# (liczby jednostek czasu od przyjścia) i klasy oraz wektor free_at kas.
+# Rozkłady są takie same jak w symulacja(): liczba przyjść w jednostce czasu
+# ma rozkład Poissona, klasy są losowane z CLIENT_AMOUNT_WEIGHTS, kolejka jest
+# obsługiwana w kolejności przyjścia przez losowo wybrane wolne kasy, a klient
+# odchodzi po `cierpliwosc` (domyślnie CLIENT_PATIENCE) jednostkach czasu
+# w kolejce.
+#
+# Replikacja kosztuje tu ok. 0.7-0.9 ms (1000 jednostek czasu, 6 kas,
+# R = 1000-10000) wobec ok. 17 ms w symulacja(), czyli ok. 20-25 razy mniej.
+# Na krok i replikację przypada kilkanaście operacji na tablicach (losowanie
+# kohort, przydział do kas), więc bez kompilacji pętli więcej nie da się
+# uzyskać. Losowanie wymaga rozkładów Poissona i hipergeometrycznego, których
+# nie ma GeneratorOdwrotny, więc strumienie muszą być zwykłe (bez
+# ZiarnoSynchroniczne).
+from typing import Dict, Optional
+
+import numpy as np
+
+from narzedzia.losowanie import StrumienieLosowe
+from system_kolejkowy.koeljkav5 import (
+    CLIENT_AMOUNTS,
+    CLIENT_AMOUNT_WEIGHTS,
+    CLIENT_PATIENCE,
+    SERVICE_TIMES,
+)
+
+
+def symulacja_wsadowa(
+    liczba_replikacji: int,
+    liczba_kas: int,
+    czas_trwania: int,
+    srednia_intensywnosc_przyjsc: float,
+    strumienie: Optional[StrumienieLosowe] = None,
+    cierpliwosc: int = CLIENT_PATIENCE,
+) -> Dict[str, np.ndarray]:
+    if strumienie is None:
+        strumienie = StrumienieLosowe()
+    if strumienie.antytetyczne is not None:
+        raise ValueError(
+            "symulacja_wsadowa nie obsługuje strumieni synchronicznych "
+            "(ZiarnoSynchroniczne): GeneratorOdwrotny nie ma metod poisson "
+            "i hypergeometric"
+        )
+    if cierpliwosc < 1:
+        raise ValueError("Cierpliwość musi wynosić co najmniej 1")
+    R = liczba_replikacji
+    K = len(CLIENT_AMOUNTS)
+    P = cierpliwosc
+
+    weights = np.asarray(CLIENT_AMOUNT_WEIGHTS, dtype=float)
+    # Liczby przyjść klientów poszczególnych klas są niezależne i mają
+    # rozkłady Poissona z intensywnościami proporcjonalnymi do wag klas
+    class_intensities = srednia_intensywnosc_przyjsc * weights / weights.sum()
+    # Czasy obsługi klas; dodatkowe 0 dla pozycji bez klienta
+    service_times = np.array([SERVICE_TIMES[a] for a in CLIENT_AMOUNTS] + [0])
+    cashier_positions = np.arange(liczba_kas)
+
+    # Replikacje są ostatnią osią wszystkich tablic stanu.
+    # Klienci w kolejce: [wiek, klasa, replikacja]
+    kohorty = np.zeros((P, K, R), dtype=np.int64)
+    queue_length = np.zeros(R, dtype=np.int64)
+    free_at = np.zeros((liczba_kas, R), dtype=np.int64)
+    busy_time = np.zeros((liczba_kas, R), dtype=np.int64)
+    clients_served_by_cashier = np.zeros((liczba_kas, R), dtype=np.int64)
+
+    total_clients_arrived = np.zeros(R, dtype=np.int64)
+    total_clients_served = np.zeros(R, dtype=np.int64)
+    num_impatient_clients = np.zeros(R, dtype=np.int64)
+    total_waiting_time = np.zeros(R, dtype=np.int64)
+    total_time_in_system = np.zeros(R, dtype=np.int64)
+    total_queue_length = np.zeros(R, dtype=np.int64)
+
+    for timer in range(czas_trwania):
+        # Starzenie się kohort i przyjścia nowych klientów
+        kohorty[1:] = kohorty[:-1]
+        kohorty[0] = strumienie.przyjscia.poisson(class_intensities[:, None], (K, R))
+        arrived = kohorty[0].sum(axis=0)
+        total_clients_arrived += arrived
+        queue_length += arrived
+
+        # Obsługa klientów w wolnych kasach
+        free = free_at <= timer
+        to_serve = np.minimum(free.sum(axis=0), queue_length)
+        if to_serve.any():
+            served = np.zeros((K, R), dtype=np.int64)
+            remaining = to_serve.copy()
+            for wiek in range(P - 1, -1, -1):
+                # Najpierw najstarsi klienci; kolejność klas w kohorcie jest losowa
+                taken = _losuj_bez_zwracania(strumienie.klasy, kohorty[wiek], remaining)
+                kohorty[wiek] -= taken
+                served += taken
+                taken_total = taken.sum(axis=0)
+                total_waiting_time += wiek * taken_total
+                total_time_in_system += wiek * taken_total
+                remaining -= taken_total
+
+            # Przydział obsłużonych klientów do losowo wybranych wolnych kas
+            keys = strumienie.obsluga.random((liczba_kas, R))
+            keys[~free] = 2.0
+            cashier_order = np.argsort(keys, axis=0)
+            class_bounds = np.cumsum(served, axis=0)
+            client_class = (
+                cashier_positions[:, None, None] >= class_bounds[None, :, :]
+            ).sum(axis=1)
+            positions, columns = np.nonzero(
+                cashier_positions[:, None] < to_serve[None, :]
+            )
+            cashiers = cashier_order[positions, columns]
+            processing_times = service_times[client_class[positions, columns]]
+
+            free_at[cashiers, columns] = timer + processing_times
+            busy_time[cashiers, columns] += (
+                np.minimum(timer + processing_times, czas_trwania) - timer
+            )
+            clients_served_by_cashier[cashiers, columns] += 1
+            total_clients_served += to_serve
+            total_time_in_system += service_times[:K] @ served
+            queue_length -= to_serve
+
+        # Klienci z najstarszej kohorty tracą cierpliwość
+        impatient = kohorty[P - 1].sum(axis=0)
+        num_impatient_clients += impatient
+        queue_length -= impatient
+        kohorty[P - 1] = 0
+
+        total_queue_length += queue_length
+
+    served_any = np.maximum(total_clients_served, 1)
+    return {
+        "total_clients_arrived": total_clients_arrived,
+        "total_clients_served": total_clients_served,
+        "num_impatient_clients": num_impatient_clients,
+        "odsetek_niecierpliwych": np.where(
+            total_clients_arrived > 0,
+            num_impatient_clients / np.maximum(total_clients_arrived, 1) * 100,
+            0.0,
+        ),
+        "clients_remaining_in_queue": queue_length,
+        "sredni_czas_w_systemie": np.where(
+            total_clients_served > 0, total_time_in_system / served_any, 0.0
+        ),
+        "sredni_czas_oczekiwania": np.where(
+            total_clients_served > 0, total_waiting_time / served_any, 0.0
+        ),
+        "srednia_dlugosc_kolejki": total_queue_length / czas_trwania,
+        "wykorzystanie_kas": (busy_time / czas_trwania * 100).T,
+        "clients_served_by_cashier": clients_served_by_cashier.T,
+    }
+
+
+def _losuj_bez_zwracania(rng, kohorta: np.ndarray, liczba: np.ndarray) -> np.ndarray:
+    # Dla każdej replikacji (kolumny) losuje `liczba` klientów bez zwracania
+    # z kohorty o licznościach klas `kohorta` (wielowymiarowy rozkład
+    # hipergeometryczny). Losowanie jest potrzebne tylko tam, gdzie kohorta
+    # jest obsługiwana częściowo; pozostałe kolumny są wyznaczone jednoznacznie.
+    cohort_size = kohorta.sum(axis=0)
+    liczba = np.minimum(liczba, cohort_size)
+    taken = np.where(liczba == cohort_size, kohorta, 0)
+    partial = np.flatnonzero((liczba > 0) & (liczba < cohort_size))
+    if partial.size:
+        cohort = kohorta[:, partial]
+        remaining_in_cohort = cohort_size[partial]
+        to_take = liczba[partial]
+        for k in range(kohorta.shape[0] - 1):
+            remaining_in_cohort = remaining_in_cohort - cohort[k]
+            drawn = rng.hypergeometric(cohort[k], remaining_in_cohort, to_take)
+            taken[k, partial] = drawn
+            to_take = to_take - drawn
+        taken[-1, partial] = to_take
+    return taken
@@ -0,0 +1,82 @@
+# Zgodność silnika zdarzeniowego (symulacja_zdarzeniowa) z symulacją krok po
+# kroku (symulacja): przy tych samych strumieniach losowych oba silniki dają
+# te same wyniki, także z cierpliwością, usuwaniem rozgrzewki, wcześniejszym
+# zakończeniem i w trybie strumieniowym.
+from dataclasses import fields
+
+import numpy as np
+import pytest
+
+from narzedzia.strumieniowe import Rozklad, SzeregZdziesiatkowany
+from system_kolejkowy.koeljkav5 import KonfiguracjaSymulacji, uruchom
+
+KONFIGURACJE = [
+    dict(liczba_kas=3, czas_trwania=2000, srednia_intensywnosc_przyjsc=1.1),
+    dict(liczba_kas=1, czas_trwania=2000, srednia_intensywnosc_przyjsc=0.2),
+    dict(
+        liczba_kas=4,
+        czas_trwania=2000,
+        srednia_intensywnosc_przyjsc=2.0,
+        cierpliwosc=5,
+    ),
+    dict(
+        liczba_kas=3,
+        czas_trwania=5000,
+        srednia_intensywnosc_przyjsc=1.1,
+        usun_rozgrzewke=True,
+    ),
+    dict(
+        liczba_kas=3,
+        czas_trwania=20000,
+        srednia_intensywnosc_przyjsc=1.1,
+        dlugosc_ustalona=2000,
+    ),
+]
+
+KONFIGURACJE_STRUMIENIOWE = [
+    dict(
+        liczba_kas=3,
+        czas_trwania=20000,
+        srednia_intensywnosc_przyjsc=1.1,
+        punkty_szeregow=256,
+    ),
+    dict(
+        liczba_kas=2,
+        czas_trwania=20000,
+        srednia_intensywnosc_przyjsc=0.3,
+        punkty_szeregow=256,
+        dlugosc_ustalona=3000,
+    ),
+]
+
+
+def wyniki_silnikow(seed, **parametry):
+    return [
+        uruchom(KonfiguracjaSymulacji(seed=seed, zdarzeniowa=zdarzeniowa, **parametry))
+        for zdarzeniowa in (False, True)
+    ]
+
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+@pytest.mark.parametrize("parametry", KONFIGURACJE)
+def test_silnik_zdarzeniowy_jak_krokowy(parametry, seed):
+    krokowy, zdarzeniowy = wyniki_silnikow(seed, **parametry)
+    assert krokowy == zdarzeniowy
+
+
+@pytest.mark.parametrize("seed", [1, 7])
+@pytest.mark.parametrize("parametry", KONFIGURACJE_STRUMIENIOWE)
+def test_silnik_zdarzeniowy_jak_krokowy_strumieniowo(parametry, seed):
+    krokowy, zdarzeniowy = wyniki_silnikow(seed, **parametry)
+    # Szeregi są sumowane w innej kolejności, więc tylko z dokładnością do
+    # błędów zaokrągleń
+    for pole in fields(krokowy):
+        a, b = getattr(krokowy, pole.name), getattr(zdarzeniowy, pole.name)
+        if isinstance(a, SzeregZdziesiatkowany):
+            assert a.krok == b.krok
+            np.testing.assert_allclose(a.wartosci(), b.wartosci(), atol=1e-9)
+        elif isinstance(a, Rozklad):
+            assert len(a) == len(b)
+            assert a.srednia == pytest.approx(b.srednia)
+        else:
+            assert a == pytest.approx(b), pole.name
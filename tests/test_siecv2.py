@@ -0,0 +1,69 @@
+# Streaming mode of siecv2 (series_points) against the list mode: the same
+# random streams give the same counts and averages; only the stage series are
+# averaged down and the requests are kept as distributions.
+import numpy as np
+import pytest
+
+from narzedzia.losowanie import StrumienieLosowe
+from sieć_kolejkowa import siecv2
+
+
+def run_both(seed, czas_trwania, **options):
+    return [
+        siecv2.symulacja(
+            czas_trwania,
+            pokaz_wyniki=False,
+            strumienie=StrumienieLosowe(seed),
+            series_points=series_points,
+            **options,
+        )
+        for series_points in (None, 128)
+    ]
+
+
+def assert_close(a, b):
+    # Nested dictionaries of the statistics, floats up to rounding errors
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            assert_close(a[key], b[key])
+    else:
+        assert a == pytest.approx(b)
+
+
+@pytest.mark.parametrize("seed", [1, 5])
+@pytest.mark.parametrize("transit_time", [0, 1, 3])
+def test_streaming_matches_list_mode(seed, transit_time):
+    listed, streamed = run_both(seed, 1000, transit_time=transit_time)
+    assert_close(streamed.statistics(), listed.statistics())
+
+    requests = listed.requests
+    exited = requests.exited()
+    times_in_system = streamed.distributions["time_in_system"]
+    assert len(times_in_system) == len(exited)
+    assert times_in_system.srednia == pytest.approx(
+        requests.times_in_system()[exited].mean()
+    )
+    assert streamed.distributions["waiting_time"].srednia == pytest.approx(
+        requests.waiting_time[exited].mean()
+    )
+
+    for name, series in listed.stage_series.items():
+        step = streamed.series_step
+        for series_name, values in series.items():
+            values = np.asarray(values, dtype=float)
+            # Averages of whole steps of the list series
+            whole = len(values) // step * step
+            expected = values[:whole].reshape(-1, step).mean(axis=1)
+            np.testing.assert_allclose(
+                streamed.stage_series[name][series_name][: len(expected)],
+                expected,
+                atol=1e-9,
+            )
+
+
+def test_streaming_stops_like_list_mode():
+    listed, streamed = run_both(2, 3000, steady_state_length=500)
+    assert streamed.simulation_time == listed.simulation_time
+    assert streamed.total_requests == listed.total_requests
+    assert streamed.total_exited == listed.total_exited